@@ -16,6 +16,10 @@ setup(
     install_requires=[
         "requests >= 2.15.0"
     ],
+    extras_require={
+        "aiohttp": ["aiohttp >= 3.7.0"],
+        "numpy": ["numpy >= 1.17.0"]
+    },
     long_description=long_description,
     long_description_content_type='text/markdown',
     url='https://github.com/shenjianan97/PyQuakes'
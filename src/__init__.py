@@ -1,6 +1,14 @@
 from .earthquake_query import EarthquakeQuery
+from .async_transport import AsyncTransport, AiohttpTransport, ExecutorTransport
+from .session import HttpSession
+from .retry import RetryPolicy, RateLimiter
+from .concurrency import AdaptiveConcurrency, HedgePolicy
+from .deadline import Deadline
+from .cache import ResponseCache, EventCache
 from .location import Rectangle, Circle, GeoRectangle, GeoCircle
-from .result_collection import ResultCollection
+from .result_collection import ResultCollection, FailedCell
+from .csv_result import CsvResultCollection
+from .sync import EarthquakeSync
 from .single_result import SingleResult
 from .timeframe import TimeFrame
 from .enum.alertlevel import Alertlevel
@@ -0,0 +1,132 @@
+import asyncio
+from abc import ABC, abstractmethod
+
+from .session import HttpSession, _DefaultSession
+
+
+class AsyncTransport(ABC):
+    """
+    This is the abstract class of the transports used by the asyncio API of EarthquakeQuery, i.e. search_async() and
+    search_by_event_id_async(). A transport sends a GET request without blocking the event loop and returns the status
+    code and the body of the response.
+
+    Clients can implement their own transport by subclassing AsyncTransport, and pass it to the asyncio API.
+    Example:
+    ::
+        transport = AiohttpTransport()
+        try:
+            result = await EarthquakeQuery(time=[time_frame]).search_async(transport=transport)
+        finally:
+            await transport.close()
+
+    A transport can also be used as an async context manager, which closes the transport on exit.
+    Example:
+    ::
+        async with AiohttpTransport() as transport:
+            result = await EarthquakeQuery.search_by_event_id_async("usc000lvb5", transport=transport)
+    """
+
+    @abstractmethod
+    async def get(self, url: str) -> tuple:
+        """
+        Abstract method for sending a GET request
+
+        :param url: the full url of the request
+        :return: tuple, the status code and the text of the response
+        """
+        pass
+
+    async def close(self):
+        """
+        Release the resources held by the transport, i.e. the connections
+        """
+        pass
+
+    async def __aenter__(self) -> 'AsyncTransport':
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.close()
+
+
+class AiohttpTransport(AsyncTransport):
+    """
+    A transport using aiohttp, which is an optional dependency of PyQuakes. All the requests sent by the same transport
+    share one aiohttp.ClientSession, so that thousands of requests can run on one event loop.
+    """
+
+    def __init__(self, limit: int = 100):
+        """
+        Create an AiohttpTransport.
+
+        :param limit: the maximum number of connections held by the session
+        :type limit: int
+        :raises ImportError: If aiohttp is not installed
+        """
+        try:
+            import aiohttp
+        except ImportError:
+            raise ImportError("AiohttpTransport requires aiohttp, please install it with pip install aiohttp")
+        self._aiohttp = aiohttp
+        self._limit = limit
+        self._session = None
+
+    async def get(self, url: str) -> tuple:
+        """
+        Send a GET request with the shared aiohttp.ClientSession
+
+        :param url: the full url of the request
+        :return: tuple, the status code and the text of the response
+        """
+        if self._session is None:
+            self._session = self._aiohttp.ClientSession(connector=self._aiohttp.TCPConnector(limit=self._limit))
+        async with self._session.get(url) as response:
+            return response.status, await response.text()
+
+    async def close(self):
+        """
+        Close the shared aiohttp.ClientSession
+        """
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+
+class ExecutorTransport(AsyncTransport):
+    """
+    A transport running the blocking requests of a HttpSession in the default executor of the event loop. It is used
+    when aiohttp is not installed.
+    """
+
+    def __init__(self, session: HttpSession = None):
+        """
+        Create an ExecutorTransport.
+
+        :param session: the session used to send the requests. If it is None, the default session is used.
+        :type session: HttpSession
+        """
+        self._session = session
+
+    async def get(self, url: str) -> tuple:
+        """
+        Send a GET request in the default executor of the event loop
+
+        :param url: the full url of the request
+        :return: tuple, the status code and the text of the response
+        """
+        session = self._session if self._session is not None else _DefaultSession.get()
+        loop = asyncio.get_running_loop()
+        r = await loop.run_in_executor(None, session.get, url)
+        return r.status_code, r.text
+
+
+def default_async_transport() -> AsyncTransport:
+    """
+    Create the default transport, which is an AiohttpTransport if aiohttp is installed, otherwise an ExecutorTransport
+
+    :return: AsyncTransport, the default transport
+    """
+    try:
+        return AiohttpTransport()
+    except ImportError:
+        return ExecutorTransport()
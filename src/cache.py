@@ -0,0 +1,307 @@
+import hashlib
+import json
+import os
+import threading
+import time
+import urllib.parse
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+
+
+class ResponseCache:
+    """
+    A disk-backed cache of the GeoJSON responses of the USGS Earthquake Catalog API. A response is keyed by the
+    canonical form of the query parameters, i.e. the parameters sorted by name, so that the same query always hits
+    the same entry whatever order its parameters are built in.
+
+    The time to live of an entry depends on the end time of the query:
+        1. If the end time is earlier than now - settled_after, the events in the time frame are not expected to change
+        any more, and the entry never expires.
+        2. Otherwise, including the queries without an end time or with an update after time, the entry expires after
+        recent_ttl seconds.
+
+    When the total size of the entries exceeds max_bytes, the least recently used entries are removed.
+
+    Example:
+    ::
+        cache = ResponseCache("~/.pyquakes/cache", max_bytes=1024 ** 3)
+        query = EarthquakeQuery(time=[TimeFrame(datetime(2010, 1, 1), datetime(2011, 1, 1))])
+        query.set_response_cache(cache)
+        result = query.search()
+    """
+
+    def __init__(self, directory: str, max_bytes: int = 512 * 1024 * 1024, recent_ttl: float = 600,
+                 settled_after: timedelta = timedelta(days=30)):
+        """
+        Create a ResponseCache, the directory is created if it does not exist.
+
+        :param directory: the directory storing the entries
+        :type directory: str
+        :param max_bytes: the maximum total size of the entries in bytes
+        :type max_bytes: int
+        :param recent_ttl: the time to live in seconds of the entries whose time frame is not settled
+        :type recent_ttl: float
+        :param settled_after: how long after its end time a time frame is considered settled
+        :type settled_after: timedelta
+        :raises TypeError: If directory is not a string, or settled_after is not a timedelta
+        :raises ValueError: If max_bytes or recent_ttl is negative
+        """
+        if not isinstance(directory, str):
+            raise TypeError("directory should be a string")
+        if not isinstance(settled_after, timedelta):
+            raise TypeError("settled_after should be instance of datetime.timedelta")
+        if max_bytes < 0 or recent_ttl < 0:
+            raise ValueError("max_bytes and recent_ttl should not be negative")
+
+        self.directory = os.path.expanduser(directory)
+        self.max_bytes = max_bytes
+        self.recent_ttl = recent_ttl
+        self.settled_after = settled_after
+        self._lock = threading.Lock()
+        os.makedirs(self.directory, exist_ok=True)
+        self._total_bytes = sum(os.path.getsize(path) for path in self._entry_paths())
+
+    @staticmethod
+    def canonical_key(query_dict: dict) -> str:
+        """
+        Get the canonical form of the query parameters, which is the url encoded parameters sorted by name.
+
+        :param query_dict: the query parameters
+        :return: str, the canonical form of the query parameters
+        """
+        return urllib.parse.urlencode(sorted((key, str(value)) for key, value in query_dict.items()), safe=':')
+
+    def get(self, query_dict: dict):
+        """
+        Get the cached response of the query.
+
+        :param query_dict: the query parameters
+        :return: the response in json format, or None if the response is not cached or has expired
+        """
+        key = self.canonical_key(query_dict)
+        path = self._path(key)
+        # the entries are replaced atomically by put(), so the file is read and parsed without the lock
+        try:
+            with open(path, "r") as file:
+                inode = os.fstat(file.fileno()).st_ino
+                entry = json.load(file)
+        except (OSError, ValueError):
+            return None
+        if entry["key"] != key:
+            return None
+        expired = entry["expires"] is not None and entry["expires"] < time.time()
+        with self._lock:
+            # the entry may have been replaced or removed since it was read, then the new entry is left alone
+            try:
+                replaced = os.stat(path).st_ino != inode
+            except OSError:
+                replaced = True
+            if not replaced:
+                if expired:
+                    self._remove(path)
+                else:
+                    # mark the entry as recently used for the eviction
+                    os.utime(path)
+        return None if expired else entry["response"]
+
+    def put(self, query_dict: dict, response):
+        """
+        Cache the response of the query, and evict the least recently used entries if the cache is too large.
+
+        :param query_dict: the query parameters
+        :param response: the response in json format
+        """
+        key = self.canonical_key(query_dict)
+        ttl = self._get_ttl(query_dict)
+        entry = {"key": key, "expires": None if ttl is None else time.time() + ttl, "response": response}
+        data = json.dumps(entry)
+        if len(data) > self.max_bytes:
+            return
+        path = self._path(key)
+        with self._lock:
+            self._remove(path)
+            # write to a temporary file first, so that a reader never sees a partial entry
+            temp_path = path + "." + str(threading.get_ident()) + ".tmp"
+            with open(temp_path, "w") as file:
+                file.write(data)
+            os.replace(temp_path, path)
+            self._total_bytes += os.path.getsize(path)
+            self._evict()
+
+    def clear(self):
+        """
+        Remove all the entries of the cache
+        """
+        with self._lock:
+            for path in self._entry_paths():
+                self._remove(path)
+
+    def get_size(self) -> int:
+        """
+        Get the total size of the entries
+
+        :return: int, the total size of the entries in bytes
+        """
+        return self._total_bytes
+
+    def _get_ttl(self, query_dict: dict):
+        if "endtime" not in query_dict or "updatedafter" in query_dict:
+            return self.recent_ttl
+        end_time = datetime.fromisoformat(str(query_dict["endtime"]))
+        if end_time.tzinfo is not None:
+            # the end time of a timezone aware TimeFrame, compared in UTC as the naive ones
+            end_time = end_time.astimezone(timezone.utc).replace(tzinfo=None)
+        now = datetime.now(timezone.utc).replace(tzinfo=None)
+        if end_time < now - self.settled_after:
+            return None
+        return self.recent_ttl
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, hashlib.sha256(key.encode("utf-8")).hexdigest() + ".json")
+
+    def _entry_paths(self) -> list:
+        return [os.path.join(self.directory, name) for name in os.listdir(self.directory) if name.endswith(".json")]
+
+    def _remove(self, path: str):
+        try:
+            size = os.path.getsize(path)
+            os.remove(path)
+            self._total_bytes -= size
+        except OSError:
+            pass
+
+    def _evict(self):
+        if self._total_bytes <= self.max_bytes:
+            return
+        paths = sorted(self._entry_paths(), key=os.path.getmtime)
+        for path in paths:
+            if self._total_bytes <= self.max_bytes:
+                break
+            self._remove(path)
+
+
+class EventCache:
+    """
+    A bounded in-memory cache of the SingleResult returned by EarthquakeQuery.search_by_event_id(). Every event id in
+    the "ids" property of an event is registered as an alias of the same entry, so a lookup by the id of any network
+    contributing to the event hits the cache.
+
+    The entries expire after ttl seconds, and the least recently used entry is removed when the cache holds more than
+    max_size events. The numbers of hits and misses can be used to tune the size of the cache.
+
+    Example:
+    ::
+        cache = EventCache(max_size=10000, ttl=300)
+        EarthquakeQuery.set_event_cache(cache)
+        EarthquakeQuery.search_by_event_id("usc000lvb5")
+        EarthquakeQuery.search_by_event_id("pt14089000")  # an alias of usc000lvb5, answered by the cache
+        print(cache.get_hits(), cache.get_misses())
+    """
+
+    def __init__(self, max_size: int = 1024, ttl: float = 300):
+        """
+        Create an EventCache.
+
+        :param max_size: the maximum number of events in the cache
+        :type max_size: int
+        :param ttl: the time to live of an event in seconds, None means an event never expires
+        :type ttl: float
+        :raises TypeError: If max_size is not an integer
+        :raises ValueError: If max_size is less than 1, or ttl is negative
+        """
+        if not isinstance(max_size, int):
+            raise TypeError("max_size should be an integer")
+        if max_size < 1:
+            raise ValueError("max_size should be at least 1")
+        if ttl is not None and ttl < 0:
+            raise ValueError("ttl should not be negative")
+
+        self.max_size = max_size
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        # entries are ordered from the least recently used to the most recently used
+        self._entries = OrderedDict()
+        self._aliases = {}
+        self._hits = 0
+        self._misses = 0
+
+    def get(self, event_id: str):
+        """
+        Get the cached result of the event.
+
+        :param event_id: the event id, or any alias of the event
+        :return: SingleResult, the cached result, or None if the event is not cached or has expired
+        """
+        with self._lock:
+            key = self._aliases.get(event_id)
+            if key is None:
+                self._misses += 1
+                return None
+            expires, result, aliases = self._entries[key]
+            if expires is not None and expires < time.time():
+                self._remove(key)
+                self._misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self._hits += 1
+            return result
+
+    def put(self, event_id: str, result):
+        """
+        Cache the result of the event, under the event id and all its aliases.
+
+        :param event_id: the event id used to search the event
+        :param result: SingleResult, the result of the event
+        """
+        aliases = {event_id, result.get_raw_json()["id"]}
+        aliases.update(one for one in result.get_raw_properties().get("ids", "").split(",") if one)
+        with self._lock:
+            key = result.get_raw_json()["id"]
+            # the aliases may belong to an older entry of the same event, replace it
+            for alias in aliases:
+                if alias in self._aliases:
+                    self._remove(self._aliases[alias])
+            expires = None if self.ttl is None else time.time() + self.ttl
+            self._entries[key] = (expires, result, aliases)
+            for alias in aliases:
+                self._aliases[alias] = key
+            while len(self._entries) > self.max_size:
+                self._remove(next(iter(self._entries)))
+
+    def clear(self):
+        """
+        Remove all the events of the cache, the numbers of hits and misses are kept
+        """
+        with self._lock:
+            self._entries.clear()
+            self._aliases.clear()
+
+    def get_hits(self) -> int:
+        """
+        Get the number of lookups answered by the cache
+
+        :return: int, the number of hits
+        """
+        return self._hits
+
+    def get_misses(self) -> int:
+        """
+        Get the number of lookups not answered by the cache
+
+        :return: int, the number of misses
+        """
+        return self._misses
+
+    def get_size(self) -> int:
+        """
+        Get the number of events in the cache
+
+        :return: int, the number of events
+        """
+        return len(self._entries)
+
+    def _remove(self, key: str):
+        expires, result, aliases = self._entries.pop(key)
+        for alias in aliases:
+            if self._aliases.get(alias) == key:
+                del self._aliases[alias]
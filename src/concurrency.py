@@ -0,0 +1,308 @@
+import contextvars
+import math
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, wait, FIRST_COMPLETED
+
+from .deadline import _wait_timeout
+
+
+class _HttpStatusError(ValueError):
+    # the ValueError raised for a response which is not 200, keeping its status code
+    def __init__(self, status_code: int, text: str):
+        super().__init__(text)
+        self.status_code = status_code
+
+
+class AdaptiveConcurrency:
+    """
+    An adaptive limit of the requests in flight, adjusted by additive increase and multiplicative decrease (AIMD).
+
+    Every request completed in a healthy state adds 1 / limit to the limit, i.e. the limit grows by one after a full
+    limit of healthy requests. A request throttled by the server, i.e. 429 Too Many Requests or 503 Service
+    Unavailable, or much slower than the usual latency, multiplies the limit by the decrease factor. The requests
+    already in flight when the limit is decreased do not decrease it again, so a burst of throttled responses only
+    backs off once.
+
+    The controller can be shared by several queries, so that they adjust a single limit together. It does not see the
+    throttled responses retried by the RetryPolicy of a session, see EarthquakeQuery.set_adaptive_concurrency().
+
+    Example:
+    ::
+        concurrency = AdaptiveConcurrency(initial_limit=4, max_limit=32)
+        query = EarthquakeQuery(time=time_frames).set_adaptive_concurrency(concurrency)
+        result = query.search()
+        print(concurrency.get_limit(), concurrency.get_history())
+    """
+
+    _throttled_status_codes = frozenset([429, 503])
+
+    def __init__(self, initial_limit: int = 4, min_limit: int = 1, max_limit: int = 32, decrease_factor: float = 0.5,
+                 latency_factor: float = 3.0, history_size: int = 1000):
+        """
+        Create an AdaptiveConcurrency.
+
+        :param initial_limit: the limit of the requests in flight at first
+        :type initial_limit: int
+        :param min_limit: the minimum limit
+        :type min_limit: int
+        :param max_limit: the maximum limit, which is also the number of worker threads of a search
+        :type max_limit: int
+        :param decrease_factor: the factor multiplying the limit on a throttled or slow request, in (0, 1)
+        :type decrease_factor: float
+        :param latency_factor: how many times slower than the usual latency a request is considered a latency spike,
+                               None to ignore the latency
+        :type latency_factor: float
+        :param history_size: the number of adjustments kept in the history
+        :type history_size: int
+        :raises TypeError: If any limit is not an integer
+        :raises ValueError: If the limits are not 1 <= min_limit <= initial_limit <= max_limit, or decrease_factor is
+                            not in (0, 1), or latency_factor is not greater than 1
+        """
+        if not all(isinstance(one, int) for one in [initial_limit, min_limit, max_limit]):
+            raise TypeError("initial_limit, min_limit and max_limit should be integers")
+        if not 1 <= min_limit <= initial_limit <= max_limit:
+            raise ValueError("the limits should be 1 <= min_limit <= initial_limit <= max_limit")
+        if not 0 < decrease_factor < 1:
+            raise ValueError("decrease_factor should be in the range of (0, 1)")
+        if latency_factor is not None and latency_factor <= 1:
+            raise ValueError("latency_factor should be greater than 1")
+
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.decrease_factor = decrease_factor
+        self.latency_factor = latency_factor
+        self._condition = threading.Condition()
+        self._limit = initial_limit
+        self._in_flight = 0
+        self._credit = 0.0
+        # the smoothed latency of the healthy requests
+        self._latency = None
+        # increased on every decrease, a request started before it does not decrease the limit again
+        self._epoch = 0
+        self._history = deque(maxlen=history_size)
+
+    def run(self, fetch, *args):
+        """
+        Run a request once the number of requests in flight is under the limit, and adjust the limit by its outcome.
+
+        :param fetch: the function sending the request
+        :param args: the arguments of the fetch
+        :return: the result of the fetch
+        :raises Exception: the error raised by the fetch
+        :raises TimeoutError: If the deadline of the search passes while waiting for the limit
+        """
+        with self._condition:
+            while self._in_flight >= self._limit:
+                self._condition.wait(_wait_timeout())
+            self._in_flight += 1
+            epoch = self._epoch
+        start = time.monotonic()
+        try:
+            result = fetch(*args)
+        except _HttpStatusError as e:
+            if e.status_code in AdaptiveConcurrency._throttled_status_codes:
+                self._decrease(epoch, "throttled")
+            raise
+        finally:
+            with self._condition:
+                self._in_flight -= 1
+                self._condition.notify_all()
+        self._on_success(epoch, time.monotonic() - start)
+        return result
+
+    def get_limit(self) -> int:
+        """
+        Get the current limit of the requests in flight
+
+        :return: int, the current limit
+        """
+        return self._limit
+
+    def get_history(self) -> list:
+        """
+        Get the latest adjustments of the limit, from the oldest to the newest
+
+        :return: list, the tuples of the time of an adjustment, the limit after it, and its reason, which is
+                 "increase", "throttled" or "latency"
+        """
+        with self._condition:
+            return list(self._history)
+
+    def _on_success(self, epoch: int, latency: float):
+        with self._condition:
+            if self.latency_factor is not None and self._latency is not None and \
+                    latency > self._latency * self.latency_factor:
+                spike = True
+            else:
+                spike = False
+                self._latency = latency if self._latency is None else 0.9 * self._latency + 0.1 * latency
+        if spike:
+            self._decrease(epoch, "latency")
+            return
+        with self._condition:
+            if self._limit >= self.max_limit:
+                return
+            self._credit += 1.0 / self._limit
+            if self._credit >= 1:
+                self._credit = 0.0
+                self._limit += 1
+                self._history.append((time.time(), self._limit, "increase"))
+                self._condition.notify_all()
+
+    def _decrease(self, epoch: int, reason: str):
+        with self._condition:
+            if epoch != self._epoch:
+                return
+            self._epoch += 1
+            self._credit = 0.0
+            self._limit = max(self.min_limit, int(self._limit * self.decrease_factor))
+            self._history.append((time.time(), self._limit, reason))
+
+
+class HedgePolicy:
+    """
+    The policy of hedging the slow requests. A request still outstanding after the given percentile of the latencies
+    observed so far is sent again, and the response of whichever copy answers first is used. The slower copy is
+    abandoned: it is cancelled if it has not started, otherwise its response is discarded when it arrives.
+
+    The hedged requests are capped to a ratio of all the requests, so that the hedging never adds more than this ratio
+    of traffic to the USGS earthquake API. No request is hedged until enough latencies are observed to estimate the
+    percentile.
+
+    The policy can be shared by several queries, so that they learn the latencies and share the cap together.
+
+    Example:
+    ::
+        hedge_policy = HedgePolicy(percentile=95, max_hedge_ratio=0.05)
+        query = EarthquakeQuery(time=time_frames).set_max_workers(16).set_hedge_policy(hedge_policy)
+        result = query.search()
+    """
+
+    def __init__(self, percentile: float = 95, max_hedge_ratio: float = 0.05, min_samples: int = 20,
+                 min_delay: float = 0.05, window_size: int = 1000):
+        """
+        Create a HedgePolicy.
+
+        :param percentile: the percentile of the latencies after which a request is hedged, in (0, 100)
+        :type percentile: float
+        :param max_hedge_ratio: the maximum ratio of the hedged requests to all the requests, in [0, 1]
+        :type max_hedge_ratio: float
+        :param min_samples: the number of latencies observed before any request is hedged
+        :type min_samples: int
+        :param min_delay: the minimum delay in seconds before a request is hedged
+        :type min_delay: float
+        :param window_size: the number of the latest latencies used to estimate the percentile
+        :type window_size: int
+        :raises TypeError: If min_samples or window_size is not an integer
+        :raises ValueError: If percentile is not in (0, 100), or max_hedge_ratio is not in [0, 1], or min_samples is
+                            negative, or min_delay is negative, or window_size is less than 1
+        """
+        if not isinstance(min_samples, int) or not isinstance(window_size, int):
+            raise TypeError("min_samples and window_size should be integers")
+        if not 0 < percentile < 100:
+            raise ValueError("percentile should be in the range of (0, 100)")
+        if not 0 <= max_hedge_ratio <= 1:
+            raise ValueError("max_hedge_ratio should be in the range of [0, 1]")
+        if min_samples < 0 or min_delay < 0 or window_size < 1:
+            raise ValueError("min_samples and min_delay should not be negative, and window_size should be at least 1")
+
+        self.percentile = percentile
+        self.max_hedge_ratio = max_hedge_ratio
+        self.min_samples = min_samples
+        self.min_delay = min_delay
+        self._lock = threading.Lock()
+        self._latencies = deque(maxlen=window_size)
+        self._requests = 0
+        self._hedged = 0
+
+    def run(self, fetch, *args):
+        """
+        Run a request, and hedge it if it is still outstanding after the percentile of the latencies.
+
+        :param fetch: the function sending the request
+        :param args: the arguments of the fetch
+        :return: the result of the copy answering first
+        :raises Exception: the error raised by the request, or by the first copy failing if both copies fail
+        """
+        with self._lock:
+            self._requests += 1
+        primary = self._start(fetch, args)
+        delay = self.get_delay()
+        if delay is None:
+            return primary.result()
+        done, _ = wait([primary], timeout=delay)
+        if done or not self._take_hedge():
+            return primary.result()
+        pending = [primary, self._start(fetch, args)]
+        error = None
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                pending.remove(future)
+                if future.exception() is None:
+                    for other in pending:
+                        other.cancel()
+                    return future.result()
+                if error is None:
+                    error = future.exception()
+        raise error
+
+    def get_delay(self):
+        """
+        Get the delay after which an outstanding request is hedged
+
+        :return: float, the delay in seconds, or None if not enough latencies are observed yet
+        """
+        with self._lock:
+            if len(self._latencies) < max(1, self.min_samples):
+                return None
+            latencies = sorted(self._latencies)
+        index = max(0, math.ceil(self.percentile / 100 * len(latencies)) - 1)
+        return max(self.min_delay, latencies[index])
+
+    def get_requests(self) -> int:
+        """
+        Get the number of requests run with the policy, not counting the hedged copies
+
+        :return: int, the number of requests
+        """
+        return self._requests
+
+    def get_hedged(self) -> int:
+        """
+        Get the number of requests hedged
+
+        :return: int, the number of hedged copies sent
+        """
+        return self._hedged
+
+    def _take_hedge(self) -> bool:
+        # hedge only if the hedged requests stay within the ratio of all the requests
+        with self._lock:
+            if self._hedged + 1 > self.max_hedge_ratio * self._requests:
+                return False
+            self._hedged += 1
+            return True
+
+    def _start(self, fetch, args) -> Future:
+        # run the fetch in its own thread, so that the caller can stop waiting for it
+        future = Future()
+
+        def target():
+            if not future.set_running_or_notify_cancel():
+                return
+            start = time.monotonic()
+            try:
+                result = fetch(*args)
+            except BaseException as e:
+                future.set_exception(e)
+                return
+            with self._lock:
+                self._latencies.append(time.monotonic() - start)
+            future.set_result(result)
+
+        # run in the context of the caller, so that the deadline of the search also covers the copies
+        threading.Thread(target=contextvars.copy_context().run, args=(target,), daemon=True).start()
+        return future
@@ -0,0 +1,171 @@
+import csv
+import io
+import math
+from array import array
+from datetime import datetime
+
+
+class CsvResultCollection:
+    """
+    This is a class that represents a collection of earthquake events returned in the csv format of the USGS API.
+    The csv responses are parsed straight into typed columns, one for each field of the csv format, instead of a
+    nested dict for each event, which saves both the parsing time and the memory for the analysis of many events.
+
+    Column types:
+        - time, updated: array of int, epoch time in milliseconds
+        - latitude, longitude, depth, mag, gap, dmin, rms, nst, magNst, horizontalError, depthError, magError:
+          array of float, a missing value is NaN
+        - other columns, i.e. id, magType, net, place, type, status: list of str
+
+    The getters mirror the ones of ResultCollection, so the same ordering types are supported: time, mag, latitude,
+    longitude, depth, and any other column name.
+
+    Note:
+        The csv format has no "ids" property, so the duplicated events of different requests are detected by their
+        id only.
+
+    Sample usage:
+    ::
+        earthquake_query = EarthquakeQuery(time=[TimeFrame(datetime(2010, 1, 1), datetime(2011, 1, 1))])
+        result = earthquake_query.search_csv()
+        magnitudes = result.get_column("mag")
+        data = result.get_data_by_keys(["id", "time", "mag"], order_by="mag")
+    """
+
+    _time_columns = {"time", "updated"}
+    _float_columns = {"latitude", "longitude", "depth", "mag", "gap", "dmin", "rms", "nst", "magNst",
+                      "horizontalError", "depthError", "magError"}
+
+    def __init__(self, csv_list: list):
+        """
+        Constructor:
+            Parse the csv responses into columns, remove all duplicating earthquakes when initializing
+
+        :param csv_list: list, the csv text returned by all the requests made in the query
+        """
+        self.csv_raw = csv_list
+        header = []
+        rows = []
+        result_id_set = set()
+        for text in csv_list:
+            reader = csv.reader(io.StringIO(text))
+            response_header = next(reader, None)
+            if response_header is None:
+                continue
+            if not header:
+                header = response_header
+            id_index = response_header.index("id")
+            for row in reader:
+                if row and row[id_index] not in result_id_set:
+                    result_id_set.add(row[id_index])
+                    rows.append(row)
+
+        values = list(zip(*rows)) if rows else [()] * len(header)
+        self._columns = {}
+        for name, column in zip(header, values):
+            if name in CsvResultCollection._time_columns:
+                self._columns[name] = array("q", [self._parse_time(value) for value in column])
+            elif name in CsvResultCollection._float_columns:
+                self._columns[name] = array("d", [float(value) if value else math.nan for value in column])
+            else:
+                self._columns[name] = list(column)
+        self._size = len(rows)
+
+    @staticmethod
+    def _parse_time(value: str) -> int:
+        # the csv format uses ISO8601 time in UTC, i.e. 2014-01-01T00:01:16.610Z
+        return round(datetime.fromisoformat(value.replace("Z", "+00:00")).timestamp() * 1000)
+
+    def _get_order(self, order_by, descending) -> list:
+        column = self.get_column(order_by)
+        if isinstance(column, array) and column.typecode == "d":
+            # NaN cannot be compared, so the missing values are ordered as the smallest values, i.e. first in the
+            # ascending order and last in the descending order
+            order = sorted(range(self._size), key=lambda i: (column[i] == column[i], column[i]), reverse=descending)
+        else:
+            order = sorted(range(self._size), key=column.__getitem__, reverse=descending)
+        return order
+
+    def get_column_names(self) -> list:
+        """
+        Get the names of the columns, in the order of the csv format
+
+        :return: list, the names of the columns
+        """
+        return list(self._columns.keys())
+
+    def get_column(self, name: str):
+        """
+        Get a column of the collection, in the order of the responses
+
+        :param name: str, the name of the column
+        :return: array or list, the values of the column, see the column types of the class
+        :raises KeyError: If there is no column with the name
+        """
+        if name not in self._columns:
+            raise KeyError(name + " is not a column of the csv format")
+        return self._columns[name]
+
+    def get_data_by_keys(self, keys: list, order_by="time", descending=True) -> list:
+        """
+        Get a simplified version of the results by specifying which columns the users wish to get.
+
+        :param keys: list, list of column names
+        :param order_by: str, ordering type
+        :param descending: bool, indicates whether the ordered data should be in descending order
+        :return: list, list of dicts of the columns of the earthquakes
+        """
+        columns = [self.get_column(key) for key in keys]
+        return [dict(zip(keys, [column[i] for column in columns])) for i in self._get_order(order_by, descending)]
+
+    def get_all_magnitudes(self, order_by="mag", descending=True) -> list:
+        """
+        Get a list of earthquake magnitudes
+
+        :param order_by: str, ordering mode
+        :param descending: bool, indicates whether it is in descending order
+        :return: list, list of earthquake magnitudes
+        """
+        column = self.get_column("mag")
+        return [column[i] for i in self._get_order(order_by, descending)]
+
+    def get_all_depths(self, order_by="time", descending=True) -> list:
+        """
+        Get a list of earthquake depths
+
+        :param order_by: str, ordering mode
+        :param descending: bool, indicates whether it is in descending order
+        :return: list, list of float representing depths
+        """
+        column = self.get_column("depth")
+        return [column[i] for i in self._get_order(order_by, descending)]
+
+    def get_all_coordinates(self, order_by="time", descending=True) -> list:
+        """
+        Get a list of earthquake coordinates, in the same [longitude, latitude] order as GeoJSON
+
+        :param order_by: str, ordering mode
+        :param descending: bool, indicates whether it is in descending order
+        :return: list, list of lists representing coordinates
+        """
+        longitude, latitude = self.get_column("longitude"), self.get_column("latitude")
+        return [[longitude[i], latitude[i]] for i in self._get_order(order_by, descending)]
+
+    def get_all_3d_coordinates(self, order_by="time", descending=True) -> list:
+        """
+        Get a list of earthquake coordinates, with the third dimension representing depth
+
+        :param order_by: str, ordering mode
+        :param descending: bool, indicates whether it is in descending order
+        :return: list, list of lists representing coordinates
+        """
+        longitude, latitude, depth = self.get_column("longitude"), self.get_column("latitude"), self.get_column("depth")
+        return [[longitude[i], latitude[i], depth[i]] for i in self._get_order(order_by, descending)]
+
+    def get_number_of_earthquakes(self) -> int:
+        """
+        Get the total number of earthquakes in the query result
+
+        :return: int, integer presenting the total number of earthquakes
+        """
+        return self._size
@@ -0,0 +1,103 @@
+import contextvars
+import time
+
+
+class Deadline:
+    """
+    A deadline covering all the requests of a search, including the concurrent requests, their retries, the waits for
+    the rate limiter and the geocoding. Each request only gets the time left before the deadline, so a stuck
+    connection cannot hang the search, and no request or retry is started once the deadline has passed. The requests
+    beyond the deadline raise TimeoutError.
+
+    A deadline is passed to EarthquakeQuery.search() and EarthquakeQuery.search_by_event_id(), or used as a context
+    manager to cover everything in its block, i.e. the geocoding of GeoRectangle and GeoCircle and several searches.
+    A deadline inside another one never ends later than the outer one.
+
+    Example:
+    ::
+        result = query.search(deadline=2.0, partial=True)
+
+        with Deadline(5.0):
+            query = EarthquakeQuery(location=[GeoRectangle("Los Angeles")])
+            result = query.search()
+
+    Note:
+        The time of each request is bounded by the timeout of its connection and of every read of the response, so a
+        response still arriving in small pieces may run slightly past the deadline.
+    """
+
+    def __init__(self, timeout: float):
+        """
+        Create a Deadline, which starts counting when created.
+
+        :param timeout: the time in seconds before the deadline
+        :type timeout: float
+        :raises TypeError: If timeout is not a number
+        :raises ValueError: If timeout is not positive
+        """
+        if not isinstance(timeout, (int, float)) or isinstance(timeout, bool):
+            raise TypeError("timeout should be numeric")
+        if timeout <= 0:
+            raise ValueError("timeout should be positive")
+
+        self.timeout = timeout
+        self._expires = time.monotonic() + timeout
+        self._tokens = []
+
+    def remaining(self) -> float:
+        """
+        Get the time left before the deadline
+
+        :return: float, the time left in seconds, 0 if the deadline has passed
+        """
+        return max(0.0, self._expires - time.monotonic())
+
+    def expired(self) -> bool:
+        """
+        Check whether the deadline has passed
+
+        :return: bool, true if the deadline has passed
+        """
+        return time.monotonic() >= self._expires
+
+    def check(self):
+        """
+        Raise TimeoutError if the deadline has passed
+
+        :raises TimeoutError: If the deadline has passed
+        """
+        if self.expired():
+            raise TimeoutError("The deadline of " + str(self.timeout) + " seconds has passed")
+
+    def __enter__(self) -> 'Deadline':
+        outer = _current_deadline.get()
+        if outer is not None:
+            self._expires = min(self._expires, outer._expires)
+        self._tokens.append(_current_deadline.set(self))
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        _current_deadline.reset(self._tokens.pop())
+
+
+_current_deadline = contextvars.ContextVar("deadline", default=None)
+
+
+def _get_deadline():
+    # the deadline of the current search, or None if there is no deadline
+    return _current_deadline.get()
+
+
+def _wait_timeout(timeout: float = None):
+    # bound the timeout of a wait by the time left before the deadline, raise TimeoutError if it has passed
+    deadline = _current_deadline.get()
+    if deadline is None:
+        return timeout
+    deadline.check()
+    remaining = deadline.remaining()
+    return remaining if timeout is None else min(timeout, remaining)
+
+
+def _submit(executor, fn, *args):
+    # submit to an executor in the context of the caller, so that the deadline also covers the worker threads
+    return executor.submit(contextvars.copy_context().run, fn, *args)
@@ -1,9 +1,21 @@
-import requests
+import asyncio
+import collections
+import contextlib
+import json
+import queue
+import threading
 import urllib.parse
+import warnings
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 from typing import List
 
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
 from .timeframe import TimeFrame
-from .location import Location
+from .location import Location, Rectangle
 from .enum.catalog import Catalog
 from .enum.contributor import Contributor
 from .enum.magnitude import Magnitude
@@ -11,9 +23,19 @@ from .enum.origin import Origin
 from .enum.alertlevel import Alertlevel
 from .enum.delete import Delete
 from .enum.supersede import Supersede
-from .result_collection import ResultCollection
+from .result_collection import ResultCollection, FailedCell, _AliasIndex
+from .csv_result import CsvResultCollection
 from .single_result import SingleResult
 from .key import _Key
+from .async_transport import AsyncTransport, default_async_transport
+from .session import HttpSession, _DefaultSession
+from .retry import RateLimiter
+from .cache import ResponseCache, EventCache
+from .stream import _GeoJSONFeatureStream
+from .singleflight import _SingleFlight
+from .concurrency import AdaptiveConcurrency, HedgePolicy, _HttpStatusError
+from .deadline import Deadline, _submit
+from .planner import _MergedRectangle, _coalesce_time_frames, _coalesce_locations, _area
 
 
 class EarthquakeQuery:
@@ -122,6 +144,12 @@ class EarthquakeQuery:
     }
 
     _base_url = "https://earthquake.usgs.gov/fdsnws/event/1/query"
+    _count_url = "https://earthquake.usgs.gov/fdsnws/event/1/count"
+    _event_cache = None
+    # the identical requests in flight from different threads are sent only once
+    _single_flight = _SingleFlight()
+    # the number of features each concurrent request of search_iter() can read ahead of the caller
+    _stream_buffer_size = 1000
 
     def __init__(self, time: List[TimeFrame] = None, location: List[Location] = None, **kwargs):
         """
@@ -170,6 +198,19 @@ class EarthquakeQuery:
         self._query_time: List[TimeFrame] = [None] if time is None else time
         self._query_location: List[Location] = [None] if location is None else location
 
+        self._max_workers = 1
+        self._adaptive_split = False
+        self._count_planner = False
+        self._coalesce = False
+        self._request_cost = 0
+        self._columnar = False
+        self._keep = "first"
+        self._networks = None
+        self._adaptive_concurrency = None
+        self._hedge_policy = None
+        self._session = None
+        self._response_cache = None
+
         # set kwagrs
         method_param_map = {}
         for key, value in kwargs.items():
@@ -214,27 +255,224 @@ class EarthquakeQuery:
         _Key.key_path = key_path
 
     @staticmethod
-    def search_by_event_id(event_id: str) -> SingleResult:
+    def set_default_session(session: HttpSession):
+        """
+        Set the process-wide HttpSession, used by every query without its own session and by the geocoding.
+        :param session: the session shared by the process
+        :raises TypeError:  If the session is not a HttpSession
+        """
+        if not isinstance(session, HttpSession):
+            raise TypeError("session should be an instance of HttpSession")
+
+        _DefaultSession.session = session
+
+    @staticmethod
+    def set_rate_limiter(rate_limiter: RateLimiter):
+        """
+        Set the process-wide RateLimiter, which limits the rate of all the requests sent by every HttpSession,
+        including the retries and the geocoding.
+        :param rate_limiter: the rate limiter shared by the process, None to stop limiting the rate
+        :raises TypeError:  If the rate_limiter is not a RateLimiter or None
+        """
+        if rate_limiter is not None and not isinstance(rate_limiter, RateLimiter):
+            raise TypeError("rate_limiter should be an instance of RateLimiter")
+
+        _DefaultSession.rate_limiter = rate_limiter
+
+    @staticmethod
+    def set_event_cache(event_cache: EventCache):
+        """
+        Set the process-wide EventCache used by search_by_event_id() and search_by_event_id_async().
+        :param event_cache: the cache of the events, None to stop using the cache
+        :raises TypeError:  If the event_cache is not an EventCache or None
+        """
+        if event_cache is not None and not isinstance(event_cache, EventCache):
+            raise TypeError("event_cache should be an instance of EventCache")
+
+        EarthquakeQuery._event_cache = event_cache
+
+    @staticmethod
+    def search_by_event_id(event_id: str, session: HttpSession = None, deadline=None) -> SingleResult:
         """
         Search for the detail of an earthquake by its event id.
+        If an EventCache is set with set_event_cache(), the cached result of the event is returned when available.
+        The searches of the same event id running at the same time in different threads share a single request.
+        :param event_id: the event id of the earthquake
+        :param session: the session used to send the request. If it is None, the default session is used.
+        :param deadline: the time in seconds, or the Deadline, before which the search including its retries should
+                         finish. If it is None, the search is only bounded by the Deadline it runs in, if any.
+        :return: SingleResult
+        :raises ValueError:  If the HTTP response from the USGS Earthquake API is not 200
+        :raises TimeoutError: If the deadline passes before the search finishes
+        """
+        with EarthquakeQuery._deadline_scope(deadline):
+            return EarthquakeQuery._search_by_event_id(event_id, session)
+
+    @staticmethod
+    def _search_by_event_id(event_id: str, session: HttpSession = None) -> SingleResult:
+        url = EarthquakeQuery._build_event_id_url(event_id)
+        event_cache = EarthquakeQuery._event_cache
+        if event_cache is not None:
+            result = event_cache.get(event_id)
+            if result is not None:
+                return result
+        if session is None:
+            session = _DefaultSession.get()
+        result = SingleResult(EarthquakeQuery._single_flight.do(url, EarthquakeQuery._get_json, session, url))
+        if event_cache is not None:
+            event_cache.put(event_id, result)
+        return result
+
+    @staticmethod
+    def _deadline_scope(deadline):
+        # the scope of the deadline of a search, which covers the threads started by the search as well
+        if deadline is None:
+            return contextlib.nullcontext()
+        if isinstance(deadline, Deadline):
+            return deadline
+        return Deadline(deadline)
+
+    @staticmethod
+    def _get_json(session: HttpSession, url: str):
+        r = session.get(url)
+        if r.status_code == 200:
+            return r.json()
+        else:
+            raise _HttpStatusError(r.status_code, r.text)
+
+    @staticmethod
+    def iter_by_event_ids(event_ids, max_workers: int = 8, session: HttpSession = None):
+        """
+        Search for the detail of many earthquakes by their event ids concurrently, and yield the results as soon as
+        they are completed.
+
+        The duplicated event ids are searched only once. When an earthquake is found, all the event ids in its "ids"
+        property are known to be its aliases, and the aliases not searched yet are answered without sending another
+        request. The error of an event id is yielded with the event id instead of stopping the other searches.
+
+        Example:
+        ::
+            for event_id, result in EarthquakeQuery.iter_by_event_ids(event_ids, max_workers=16):
+                if isinstance(result, Exception):
+                    print("failed to search " + event_id)
+                else:
+                    print(result.get_title())
+
+        :param event_ids: an iterable of event ids
+        :param max_workers: the maximum number of requests in flight at the same time
+        :type max_workers: int
+        :param session: the session used to send the requests. If it is None, the default session is used.
+        :type session: HttpSession
+        :return: generator, the tuples of an event id and its SingleResult, or the Exception raised by its search
+        :raises TypeError: If any event id is not a string
+        :raises ValueError: If max_workers is less than 1
+        """
+        event_ids = list(dict.fromkeys(event_ids))
+        if not all(isinstance(event_id, str) for event_id in event_ids):
+            raise TypeError("event id should be a string")
+        if not isinstance(max_workers, int) or max_workers < 1:
+            raise ValueError("max_workers should be a positive integer")
+
+        aliases = {}
+        remaining = iter(event_ids)
+        in_flight = {}
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            while True:
+                # the requests are submitted lazily, so that the aliases found so far are not searched again
+                while len(in_flight) < max_workers:
+                    event_id = next(remaining, None)
+                    if event_id is None:
+                        break
+                    if event_id in aliases:
+                        yield event_id, aliases[event_id]
+                        continue
+                    in_flight[_submit(executor, EarthquakeQuery.search_by_event_id, event_id, session)] = event_id
+                if not in_flight:
+                    return
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    event_id = in_flight.pop(future)
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        yield event_id, e
+                        continue
+                    for alias in result.get_raw_properties().get("ids", "").split(","):
+                        if alias:
+                            aliases[alias] = result
+                    yield event_id, result
+
+    @staticmethod
+    def search_by_event_ids(event_ids, max_workers: int = 8, session: HttpSession = None) -> dict:
+        """
+        Search for the detail of many earthquakes by their event ids concurrently, see iter_by_event_ids().
+
+        :param event_ids: an iterable of event ids
+        :param max_workers: the maximum number of requests in flight at the same time
+        :type max_workers: int
+        :param session: the session used to send the requests. If it is None, the default session is used.
+        :type session: HttpSession
+        :return: dict, the SingleResult of each event id, or the Exception raised by its search, in the order of the
+                 event ids
+        :raises TypeError: If any event id is not a string
+        :raises ValueError: If max_workers is less than 1
+        """
+        event_ids = list(dict.fromkeys(event_ids))
+        results = dict(EarthquakeQuery.iter_by_event_ids(event_ids, max_workers, session))
+        return {event_id: results[event_id] for event_id in event_ids}
+
+    @staticmethod
+    async def search_by_event_id_async(event_id: str, transport: AsyncTransport = None) -> SingleResult:
+        """
+        Search for the detail of an earthquake by its event id without blocking the event loop.
+
+        Example:
+        ::
+            async with AiohttpTransport() as transport:
+                results = await asyncio.gather(*[EarthquakeQuery.search_by_event_id_async(event_id, transport)
+                                                 for event_id in event_ids])
+
         :param event_id: the event id of the earthquake
+        :param transport: the transport used to send the request. If it is None, a default transport is created for
+                          this call and closed afterwards.
+        :type transport: AsyncTransport
         :return: SingleResult
         :raises ValueError:  If the HTTP response from the USGS Earthquake API is not 200
         """
+        url = EarthquakeQuery._build_event_id_url(event_id)
+        event_cache = EarthquakeQuery._event_cache
+        if event_cache is not None:
+            result = event_cache.get(event_id)
+            if result is not None:
+                return result
+        if transport is not None:
+            result = SingleResult(await EarthquakeQuery._get_json_async(transport, url))
+        else:
+            async with default_async_transport() as transport:
+                result = SingleResult(await EarthquakeQuery._get_json_async(transport, url))
+        if event_cache is not None:
+            event_cache.put(event_id, result)
+        return result
+
+    @staticmethod
+    def _build_event_id_url(event_id: str) -> str:
         if not isinstance(event_id, str):
             raise TypeError("event id should be a string")
         query_dict = {}
         query_dict["format"] = "geojson"
         query_dict["eventid"] = event_id
         payload_str = urllib.parse.urlencode(query_dict, safe=':')
-        url = EarthquakeQuery._base_url + "?" + payload_str
-        r = requests.get(url)
-        if r.status_code == 200:
-            return SingleResult(r.json())
+        return EarthquakeQuery._base_url + "?" + payload_str
+
+    @staticmethod
+    async def _get_json_async(transport: AsyncTransport, url: str):
+        status_code, text = await transport.get(url)
+        if status_code == 200:
+            return json.loads(text)
         else:
-            raise ValueError(r.text)
+            raise _HttpStatusError(status_code, text)
 
-    def search(self) -> ResultCollection:
+    def search(self, partial: bool = False, deadline=None) -> ResultCollection:
         """
         Search for a collection of results according to the parameters.
 
@@ -242,14 +480,547 @@ class EarthquakeQuery:
             The default value for parameter limit is set to 20000, because the USGS earthquake API can support up to
             20000 results in a single query
 
+        Note:
+            If the max workers is set to more than 1 with set_max_workers(), the requests for every
+            (TimeFrame, Location) pair are sent concurrently. The results are still combined in the same order as the
+            sequential search, so the returned ResultCollection does not depend on which request finishes first.
+            With set_adaptive_concurrency(), the number of requests in flight is adjusted automatically instead.
+
+        Note:
+            If the adaptive split is turned on with set_adaptive_split(), a request returning as many events as the
+            limit is split into smaller requests until none of them is truncated by the limit.
+
+        Note:
+            If the count planner is turned on with set_count_planner(), the requests are planned by plan_search()
+            before any event is downloaded.
+
+        Note:
+            If the coalescing is turned on with set_coalesce() together with the adaptive split or the count planner,
+            the overlapping time frames and rectangles are merged before the requests are sent.
+
+        Note:
+            The identical requests sent at the same time by different threads, i.e. the same search of two queries
+            with the same parameters, share a single request to the USGS earthquake API and its response.
+
+        Note:
+            If partial is True, the failed requests do not fail the search. The returned ResultCollection holds the
+            results of the requests that succeeded, and the failed (TimeFrame, Location) pairs are available with its
+            get_failed_cells(). retry_failed() searches the failed pairs again and merges their results.
+
+        Note:
+            If a deadline is given, every request of the search, including its retries and the waits for the rate
+            limiter, only gets the time left before the deadline, and no request is sent after it. With partial=True,
+            the requests not finished by the deadline are returned as failed pairs with a TimeoutError.
+
+        :param partial: whether to return the results that succeeded when some requests fail
+        :type partial: bool
+        :param deadline: the time in seconds, or the Deadline, before which the search should finish. If it is None,
+                         the search is only bounded by the Deadline it runs in, if any.
+        :type deadline: float or Deadline
         :return: ResultCollection, the collection of the results of the query
+        :raises ValueError: If the HTTP response of any request is not 200 and partial is False. When several requests
+                            fail, the error of the first failed (TimeFrame, Location) pair is raised.
+        :raises TimeoutError: If the deadline passes before the search finishes and partial is False
+        """
+        with self._deadline_scope(deadline):
+            cells = self.plan_search() if self._count_planner else self._get_query_cells(self._adaptive_split)
+            if not partial:
+                return self._new_result_collection(self._query_cells(cells))
+            failures = {}
+            result = self._query_cells(cells, failures=failures)
+            return self._new_result_collection(result, [failures[path] for path in sorted(failures)])
+
+    def retry_failed(self, result: ResultCollection, deadline=None) -> ResultCollection:
+        """
+        Search the failed (TimeFrame, Location) pairs of a partial result again, and merge their results into it. The
+        pairs failing again are kept in the failed pairs of the result, so retry_failed() can be called until the
+        result is complete.
+
+        Example:
+        ::
+            result = query.search(partial=True)
+            while not result.is_complete():
+                time.sleep(10)
+                query.retry_failed(result)
+
+        :param result: the partial result returned by search(partial=True)
+        :type result: ResultCollection
+        :param deadline: the time in seconds, or the Deadline, before which the retries should finish, the pairs not
+                         finished by then are kept in the failed pairs
+        :type deadline: float or Deadline
+        :return: ResultCollection, the result with the results of the failed pairs merged
+        :raises TypeError: If result is not a ResultCollection
+        """
+        if not isinstance(result, ResultCollection):
+            raise TypeError("result should be an instance of ResultCollection")
+        failures = {}
+        with self._deadline_scope(deadline):
+            responses = self._query_cells([(one.time, one.location) for one in result.get_failed_cells()],
+                                          failures=failures)
+        return result.merge(self._new_result_collection(responses, [failures[path] for path in sorted(failures)]))
+
+    def _new_result_collection(self, responses: list, failed_cells: list = None) -> ResultCollection:
+        return ResultCollection(responses, failed_cells, columnar=self._columnar, keep=self._keep,
+                                networks=self._networks)
+
+    def _get_query_cells(self, split_saturated: bool = False) -> list:
+        # every (TimeFrame, Location) pair needs one request, ordered by time first and then by location
+        # the pairs are only coalesced if the caller splits the requests reaching the limit, or pages through them,
+        # otherwise a merged request could be truncated by the limit and lose events of the original requests
+        query_time, query_location = self._query_time, self._query_location
+        if self._coalesce and split_saturated:
+            query_time = _coalesce_time_frames(query_time)
+            if self._request_cost > 0:
+                query_location = _coalesce_locations(query_location, self._request_cost,
+                                                     self._estimate_density(query_time, query_location),
+                                                     self._query_limit or None)
+            else:
+                query_location = _coalesce_locations(query_location)
+        cells = []
+        for time_single in query_time:
+            for location_single in query_location:
+                cells.append((time_single, location_single))
+        return cells
+
+    def _estimate_density(self, query_time: list, query_location: list) -> float:
+        # count the events in the envelope of all the rectangles once for each time frame, the densest time frame
+        # decides the density, so that a merged request is never estimated under the limit by mistake
+        rectangles = [one for one in query_location if isinstance(one, Rectangle)]
+        if len(rectangles) < 2 or None in query_location:
+            return 0
+        bounds = (min(one.min_latitude for one in rectangles), min(one.min_longitude for one in rectangles),
+                  max(one.max_latitude for one in rectangles), max(one.max_longitude for one in rectangles))
+        if bounds[3] - bounds[1] > 360 or _area(*bounds) == 0:
+            return 0
+        envelope = Rectangle(*bounds)
+        counts = self._count_cells([(time_single, envelope) for time_single in query_time])
+        return max(counts) / _area(*bounds)
+
+    @staticmethod
+    def _filter_response(location: Location, response):
+        # a merged rectangle covers more area than the rectangles it replaces, drop the events outside of them
+        if isinstance(location, _MergedRectangle):
+            return location.filter_response(response)
+        return response
+
+    def _query_cells(self, cells: list, response_format: str = "geojson", failures: dict = None) -> list:
+        # Each request is identified by a path: the index of its cell, followed by the index of each split leading to
+        # it. Sorting the responses by path keeps the order of the cells whatever order the requests finish in.
+        # If failures is a dict, the failed requests are saved in it by path instead of failing the search.
+        if response_format == "geojson":
+            fetch = self._query_single
+        else:
+            def fetch(time_single, location_single):
+                return self._query_single(time_single, location_single, response_format)
+        tasks = [((index,), time_single, location_single) for index, (time_single, location_single) in enumerate(cells)]
+        responses = {}
+        if self._get_worker_count() == 1 or (len(tasks) == 1 and not self._adaptive_split):
+            while tasks:
+                path, time_single, location_single = tasks.pop(0)
+                try:
+                    response = fetch(time_single, location_single)
+                except Exception as e:
+                    if failures is None:
+                        raise
+                    failures[path] = FailedCell(time_single, location_single, e)
+                    continue
+                # query the halves of a split request before moving on to the next cell
+                tasks[0:0] = self._split_saturated(path, time_single, location_single, response, responses)
+        else:
+            self._query_cells_concurrently(tasks, responses, fetch, failures)
+        return [responses[path] for path in sorted(responses)]
+
+    def _get_worker_count(self) -> int:
+        # with the adaptive concurrency, the threads wait for the adjusted limit, so there is a thread for the maximum
+        if self._adaptive_concurrency is not None:
+            return self._adaptive_concurrency.max_limit
+        return self._max_workers
+
+    def _query_cells_concurrently(self, tasks: list, responses: dict, fetch, failures: dict = None):
+        errors = {}
+        with ThreadPoolExecutor(max_workers=self._get_worker_count()) as executor:
+            future_to_task = {_submit(executor, fetch, task[1], task[2]): task for task in tasks}
+            while future_to_task:
+                done, _ = wait(future_to_task, return_when=FIRST_COMPLETED)
+                for future in done:
+                    path, time_single, location_single = future_to_task.pop(future)
+                    if future.cancelled():
+                        continue
+                    try:
+                        response = future.result()
+                    except Exception as e:
+                        if failures is not None:
+                            failures[path] = FailedCell(time_single, location_single, e)
+                            continue
+                        errors[path] = e
+                        # the search fails anyway, so do not send the requests that have not started yet
+                        for pending in future_to_task:
+                            pending.cancel()
+                        continue
+                    if errors:
+                        continue
+                    for task in self._split_saturated(path, time_single, location_single, response, responses):
+                        future_to_task[_submit(executor, fetch, task[1], task[2])] = task
+        if errors:
+            raise errors[min(errors)]
+
+    def _split_saturated(self, path: tuple, time: TimeFrame, location: Location, response,
+                         responses: dict) -> list:
+        # keep the response unless it is truncated by the limit and the adaptive split is on,
+        # otherwise return the tasks querying the halves of the request
+        if not self._adaptive_split or self._query_limit == 0:
+            responses[path] = self._filter_response(location, response)
+            return []
+        # a csv response has a header line followed by a line for each event
+        count = len(response["features"]) if isinstance(response, dict) else len(response.splitlines()) - 1
+        if count < self._query_limit:
+            responses[path] = self._filter_response(location, response)
+            return []
+        halves = self._split_cell(time, location)
+        if halves is None:
+            warnings.warn("The request " + self._build_query_url(time, location) + " returns " +
+                          str(count) + " events, which reaches the limit, but it cannot be split")
+            responses[path] = self._filter_response(location, response)
+            return []
+        return [(path + (index,), half_time, half_location) for index, (half_time, half_location) in enumerate(halves)]
+
+    def search_csv(self) -> CsvResultCollection:
+        """
+        Search for a collection of results according to the parameters, in the csv format of the USGS earthquake API.
+
+        The csv format is much smaller than the GeoJSON format, and is parsed directly into typed columns, i.e. time,
+        latitude, longitude, depth, mag, id, etc. It suits the analysis of the basic properties of many earthquakes.
+        The detail of the earthquakes only available in GeoJSON, i.e. the "ids" property and the title, is not
+        available.
+
+        The max workers, the adaptive split, the count planner, the coalescing and the response cache work as in
+        search().
+
+        :return: CsvResultCollection, the collection of the results of the query in columns
+        :raises ValueError: If the HTTP response of any request is not 200
+        """
+        cells = self.plan_search() if self._count_planner else self._get_query_cells(self._adaptive_split)
+        return CsvResultCollection(self._query_cells(cells, "csv"))
+
+    def search_iter(self):
+        """
+        Search for the results according to the parameters, and yield the earthquakes one at a time.
+
+        Unlike search(), the responses are parsed incrementally while they are downloaded, and the earthquakes are
+        yielded as soon as they are parsed, so the memory used does not grow with the size of the responses. The
+        earthquakes are yielded in the same order as in the ResultCollection returned by search(), and the duplicated
+        earthquakes of different requests are found in the same way. An earthquake yielded cannot be replaced, so the
+        first copy of every earthquake is yielded whatever the keep policy is.
+
+        If the max workers is set to more than 1, the requests are sent concurrently, and each of them reads at most
+        a bounded number of earthquakes ahead of the caller. The adaptive split, the count planner and the coalescing
+        work as in search(). The response cache is not used, because the responses are never held as a whole.
+
+        Example:
+        ::
+            query = EarthquakeQuery(time=[TimeFrame(datetime(2010, 1, 1), datetime(2015, 1, 1))])
+            for earthquake in query.search_iter():
+                print(earthquake["properties"]["title"])
+
+        :return: generator, the earthquakes in GeoJSON Feature format
+        :raises ValueError: If the HTTP response of any request is not 200
+        """
+        cells = self.plan_search() if self._count_planner else self._get_query_cells(self._adaptive_split)
+        if self._max_workers == 1 or len(cells) == 1:
+            features = (feature for time_single, location_single in cells
+                        for feature in self._stream_cell(time_single, location_single))
+        else:
+            features = self._stream_cells_concurrently(cells)
+        aliases = _AliasIndex()
+        try:
+            for feature in features:
+                if aliases.add(feature)[1]:
+                    yield feature
+        finally:
+            features.close()
+
+    def _stream_single(self, time: TimeFrame, location: Location):
+        r = self.get_session().get(self._build_query_url(time, location), stream=True)
+        try:
+            if r.status_code != 200:
+                raise _HttpStatusError(r.status_code, r.text)
+            yield from _GeoJSONFeatureStream(r.iter_content(chunk_size=64 * 1024))
+        finally:
+            r.close()
+
+    def _stream_cell(self, time: TimeFrame, location: Location):
+        count = 0
+        for feature in self._stream_single(time, location):
+            count += 1
+            coordinates = feature["geometry"]["coordinates"]
+            if not isinstance(location, _MergedRectangle) or location.contains(coordinates[0], coordinates[1]):
+                yield feature
+        if not self._adaptive_split or self._query_limit == 0 or count < self._query_limit:
+            return
+        # the features already yielded are yielded again by the halves, and skipped by search_iter()
+        halves = self._split_cell(time, location)
+        if halves is None:
+            warnings.warn("The request " + self._build_query_url(time, location) + " returns " + str(count) +
+                          " events, which reaches the limit, but it cannot be split")
+            return
+        for half_time, half_location in halves:
+            yield from self._stream_cell(half_time, half_location)
+
+    def _stream_cells_concurrently(self, cells: list):
+        stopped = threading.Event()
+        cell_queues = [queue.Queue(maxsize=EarthquakeQuery._stream_buffer_size) for _ in cells]
+
+        def put(cell_queue, item) -> bool:
+            # wait for the caller to read ahead, unless the caller has stopped reading
+            while not stopped.is_set():
+                try:
+                    cell_queue.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+
+        def produce(cell_queue, time_single, location_single):
+            features = self._stream_cell(time_single, location_single)
+            try:
+                for feature in features:
+                    if not put(cell_queue, feature):
+                        return
+                put(cell_queue, None)
+            except Exception as e:
+                put(cell_queue, e)
+            finally:
+                features.close()
+
+        # the cells are submitted in order, so the cell read by the caller has always started
+        executor = ThreadPoolExecutor(max_workers=self._max_workers)
+        futures = []
+        try:
+            for cell_queue, (time_single, location_single) in zip(cell_queues, cells):
+                futures.append(_submit(executor, produce, cell_queue, time_single, location_single))
+            for cell_queue in cell_queues:
+                while True:
+                    item = cell_queue.get()
+                    if item is None:
+                        break
+                    if isinstance(item, Exception):
+                        raise item
+                    yield item
+        finally:
+            stopped.set()
+            # the cells not started are cancelled by hand, shutdown() only cancels them since Python 3.9
+            for future in futures:
+                future.cancel()
+            executor.shutdown(wait=False)
+
+    def search_pages(self, page_size: int = 1000, prefetch: int = 1):
+        """
+        Search for the results according to the parameters page by page, and yield each page as soon as it is
+        downloaded.
+
+        Every (TimeFrame, Location) pair is walked with the offset and limit parameters of the USGS earthquake API,
+        page_size events at a time in the ascending order of time, until a page has fewer events than page_size. The
+        next pages are downloaded in the background while the caller processes the current one, so the download and
+        the processing overlap. The earthquakes already yielded by an earlier page are skipped, the same as search(), and
+        the copy kept of an earthquake duplicated within a page is chosen by the keep policy.
+
+        The page size replaces the limit of the query, so no page is truncated and the adaptive split is not needed.
+        The coalescing and the response cache work as in search().
+
+        Example:
+        ::
+            query = EarthquakeQuery(time=[TimeFrame(datetime(2010, 1, 1), datetime(2015, 1, 1))])
+            for page in query.search_pages(page_size=2000, prefetch=2):
+                print(page.get_all_magnitudes())
+
+        :param page_size: the number of events of each page, at most 20000
+        :type page_size: int
+        :param prefetch: the number of pages downloaded ahead of the caller
+        :type prefetch: int
+        :return: generator, the ResultCollection of each page
+        :raises TypeError: If page_size or prefetch is not an integer
+        :raises ValueError: If page_size is not in [1, 20000], or prefetch is negative, or the HTTP response of any
+                            request is not 200
+        """
+        if not isinstance(page_size, int) or not isinstance(prefetch, int):
+            raise TypeError("page_size and prefetch should be integers")
+        if not 1 <= page_size <= 20000:
+            raise ValueError("page_size should be in the range of [1, 20000]")
+        if prefetch < 0:
+            raise ValueError("prefetch should not be negative")
+
+        # every request is paged through until its last page, so the coalesced requests lose no event
+        cells = self._get_query_cells(True)
+        # the pages downloading, each of them is (the index of its cell, its offset, its future)
+        window = collections.deque()
+        next_cell, next_offset = 0, 1
+        aliases = _AliasIndex()
+        executor = ThreadPoolExecutor(max_workers=prefetch + 1)
+        try:
+            while True:
+                while next_cell < len(cells) and len(window) <= prefetch:
+                    time_single, location_single = cells[next_cell]
+                    window.append((next_cell, next_offset, _submit(
+                        executor, self._query_single, time_single, location_single, "geojson", next_offset, page_size)))
+                    next_offset += page_size
+                if not window:
+                    return
+                cell_index, offset, future = window.popleft()
+                response = future.result()
+                if len(response["features"]) < page_size:
+                    # the last page of the cell, drop the pages after it
+                    while window and window[0][0] == cell_index:
+                        window.popleft()[2].cancel()
+                    if next_cell == cell_index:
+                        next_cell, next_offset = next_cell + 1, 1
+                response = self._filter_response(cells[cell_index][1], response)
+                # the copies of the earthquakes of the earlier pages are skipped, the copies within the page are
+                # left to the keep policy of its ResultCollection
+                first_index = len(aliases)
+                features = [feature for feature in response["features"] if aliases.add(feature)[0] >= first_index]
+                if features:
+                    yield self._new_result_collection([dict(response, features=features)])
+        finally:
+            for _, _, future in window:
+                future.cancel()
+            executor.shutdown(wait=False)
+
+    @staticmethod
+    def _split_cell(time: TimeFrame, location: Location):
+        # split the TimeFrame in halves, or the Rectangle if the TimeFrame cannot be split, None if neither can be split
+        if time is not None and time.can_split():
+            return [(half, location) for half in time.split()]
+        if location is None or (isinstance(location, Rectangle) and location.can_split()):
+            rectangle = Rectangle() if location is None else location
+            return [(time, half) for half in rectangle.split()]
+        return None
+
+    def plan_search(self) -> list:
+        """
+        Plan the requests of search() with the count endpoint of the USGS earthquake API, which only returns the
+        number of matching events and is much cheaper than the query endpoint.
+
+        Every (TimeFrame, Location) pair is counted first. A pair with more events than the limit is split in halves
+        and counted again until every pair is under the limit, and a pair that cannot be split is planned as it is with
+        a warning. Then the neighbouring time frames of the same location are merged as long as the merged pair is
+        still under the limit, and the pairs without any event are dropped. Only the time frames that touch or overlap each other are merged, so the plan covers the same events as the
+        original pairs.
+
+        :return: list, the planned (TimeFrame, Location) pairs
+        :raises ValueError: If the HTTP response of any count request is not 200
+        """
+        cells = self._get_query_cells(True)
+        if self._query_limit == 0:
+            return cells
+        planned = []
+        pending = list(zip(cells, self._count_cells(cells)))
+        while pending:
+            to_count = []
+            for (time_single, location_single), count in pending:
+                halves = None if count <= self._query_limit else self._split_cell(time_single, location_single)
+                if halves is None:
+                    if count > self._query_limit:
+                        warnings.warn("The request " + self._build_query_url(time_single, location_single) +
+                                      " counts " + str(count) + " events, which is over the limit, but it cannot be "
+                                      "split")
+                    planned.append((time_single, location_single, count))
+                else:
+                    to_count.extend(halves)
+            pending = list(zip(to_count, self._count_cells(to_count)))
+        planned = self._merge_sparse_cells(planned)
+        if not planned:
+            # no event at all, a single request still gives an empty result with the metadata
+            return cells[:1]
+        return planned
+
+    def _merge_sparse_cells(self, planned: list) -> list:
+        # group the counted pairs by location, keeping the order in which the locations first appear
+        location_order = []
+        time_by_location = {}
+        for time_single, location_single, count in planned:
+            if id(location_single) not in time_by_location:
+                location_order.append(location_single)
+                time_by_location[id(location_single)] = []
+            time_by_location[id(location_single)].append((time_single, count))
+
+        merged = []
+        for location_single in location_order:
+            times = time_by_location[id(location_single)]
+            for time_single, count in times:
+                if time_single is None and count > 0:
+                    merged.append((time_single, location_single))
+            times = sorted([one for one in times if one[0] is not None], key=lambda one: one[0].start_time)
+            current, current_count = None, 0
+            for time_single, count in times:
+                if current is not None and current.update_after == time_single.update_after and \
+                        time_single.start_time <= current.end_time and current_count + count <= self._query_limit:
+                    # an empty time frame is merged too, so that it does not break the chain of neighbours
+                    current = TimeFrame(current.start_time, max(current.end_time, time_single.end_time),
+                                        current.update_after)
+                    current_count += count
+                    continue
+                if count == 0:
+                    continue
+                if current is not None:
+                    merged.append((current, location_single))
+                current, current_count = time_single, count
+            if current is not None:
+                merged.append((current, location_single))
+        return merged
+
+    async def search_async(self, transport: AsyncTransport = None, max_concurrency: int = None) -> ResultCollection:
         """
-        result = []
-        for time_single in self._query_time:
-            for location_single in self._query_location:
-                result.append(self._query_single(time_single, location_single))
-        result_object = ResultCollection(result)
-        return result_object
+        Search for a collection of results according to the parameters without blocking the event loop.
+
+        The requests for every (TimeFrame, Location) pair run concurrently on the event loop, with at most
+        max_concurrency requests in flight. The results are combined in the same order as search(). If one request
+        fails, or the calling task is cancelled, the requests that are still running are cancelled.
+
+        Example:
+        ::
+            query = EarthquakeQuery(time=[TimeFrame(datetime(2010, 1, 1), datetime(2015, 1, 1))])
+            result = await query.search_async(max_concurrency=8)
+
+        :param transport: the transport used to send the requests. If it is None, a default transport is created for
+                          this call and closed afterwards.
+        :type transport: AsyncTransport
+        :param max_concurrency: the maximum number of requests in flight at the same time. If it is None, the max
+                                workers of the query is used.
+        :type max_concurrency: int
+        :return: ResultCollection, the collection of the results of the query
+        :raises ValueError: If the HTTP response of any request is not 200. When several requests fail, the error of
+                            the first failed (TimeFrame, Location) pair is raised.
+        """
+        if max_concurrency is None:
+            max_concurrency = self._max_workers
+        if not isinstance(max_concurrency, int) or max_concurrency < 1:
+            raise ValueError("max_concurrency should be a positive integer")
+        if transport is not None:
+            return self._new_result_collection(await self._query_concurrently_async(transport, max_concurrency))
+        async with default_async_transport() as transport:
+            return self._new_result_collection(await self._query_concurrently_async(transport, max_concurrency))
+
+    async def _query_concurrently_async(self, transport: AsyncTransport, max_concurrency: int) -> list:
+        semaphore = asyncio.Semaphore(max_concurrency)
+
+        async def query_single(time_single, location_single):
+            async with semaphore:
+                response = await self._get_json_async(transport, self._build_query_url(time_single, location_single))
+                return self._filter_response(location_single, response)
+
+        tasks = [asyncio.ensure_future(query_single(time_single, location_single))
+                 for time_single, location_single in self._get_query_cells()]
+        try:
+            await asyncio.wait(tasks, return_when=asyncio.FIRST_EXCEPTION)
+        finally:
+            # cancel the requests left if one of them failed or the caller is cancelled
+            for task in tasks:
+                task.cancel()
+        errors = [task.exception() for task in tasks if task.done() and not task.cancelled()]
+        errors = [error for error in errors if error is not None]
+        if errors:
+            raise errors[0]
+        return [task.result() for task in tasks]
 
     def _build_other_extension_params_dic(self) -> dict:
         result = {}
@@ -279,7 +1050,7 @@ class EarthquakeQuery:
                     result[key] = value
         return result
 
-    def _query_single(self, time: TimeFrame, location: Location):
+    def _build_query_dict(self, time: TimeFrame, location: Location) -> dict:
         # set the format to geojson
         query_dict = {"format": "geojson"}
         # if the time needs to be set
@@ -296,15 +1067,61 @@ class EarthquakeQuery:
             query_dict.update(location.get_value())
         # update the query dict with other and extension parameters
         query_dict.update(self._build_other_extension_params_dic())
+        return query_dict
+
+    def _build_query_url(self, time: TimeFrame, location: Location) -> str:
         # build the parameters in URL
-        payload_str = urllib.parse.urlencode(query_dict, safe=':')
+        payload_str = urllib.parse.urlencode(self._build_query_dict(time, location), safe=':')
         # append the url
-        url = EarthquakeQuery._base_url + "?" + payload_str
-        r = requests.get(url)
+        return EarthquakeQuery._base_url + "?" + payload_str
+
+    def _query_single(self, time: TimeFrame, location: Location, response_format: str = "geojson", offset: int = None,
+                      limit: int = None):
+        query_dict = self._build_query_dict(time, location)
+        query_dict["format"] = response_format
+        if offset is not None:
+            # a page of the events ordered by time ascending, so the events added while paging are on the last pages
+            query_dict.update({"offset": offset, "limit": limit, "orderby": "time-asc"})
+        if self._response_cache is not None:
+            response = self._response_cache.get(query_dict)
+            if response is not None:
+                return response
+        url = EarthquakeQuery._base_url + "?" + urllib.parse.urlencode(query_dict, safe=':')
+        if self._hedge_policy is not None:
+            # hedge under the single flight, otherwise the hedged copy would wait for the request it hedges
+            return EarthquakeQuery._single_flight.do(url, self._hedge_policy.run, self._fetch_single, url, query_dict)
+        return EarthquakeQuery._single_flight.do(url, self._fetch_single, url, query_dict)
+
+    def _fetch_single(self, url: str, query_dict: dict):
+        if self._adaptive_concurrency is not None:
+            # only the requests actually sent take part in the limit, not the cache hits or the shared requests,
+            # whose latencies tell nothing about the load of the USGS earthquake API
+            return self._adaptive_concurrency.run(self._send_single, url, query_dict)
+        return self._send_single(url, query_dict)
+
+    def _send_single(self, url: str, query_dict: dict):
+        r = self.get_session().get(url)
         if r.status_code == 200:
-            return r.json()
+            response = r.json() if query_dict["format"] == "geojson" else r.text
+            if self._response_cache is not None:
+                self._response_cache.put(query_dict, response)
+            return response
         else:
-            raise ValueError(r.text)
+            raise _HttpStatusError(r.status_code, r.text)
+
+    def _count_single(self, time: TimeFrame, location: Location) -> int:
+        query_dict = self._build_query_dict(time, location)
+        # the count endpoint counts every matching event, the limit only applies to the query endpoint
+        query_dict.pop("limit", None)
+        url = EarthquakeQuery._count_url + "?" + urllib.parse.urlencode(query_dict, safe=':')
+        return EarthquakeQuery._single_flight.do(url, EarthquakeQuery._get_json, self.get_session(), url)["count"]
+
+    def _count_cells(self, cells: list) -> list:
+        if self._max_workers == 1 or len(cells) <= 1:
+            return [self._count_single(time_single, location_single) for time_single, location_single in cells]
+        with ThreadPoolExecutor(max_workers=min(self._max_workers, len(cells))) as executor:
+            futures = [_submit(executor, self._count_single, *cell) for cell in cells]
+            return [future.result() for future in futures]
 
     def get_query_parameters(self) -> dict:
         """
@@ -379,6 +1196,330 @@ class EarthquakeQuery:
         """
         return self._query_location
 
+    def set_max_workers(self, max_workers: int) -> 'EarthquakeQuery':
+        """
+        Set the number of worker threads used by search() to send the requests of different (TimeFrame, Location)
+        pairs concurrently.
+
+        The default max_workers is 1, which sends the requests one by one.
+
+        :param max_workers: the maximum number of requests in flight at the same time
+        :type max_workers: int
+        :raises TypeError: If max_workers is not an integer
+        :raises ValueError: If max_workers is less than 1
+        :return: EarthquakeQuery, self
+        """
+        if not isinstance(max_workers, int) or isinstance(max_workers, bool):
+            raise TypeError("set_max_workers input should be an integer")
+        if max_workers < 1:
+            raise ValueError("set_max_workers input should be at least 1")
+        self._max_workers = max_workers
+        return self
+
+    def get_max_workers(self) -> int:
+        """
+        Get the number of worker threads used by search()
+
+        :return: int, the maximum number of requests in flight at the same time
+        """
+        return self._max_workers
+
+    def set_adaptive_concurrency(self, adaptive_concurrency: AdaptiveConcurrency) -> 'EarthquakeQuery':
+        """
+        Set the AdaptiveConcurrency of search(), which adjusts the number of requests in flight by the latency and the
+        throttling of the USGS earthquake API instead of the fixed max workers. The limit grows while the requests are
+        healthy, and is cut when a request is throttled with 429 or 503 or is much slower than usual. Only the requests
+        actually sent to the USGS earthquake API are limited, the responses from the response cache and the requests
+        shared with other threads are not.
+
+        Note:
+            If the session has a RetryPolicy retrying 429 and 503, the throttled responses are retried inside the
+            session, and the AdaptiveConcurrency only sees the last response and the latency of all the attempts
+            together. Leave 429 and 503 out of the status codes of the RetryPolicy, i.e.
+            RetryPolicy(status_codes=(500, 502, 504)), so that the throttling reaches the AdaptiveConcurrency.
+
+        :param adaptive_concurrency: the adaptive limit of the requests in flight, None to use the max workers
+        :type adaptive_concurrency: AdaptiveConcurrency
+        :raises TypeError: If adaptive_concurrency is not an AdaptiveConcurrency or None
+        :return: EarthquakeQuery, self
+        """
+        if adaptive_concurrency is not None and not isinstance(adaptive_concurrency, AdaptiveConcurrency):
+            raise TypeError("set_adaptive_concurrency input should be an instance of AdaptiveConcurrency")
+        self._adaptive_concurrency = adaptive_concurrency
+        return self
+
+    def get_adaptive_concurrency(self) -> AdaptiveConcurrency:
+        """
+        Get the AdaptiveConcurrency of search()
+
+        :return: AdaptiveConcurrency, the adaptive limit of the requests in flight, or None if the max workers is used
+        """
+        return self._adaptive_concurrency
+
+    def set_hedge_policy(self, hedge_policy: HedgePolicy) -> 'EarthquakeQuery':
+        """
+        Set the HedgePolicy of the query. A request of search() still outstanding after a percentile of the observed
+        latencies is sent again, and the copy answering first is used, which cuts the time a few very slow requests
+        add to a search of many requests. The hedged requests are capped to a ratio of all the requests.
+
+        :param hedge_policy: the policy of hedging the slow requests, None to stop hedging
+        :type hedge_policy: HedgePolicy
+        :raises TypeError: If hedge_policy is not a HedgePolicy or None
+        :return: EarthquakeQuery, self
+        """
+        if hedge_policy is not None and not isinstance(hedge_policy, HedgePolicy):
+            raise TypeError("set_hedge_policy input should be an instance of HedgePolicy")
+        self._hedge_policy = hedge_policy
+        return self
+
+    def get_hedge_policy(self) -> HedgePolicy:
+        """
+        Get the HedgePolicy of the query
+
+        :return: HedgePolicy, the policy of hedging the slow requests, or None if the requests are not hedged
+        """
+        return self._hedge_policy
+
+    def set_session(self, session: HttpSession) -> 'EarthquakeQuery':
+        """
+        Set the HttpSession used by this query. The connections of the session are reused by all the requests of the
+        query, including the concurrent requests of search().
+
+        By default, the query uses the process-wide session set by EarthquakeQuery.set_default_session().
+
+        :param session: the session used by this query
+        :type session: HttpSession
+        :raises TypeError: If the session is not a HttpSession
+        :return: EarthquakeQuery, self
+        """
+        if not isinstance(session, HttpSession):
+            raise TypeError("set_session input should be an instance of HttpSession")
+        self._session = session
+        return self
+
+    def get_session(self) -> HttpSession:
+        """
+        Get the HttpSession used by this query
+
+        :return: HttpSession, the session of the query, or the process-wide session if the query has no session
+        """
+        if self._session is None:
+            return _DefaultSession.get()
+        return self._session
+
+    def set_response_cache(self, response_cache: ResponseCache) -> 'EarthquakeQuery':
+        """
+        Set the ResponseCache of the query. The responses of search() are read from the cache when they are cached and
+        not expired, otherwise they are downloaded and saved in the cache.
+
+        :param response_cache: the cache of the responses, None to stop using the cache
+        :type response_cache: ResponseCache
+        :raises TypeError: If response_cache is not a ResponseCache or None
+        :return: EarthquakeQuery, self
+        """
+        if response_cache is not None and not isinstance(response_cache, ResponseCache):
+            raise TypeError("set_response_cache input should be an instance of ResponseCache")
+        self._response_cache = response_cache
+        return self
+
+    def get_response_cache(self) -> ResponseCache:
+        """
+        Get the ResponseCache of the query
+
+        :return: ResponseCache, the cache of the responses, or None if the query does not use a cache
+        """
+        return self._response_cache
+
+    def set_adaptive_split(self, adaptive_split: bool) -> 'EarthquakeQuery':
+        """
+        Set whether search() splits the requests truncated by the limit.
+
+        The USGS earthquake API returns at most 20000 events in a single request. When the adaptive split is on, a
+        request returning as many events as the limit is split into two requests on the halves of its TimeFrame, or
+        on the halves of its Rectangle if the TimeFrame is too short, recursively until no request reaches the limit.
+        A Circle location cannot be split, so a warning is raised when it still reaches the limit.
+
+        The default adaptive_split is False.
+
+        :param adaptive_split: whether to split the requests reaching the limit
+        :type adaptive_split: bool
+        :raises TypeError: If adaptive_split is not a bool
+        :return: EarthquakeQuery, self
+        """
+        if not isinstance(adaptive_split, bool):
+            raise TypeError("set_adaptive_split input should be a bool")
+        self._adaptive_split = adaptive_split
+        return self
+
+    def get_adaptive_split(self) -> bool:
+        """
+        Get whether search() splits the requests truncated by the limit
+
+        :return: bool, whether the adaptive split is on
+        """
+        return self._adaptive_split
+
+    def set_count_planner(self, count_planner: bool) -> 'EarthquakeQuery':
+        """
+        Set whether search() plans its requests with plan_search() before downloading the events.
+
+        The count planner sends one cheap count request for each (TimeFrame, Location) pair, then merges the sparse
+        neighbouring time frames and splits the dense ones, so that fewer requests are sent and none of them is
+        truncated by the limit. It pays off for the searches of many time frames or of time frames with more events
+        than the limit.
+
+        The default count_planner is False.
+
+        :param count_planner: whether to plan the requests with the count endpoint
+        :type count_planner: bool
+        :raises TypeError: If count_planner is not a bool
+        :return: EarthquakeQuery, self
+        """
+        if not isinstance(count_planner, bool):
+            raise TypeError("set_count_planner input should be a bool")
+        self._count_planner = count_planner
+        return self
+
+    def get_count_planner(self) -> bool:
+        """
+        Get whether search() plans its requests with the count endpoint
+
+        :return: bool, whether the count planner is on
+        """
+        return self._count_planner
+
+    def set_coalesce(self, coalesce: bool) -> 'EarthquakeQuery':
+        """
+        Set whether search() merges the overlapping time frames and rectangles before sending the requests.
+
+        The time frames with the same update after time which overlap or touch each other are merged into one, which
+        covers exactly the same time. A rectangle nested in another one is dropped, and the overlapping rectangles are
+        merged into their envelope as long as the envelope is not larger than the two rectangles together. The events
+        of a merged rectangle outside all its original rectangles are removed from the responses, so the result is
+        the same as without the coalescing, with fewer requests and without downloading the overlaps twice. The
+        Circle locations are not merged. See set_request_cost() to merge the rectangles that do not overlap.
+
+        A merged request may reach the limit where the original requests would not, so the coalescing only takes
+        effect when the requests reaching the limit are split again, i.e. with set_adaptive_split() or
+        set_count_planner(), and in search_pages(), which pages through every request. Otherwise the requests are
+        sent as they are.
+
+        The default coalesce is False.
+
+        :param coalesce: whether to merge the overlapping time frames and rectangles
+        :type coalesce: bool
+        :raises TypeError: If coalesce is not a bool
+        :return: EarthquakeQuery, self
+        """
+        if not isinstance(coalesce, bool):
+            raise TypeError("set_coalesce input should be a bool")
+        self._coalesce = coalesce
+        return self
+
+    def get_coalesce(self) -> bool:
+        """
+        Get whether search() merges the overlapping time frames and rectangles
+
+        :return: bool, whether the coalescing is on
+        """
+        return self._coalesce
+
+    def set_columnar(self, columnar: bool) -> 'EarthquakeQuery':
+        """
+        Set whether the ResultCollection returned by search() stores the time, magnitude, significance, coordinates
+        and id of the earthquakes in NumPy arrays, which makes sorting and getting these values much faster on large
+        results. It requires NumPy, see the Columnar storage of ResultCollection.
+
+        The default columnar is False.
+
+        :param columnar: whether the results are stored in NumPy arrays
+        :type columnar: bool
+        :raises TypeError: If columnar is not a bool
+        :raises ImportError: If columnar is True and NumPy is not installed
+        :return: EarthquakeQuery, self
+        """
+        if not isinstance(columnar, bool):
+            raise TypeError("set_columnar input should be a bool")
+        if columnar and numpy is None:
+            raise ImportError("The columnar storage requires numpy, please install it with pip install numpy")
+        self._columnar = columnar
+        return self
+
+    def get_columnar(self) -> bool:
+        """
+        Get whether the results are stored in NumPy arrays
+
+        :return: bool, whether the columnar storage is on
+        """
+        return self._columnar
+
+    def set_keep_policy(self, keep: str, networks: list = None) -> 'EarthquakeQuery':
+        """
+        Set which copy of a duplicated earthquake is kept in the ResultCollection returned by search(), when several
+        requests or networks return the same earthquake. See the Duplicated earthquakes of ResultCollection.
+
+        The default keep policy is "first". search_pages() applies it to the copies within each page, and search_iter()
+        always yields the first copy, because an earthquake yielded cannot be replaced.
+
+        :param keep: "first" for the first copy returned, "updated" for the most recently updated copy, or "network" for
+                     the copy from the first network in networks
+        :type keep: str
+        :param networks: the preferred networks of the network keep policy, from the most preferred, i.e. ["us", "ci"]
+        :type networks: list
+        :raises ValueError: If keep is not a keep policy, or keep is "network" without networks
+        :return: EarthquakeQuery, self
+        """
+        if keep not in ("first", "updated", "network"):
+            raise ValueError("set_keep_policy input should be first, updated or network")
+        if keep == "network" and not networks:
+            raise ValueError("networks should be given to keep the copies of the preferred networks")
+        self._keep = keep
+        self._networks = networks
+        return self
+
+    def get_keep_policy(self) -> str:
+        """
+        Get which copy of a duplicated earthquake is kept
+
+        :return: str, the keep policy
+        """
+        return self._keep
+
+    def set_request_cost(self, request_cost: float) -> 'EarthquakeQuery':
+        """
+        Set the cost of sending a request used by the coalescing, in the number of events that could be downloaded in
+        the same time.
+
+        With a request cost, the coalescing also merges the rectangles that do not overlap, i.e. many small rectangles
+        clustered in a region, whenever one request on their envelope is estimated to be cheaper than the separate
+        requests. The number of events in the envelope is estimated from the density of the events, which is counted
+        once for each time frame with the count endpoint of the USGS earthquake API. A merged request is never
+        estimated to reach the limit. The events outside the original rectangles are removed from the responses, so
+        the result is the same as without the coalescing.
+
+        The default request_cost is 0, which only merges the overlapping rectangles.
+
+        :param request_cost: the cost of a request in the number of events, i.e. 500
+        :type request_cost: float
+        :raises TypeError: If request_cost is not a number
+        :raises ValueError: If request_cost is negative
+        :return: EarthquakeQuery, self
+        """
+        if not isinstance(request_cost, (int, float)) or isinstance(request_cost, bool):
+            raise TypeError("set_request_cost input should be numeric")
+        if request_cost < 0:
+            raise ValueError("set_request_cost input should not be negative")
+        self._request_cost = request_cost
+        return self
+
+    def get_request_cost(self) -> float:
+        """
+        Get the cost of sending a request used by the coalescing
+
+        :return: float, the cost of a request in the number of events
+        """
+        return self._request_cost
+
     def set_catalog(self, catalog: Catalog) -> 'EarthquakeQuery':
         """
         Set the catalog of the earthquake query. Limit the events from a specified catalog.
@@ -1,9 +1,9 @@
 import os
 from enum import Enum
 
-import requests
 import urllib.parse
 from .address import _Address
+from .session import _DefaultSession
 
 
 class IncludeNeighborhood(Enum):
@@ -234,7 +234,7 @@ class _GeocodeQuery:
         if self.get_max_results() is not None:
             request_dict['maxResults'] = self.get_max_results()
         request_dict['key'] = self.get_key()
-        r = requests.get(self.query_url, request_dict)
+        r = _DefaultSession.get().get(self.query_url, request_dict)
         return r.json()
 
     def get_address_boxing(self, response):
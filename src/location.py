@@ -53,6 +53,8 @@ class Location(ABC):
 
 
 class Rectangle(Location):
+    _min_split_degree = 0.0001
+
     def __init__(self, min_latitude=-90, min_longitude=-180, max_latitude=90, max_longitude=180):
         """
         Build a rectangle location. Requests may use any combination of these parameters.
@@ -182,6 +184,32 @@ class Rectangle(Location):
         result["maxlongitude"] = self.max_longitude
         return result
 
+    def can_split(self) -> bool:
+        """
+        Check if the rectangle can be split by split().
+        :return: bool, true if the longer side of the rectangle is at least 0.0002 degree.
+        """
+        return max(self.max_latitude - self.min_latitude, self.max_longitude - self.min_longitude) >= \
+            2 * Rectangle._min_split_degree
+
+    def split(self) -> list:
+        """
+        Split the rectangle into two halves across its longer side.
+        Both halves include the middle line, so an event on the line is returned by both halves, and removed by
+        ResultCollection.
+        :raises ValueError: If the rectangle is too small to be split, see can_split()
+        :return: list, the two Rectangle halves
+        """
+        if not self.can_split():
+            raise ValueError("The rectangle is too small to be split.")
+        if self.max_latitude - self.min_latitude >= self.max_longitude - self.min_longitude:
+            middle_latitude = (self.min_latitude + self.max_latitude) / 2.0
+            return [Rectangle(self.min_latitude, self.min_longitude, middle_latitude, self.max_longitude),
+                    Rectangle(middle_latitude, self.min_longitude, self.max_latitude, self.max_longitude)]
+        middle_longitude = (self.min_longitude + self.max_longitude) / 2.0
+        return [Rectangle(self.min_latitude, self.min_longitude, self.max_latitude, middle_longitude),
+                Rectangle(self.min_latitude, middle_longitude, self.max_latitude, self.max_longitude)]
+
 
 class RadiusUnit(Enum):
     """
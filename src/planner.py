@@ -0,0 +1,235 @@
+import csv
+import heapq
+import io
+import math
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from .location import Rectangle
+from .timeframe import TimeFrame
+
+
+class _MergedRectangle(Rectangle):
+    """
+    A rectangle covering several member rectangles, so that a single request replaces the requests of the members.
+    The envelope may cover more area than the members, so the events of its responses are filtered on the client
+    to keep only the ones inside at least one member.
+
+    This class is internally used by EarthquakeQuery when coalescing the locations. Users do not need to create it.
+    """
+
+    def __init__(self, members: list, bounds: tuple = None):
+        """
+        Create a merged rectangle.
+
+        :param members: the rectangles covered by the merged rectangle
+        :param bounds: the (min_latitude, min_longitude, max_latitude, max_longitude) of the merged rectangle, the
+                       envelope of the members if it is None
+        """
+        if bounds is None:
+            bounds = (min(one.min_latitude for one in members), min(one.min_longitude for one in members),
+                      max(one.max_latitude for one in members), max(one.max_longitude for one in members))
+        super().__init__(*bounds)
+        self.members = members
+
+    def split(self) -> list:
+        """
+        Split the merged rectangle into two halves across its longer side, each keeping the members it overlaps. A
+        half overlapping no member is dropped, since all the events of its request would be filtered out.
+        :return: list, the _MergedRectangle halves overlapping at least one member
+        """
+        halves = [_MergedRectangle([one for one in self.members if _overlaps(one, half)],
+                                   (half.min_latitude, half.min_longitude, half.max_latitude, half.max_longitude))
+                  for half in super().split()]
+        return [one for one in halves if one.members]
+
+    def filter_response(self, response):
+        """
+        Keep only the events inside at least one member in a response of the merged rectangle.
+        :param response: the response in GeoJSON format, or the text of the response in csv format
+        :return: the filtered response, in the same format
+        """
+        if isinstance(response, dict):
+            coordinates = [one["geometry"]["coordinates"] for one in response["features"]]
+            inside = self.contains_all([one[0] for one in coordinates], [one[1] for one in coordinates])
+            return dict(response, features=[one for one, keep in zip(response["features"], inside) if keep])
+        reader = csv.reader(io.StringIO(response))
+        header = next(reader, None)
+        if header is None:
+            return response
+        longitude_index, latitude_index = header.index("longitude"), header.index("latitude")
+        rows = [row for row in reader if row]
+        inside = self.contains_all([float(row[longitude_index]) for row in rows],
+                                   [float(row[latitude_index]) for row in rows])
+        output = io.StringIO()
+        writer = csv.writer(output, lineterminator="\n")
+        writer.writerow(header)
+        writer.writerows(row for row, keep in zip(rows, inside) if keep)
+        return output.getvalue()
+
+    def contains(self, longitude: float, latitude: float) -> bool:
+        """
+        Check if a point is inside at least one member.
+        :param longitude: the longitude of the point
+        :param latitude: the latitude of the point
+        :return: bool, true if the point is inside a member
+        """
+        return any(_contains(one, longitude, latitude) for one in self.members)
+
+    def contains_all(self, longitudes: list, latitudes: list) -> list:
+        """
+        Check if each of the points is inside at least one member. The points are checked against all the members at
+        once with NumPy if it is installed, otherwise one by one.
+        :param longitudes: the longitudes of the points
+        :param latitudes: the latitudes of the points
+        :return: list, a bool for each point, true if the point is inside a member
+        """
+        if not self.members:
+            return [False] * len(longitudes)
+        if numpy is None or not longitudes:
+            return [self.contains(longitude, latitude) for longitude, latitude in zip(longitudes, latitudes)]
+        bounds = numpy.array([(one.min_latitude, one.min_longitude, one.max_latitude, one.max_longitude)
+                              for one in self.members])
+        inside = numpy.zeros(len(longitudes), dtype=bool)
+        # compare the points with every member in chunks, to bound the size of the points x members matrices
+        step = max(1, 1000000 // len(self.members))
+        for start in range(0, len(longitudes), step):
+            longitude = numpy.asarray(longitudes[start:start + step], dtype=float)[:, None]
+            latitude = numpy.asarray(latitudes[start:start + step], dtype=float)[:, None]
+            in_latitude = (bounds[:, 0] <= latitude) & (latitude <= bounds[:, 2])
+            # the longitude of a rectangle crossing the date line may be out of [-180, 180]
+            in_longitude = numpy.zeros(in_latitude.shape, dtype=bool)
+            for shift in (0, -360, 360):
+                in_longitude |= (bounds[:, 1] <= longitude + shift) & (longitude + shift <= bounds[:, 3])
+            inside[start:start + step] = (in_latitude & in_longitude).any(axis=1)
+        return inside.tolist()
+
+
+def _contains(rectangle: Rectangle, longitude: float, latitude: float) -> bool:
+    # the longitude of a rectangle crossing the date line may be out of [-180, 180]
+    if not rectangle.min_latitude <= latitude <= rectangle.max_latitude:
+        return False
+    return any(rectangle.min_longitude <= one <= rectangle.max_longitude
+               for one in (longitude, longitude - 360, longitude + 360))
+
+
+def _overlaps(first: Rectangle, second: Rectangle) -> bool:
+    # rectangles sharing an edge overlap, because the bounds of the USGS API are inclusive
+    return first.min_latitude <= second.max_latitude and second.min_latitude <= first.max_latitude and \
+        first.min_longitude <= second.max_longitude and second.min_longitude <= first.max_longitude
+
+
+def _area(min_latitude: float, min_longitude: float, max_latitude: float, max_longitude: float) -> float:
+    # the area of a latitude and longitude rectangle on the unit sphere
+    return (math.sin(math.radians(max_latitude)) - math.sin(math.radians(min_latitude))) * \
+        math.radians(max_longitude - min_longitude)
+
+
+def _is_nested(inner: Rectangle, outer: Rectangle) -> bool:
+    return outer.min_latitude <= inner.min_latitude and inner.max_latitude <= outer.max_latitude and \
+        outer.min_longitude <= inner.min_longitude and inner.max_longitude <= outer.max_longitude
+
+
+def _drop_nested(first: list, second: list) -> list:
+    # a rectangle nested in one of the other group adds nothing to the area covered, a duplicated one is kept once
+    kept = [one for one in first if not any(_is_nested(one, other) and not _is_nested(other, one) for other in second)]
+    return kept + [one for one in second if not any(_is_nested(one, other) for other in kept)]
+
+
+def _envelope(first: tuple, second: tuple) -> tuple:
+    return (min(first[0], second[0]), min(first[1], second[1]), max(first[2], second[2]), max(first[3], second[3]))
+
+
+def _coalesce_time_frames(time_frames: list) -> list:
+    """
+    Merge the time frames overlapping or touching each other, which have the same update after time. The merged time
+    frames cover exactly the same time as the original ones.
+
+    :param time_frames: the time frames of a query, which may contain None
+    :return: list, the merged time frames, sorted by start time
+    """
+    if None in time_frames:
+        # without a time frame, the USGS API searches the last 30 days, which cannot be merged with other time frames
+        return [None] + _coalesce_time_frames([one for one in time_frames if one is not None])
+    merged = []
+    for time_frame in sorted(time_frames, key=lambda one: one.start_time):
+        for index, current in enumerate(merged):
+            if current.update_after == time_frame.update_after and time_frame.start_time <= current.end_time:
+                merged[index] = TimeFrame(current.start_time, max(current.end_time, time_frame.end_time),
+                                          current.update_after)
+                break
+        else:
+            merged.append(time_frame)
+    return merged
+
+
+def _coalesce_locations(locations: list, request_cost: float = 0, density: float = 0, max_events: float = None) \
+        -> list:
+    """
+    Merge the rectangles into envelopes, and keep the locations other than Rectangle as they are.
+
+    Without a request cost, only the nested or overlapping rectangles are merged, as long as the envelope is not
+    larger than the two rectangles together, so that no more events are downloaded than by the separate requests.
+
+    With a request cost, the rectangles are merged whenever one request on the envelope is estimated to cost less than
+    the separate requests, where a request costs request_cost plus the number of events it downloads, estimated by
+    the density of the events. The pairs saving the most are merged first, until no merge saves anything.
+
+    :param locations: the locations of a query, which may contain None
+    :param request_cost: the cost of sending a request, in the number of events downloaded in the same time
+    :param density: the estimated number of events in a unit of area, see _area()
+    :param max_events: the maximum number of events estimated in an envelope, None for no maximum
+    :return: list, the coalesced locations, where a merged rectangle is a _MergedRectangle
+    """
+    if None in locations:
+        # no location means the whole world, which covers every other location
+        return [None]
+    rectangles = [one for one in locations if isinstance(one, Rectangle)]
+    others = [one for one in locations if not isinstance(one, Rectangle)]
+
+    def saving(first: tuple, second: tuple):
+        # the cost saved by merging two groups of bounds, None if they cannot be merged
+        envelope = _envelope(first, second)
+        if envelope[3] - envelope[1] > 360:
+            return None
+        overlap = _overlaps(Rectangle(*first), Rectangle(*second))
+        extra_area = _area(*envelope) - _area(*first) - _area(*second)
+        if request_cost == 0:
+            return -extra_area if overlap and extra_area <= 0 else None
+        if max_events is not None and density * _area(*envelope) > max_events:
+            return None
+        value = request_cost - density * extra_area
+        return value if value >= 0 else None
+
+    # each group is (the index of its first rectangle, the bounds of its envelope, its member rectangles)
+    groups = {index: (index, (one.min_latitude, one.min_longitude, one.max_latitude, one.max_longitude), [one])
+              for index, one in enumerate(rectangles)}
+    candidates = []
+    for i in groups:
+        for j in groups:
+            if i < j:
+                value = saving(groups[i][1], groups[j][1])
+                if value is not None:
+                    candidates.append((-value, i, j))
+    heapq.heapify(candidates)
+    next_key = len(rectangles)
+    while candidates:
+        _, i, j = heapq.heappop(candidates)
+        if i not in groups or j not in groups:
+            # one of the groups has been merged into another one since the candidate was found
+            continue
+        first, second = groups.pop(i), groups.pop(j)
+        bounds = _envelope(first[1], second[1])
+        for key, (_, other_bounds, _) in groups.items():
+            value = saving(bounds, other_bounds)
+            if value is not None:
+                heapq.heappush(candidates, (-value, next_key, key))
+        groups[next_key] = (min(first[0], second[0]), bounds, _drop_nested(first[2], second[2]))
+        next_key += 1
+
+    coalesced = [members[0] if len(members) == 1 else _MergedRectangle(members, bounds)
+                 for _, bounds, members in sorted(groups.values(), key=lambda one: one[0])]
+    return coalesced + others
@@ -1,3 +1,58 @@
+import heapq
+from collections import namedtuple
+
+try:
+	import numpy
+except ImportError:
+	numpy = None
+
+
+FailedCell = namedtuple("FailedCell", ["time", "location", "error"])
+FailedCell.__doc__ = """
+A (TimeFrame, Location) pair whose request failed in a partial search, with the exception raised by the request.
+"""
+
+
+class _AliasIndex:
+	"""
+	The index of the earthquake kept for every id of its duplicated copies, shared by search(), search_iter() and
+	search_pages() so that they find the same duplicates.
+	"""
+
+	def __init__(self):
+		self._aliases = {}
+		self._count = 0
+
+	def add(self, feature: dict):
+		"""
+		Add an earthquake, the ids of a copy of a known earthquake are added as its aliases
+
+		:param feature: dict, the earthquake in GeoJSON Feature format
+		:return: (int, bool), the index of the earthquake, and whether it is a new earthquake
+		"""
+		ids = [x for x in feature["properties"]["ids"].split(",") if x]
+		ids.append(feature["id"])
+		# a copy sharing ids with several earthquakes is a copy of the first of them
+		index = min((self._aliases[x] for x in ids if x in self._aliases), default=None)
+		is_new = index is None
+		if is_new:
+			index = self._count
+			self._count += 1
+		for x in ids:
+			self._aliases.setdefault(x, index)
+		return index, is_new
+
+	def get(self, event_id: str):
+		"""
+		:param event_id: str, any id of an earthquake
+		:return: int, the index of the earthquake, or None if no earthquake has the id
+		"""
+		return self._aliases.get(event_id)
+
+	def __len__(self):
+		return self._count
+
+
 class ResultCollection:
 	"""
 	This is a class that represents an collection of earthquake events. An query can be a single event
@@ -25,24 +80,75 @@ class ResultCollection:
 		data1 = result.get_all_simplified_data(order_by="time")
 		data2 = result.get_all_magnitudes(order_by="mag")
 
+	Columnar storage:
+		With columnar=True, the time, mag, sig, latitude, longitude, depth and id of the earthquakes are extracted
+		into NumPy arrays once, when the collection is created. Sorting by these keys and getting these values then
+		run on the arrays instead of walking the json dicts on every call, which is much faster on large collections.
+		The results are the same as without the columnar storage. A key with a missing or non numeric value in any
+		earthquake, i.e. a null magnitude, is left out of the arrays and handled by the json dicts as before.
+
+	Duplicated earthquakes:
+		The same earthquake may be returned by several requests, and by several networks under different ids. Two
+		earthquakes sharing any id in their ids are the same earthquake, which is kept once at the position of its
+		first copy. The copy kept is chosen by the keep policy:
+
+		- first: the first copy returned
+		- updated: the most recently updated copy
+		- network: the copy from the first network in networks, i.e. ["us", "ci"], otherwise the first copy
+
+		Every id of every copy maps to the earthquake kept, so get_by_id() finds it by any of its ids.
+
 	"""
-	def __init__(self, result_json_list):
+
+	_keep_policies = ("first", "updated", "network")
+
+	# the getters of the values stored as columns, and the kinds of NumPy arrays allowed for them
+	_column_getters = {"time": lambda i: i["properties"]["time"],
+					   "mag": lambda i: i["properties"]["mag"],
+					   "sig": lambda i: i["properties"]["sig"],
+					   "longitude": lambda i: i["geometry"]["coordinates"][0],
+					   "latitude": lambda i: i["geometry"]["coordinates"][1],
+					   "depth": lambda i: i["geometry"]["coordinates"][2],
+					   "id": lambda i: i["id"]}
+	_column_kinds = {"id": "U"}
+
+	def __init__(self, result_json_list, failed_cells=None, columnar=False, keep="first", networks=None):
 		"""
 		Constructor:
 			Initialize the result object, remove all duplicating earthquakes when initializing
 
 		:param result_json_list: list, the original list of json strings returned by all the requests
 		                         made in the query
+		:param failed_cells: list, the FailedCell of each request that failed in a partial search
+		:param columnar: bool, whether to store the values used for sorting in NumPy arrays, see Columnar storage
+		:param keep: str, the copy kept of a duplicated earthquake, "first", "updated" or "network", see Duplicated
+		             earthquakes
+		:param networks: list, the networks preferred by the network keep policy, from the most preferred
+		:raises ImportError: If columnar is True and NumPy is not installed
+		:raises ValueError: If keep is not a keep policy, or keep is "network" without networks
 		"""
+		if columnar and numpy is None:
+			raise ImportError("The columnar storage requires numpy, please install it with pip install numpy")
+		if keep not in ResultCollection._keep_policies:
+			raise ValueError("keep should be one of " + ", ".join(ResultCollection._keep_policies))
+		if keep == "network" and not networks:
+			raise ValueError("networks should be given to keep the copies of the preferred networks")
+		self.keep = keep
+		self.networks = list(networks) if networks else []
 		self.json_raw = result_json_list
 		self.json_combined = self._combine_json_list(result_json_list)
+		self.failed_cells = [] if failed_cells is None else failed_cells
+		self.columnar = columnar
+		self._columns = self._build_columns(self.json_combined["features"]) if columnar else None
+		self._orders = {}
 
 	def _combine_json_list(self, json_list: list):
 		unique_results = self._combine_unique_results(json_list)
 		combined_metadata = self._combine_metadata(json_list, len(unique_results))
 		combined_bbox = self._combine_boundary_box(json_list)
 
-		base_json = {"type": json_list[0]["type"],
+		# every request of a partial search may have failed
+		base_json = {"type": json_list[0]["type"] if json_list else "FeatureCollection",
 					 "metadata": combined_metadata,
 					 "features": unique_results,
 					 "bbox": combined_bbox}
@@ -52,9 +158,9 @@ class ResultCollection:
 	def _combine_metadata(self, json_list: list, count: int):
 		base_metadata = {"generated": [],
 						 "url": [],
-						 "title": json_list[0]["metadata"]["title"],
+						 "title": json_list[0]["metadata"]["title"] if json_list else None,
 						 "status": 200,
-						 "api": json_list[0]["metadata"]["api"],
+						 "api": json_list[0]["metadata"]["api"] if json_list else None,
 						 "count": count}
 
 		for data in json_list:
@@ -64,19 +170,30 @@ class ResultCollection:
 		return base_metadata
 
 	def _combine_unique_results(self, json_list):
-		result_id_set = set()
 		unique_results = []
+		# the index in unique_results of the earthquake kept for every id of its copies
+		self._aliases = _AliasIndex()
+		network_rank = {network: rank for rank, network in enumerate(self.networks)}
 
 		for data in json_list:
 			for result in data["features"]:
-				ids = result["properties"]["ids"].strip(",").split(",")
-				if any(x in result_id_set for x in ids):
-					continue
-				else:
-					result_id_set.update(ids)
+				index, is_new = self._aliases.add(result)
+				if is_new:
 					unique_results.append(result)
+				elif self._replaces(result, unique_results[index], network_rank):
+					unique_results[index] = result
 		return unique_results
 
+	def _replaces(self, result, kept, network_rank):
+		# whether a copy of an earthquake replaces the copy kept so far
+		if self.keep == "updated":
+			updated, kept_updated = result["properties"].get("updated"), kept["properties"].get("updated")
+			return updated is not None and (kept_updated is None or updated > kept_updated)
+		if self.keep == "network":
+			rank = network_rank.get(result["properties"].get("net"), len(network_rank))
+			return rank < network_rank.get(kept["properties"].get("net"), len(network_rank))
+		return False
+
 	def _combine_boundary_box(self, json_list):
 		base_bbox = []
 		for data in json_list:
@@ -86,15 +203,150 @@ class ResultCollection:
 				continue
 		return base_bbox
 
-	def _get_sorted_results(self, order_by, descending):
+	def _build_columns(self, features):
+		# a column with a missing value, or a value of another kind, is left out and handled by the json dicts
+		columns = {}
+		for name, getter in ResultCollection._column_getters.items():
+			try:
+				values = [getter(feature) for feature in features]
+			except (KeyError, IndexError, TypeError):
+				continue
+			if any(value is None for value in values):
+				continue
+			column = numpy.array(values)
+			# an empty collection has no values to tell the kind of the column
+			if not values or column.dtype.kind in ResultCollection._column_kinds.get(name, "iuf"):
+				columns[name] = column
+		return columns
+
+	def _get_order(self, order_by, descending):
+		# the indices of the features sorted by order_by, the features with equal keys stay in their order like sorted()
+		# the order is computed once for each (order_by, descending) and reused until the collection changes
+		order = self._orders.get((order_by, descending))
+		if order is None:
+			ascending = self._orders.get((order_by, False)) if descending else None
+			if ascending is not None:
+				order = self._reverse_order(order_by, ascending)
+			else:
+				order = self._sort_order(order_by, descending)
+			self._orders[(order_by, descending)] = order
+		return order
+
+	def _sort_order(self, order_by, descending):
+		if self._columns is not None and order_by in self._columns:
+			return ResultCollection._argsort(self._columns[order_by], descending)
+		key = ResultCollection._get_sort_key(order_by)
+		keys = [key(feature) for feature in self.json_combined["features"]]
+		# every response is ordered by time, and sorted() detects and merges these presorted runs, so sorting by time
+		# is already faster than a k-way merge of the responses in Python
+		return sorted(range(len(keys)), key=keys.__getitem__, reverse=descending)
+
+	def _reverse_order(self, order_by, ascending):
+		# reverse the groups of equal keys of a cached ascending order, but not the indices inside a group, which is the
+		# descending order of sorted() without sorting again
+		if self._columns is not None and order_by in self._columns:
+			keys = self._columns[order_by][ascending]
+			change = numpy.flatnonzero(keys[1:] != keys[:-1]) + 1
+			starts = numpy.concatenate(([0], change))
+			ends = numpy.concatenate((change, [len(keys)]))
+			group = numpy.repeat(numpy.arange(len(starts)), ends - starts)
+			# a group ending at end starts at len - end in the descending order
+			position = len(keys) - ends[group] + numpy.arange(len(keys)) - starts[group]
+			order = numpy.empty_like(ascending)
+			order[position] = ascending
+			return order
+		features = self.json_combined["features"]
+		key = ResultCollection._get_sort_key(order_by)
+		keys = [key(features[index]) for index in ascending]
+		order = []
+		end = len(ascending)
+		while end > 0:
+			start = end - 1
+			while start > 0 and keys[start - 1] == keys[start]:
+				start -= 1
+			order.extend(ascending[start:end])
+			end = start
+		return order
+
+	@staticmethod
+	def _get_sort_key(order_by):
 		if order_by == "latitude":
-			return sorted(self.json_combined["features"], key=lambda i: i["geometry"]["coordinates"][1], reverse=descending)
+			return lambda i: i["geometry"]["coordinates"][1]
 		if order_by == "longitude":
-			return sorted(self.json_combined["features"], key=lambda i: i["geometry"]["coordinates"][0], reverse=descending)
+			return lambda i: i["geometry"]["coordinates"][0]
 		if order_by == "depth":
-			return sorted(self.json_combined["features"], key=lambda i: i["geometry"]["coordinates"][2], reverse=descending)
+			return lambda i: i["geometry"]["coordinates"][2]
 
-		return sorted(self.json_combined["features"], key=lambda i: i["properties"][order_by], reverse=descending)
+		return lambda i: i["properties"][order_by]
+
+	def _get_sorted_results(self, order_by, descending):
+		features = self.json_combined["features"]
+		order = self._get_order(order_by, descending)
+		if not isinstance(order, list):
+			order = order.tolist()
+		return [features[index] for index in order]
+
+	def _get_column_values(self, names, order_by, descending):
+		# the values of the columns in the order, or None if any of the columns is not stored
+		if self._columns is None or any(name not in self._columns for name in names):
+			return None
+		order = self._get_order(order_by, descending)
+		return [self._columns[name][order].tolist() for name in names]
+
+	def get_failed_cells(self) -> list:
+		"""
+		Get the (TimeFrame, Location) pairs whose requests failed in a partial search, see EarthquakeQuery.search().
+		The failed pairs can be searched again with EarthquakeQuery.retry_failed().
+
+		:return: list, list of FailedCell, empty if the result is complete
+		"""
+		return self.failed_cells
+
+	def is_complete(self) -> bool:
+		"""
+		Check whether the requests of all the (TimeFrame, Location) pairs succeeded
+
+		:return: bool, true if no request failed
+		"""
+		return not self.failed_cells
+
+	def merge(self, other: 'ResultCollection') -> 'ResultCollection':
+		"""
+		Merge the results of another collection into this collection, the duplicated earthquakes are removed and the
+		failed pairs of this collection are replaced by the failed pairs of the other collection.
+		It is used to merge the results of the failed pairs searched again into the original partial result.
+
+		:param other: ResultCollection, the collection to be merged
+		:return: ResultCollection, self
+		"""
+		self.json_raw = self.json_raw + other.json_raw
+		self.json_combined = self._combine_json_list(self.json_raw)
+		self.failed_cells = list(other.failed_cells)
+		if self.columnar:
+			self._columns = self._build_columns(self.json_combined["features"])
+		# the features have changed, so the cached orders are no longer valid
+		self._orders = {}
+		return self
+
+	def get_by_id(self, event_id: str):
+		"""
+		Get an earthquake by any of its ids, including the ids of its duplicated copies
+
+		:param event_id: str, the id of the earthquake
+		:return: dict, the earthquake in dict form, or None if no earthquake has the id
+		"""
+		index = self._aliases.get(event_id)
+		return None if index is None else self.json_combined["features"][index]
+
+	def get_canonical_id(self, event_id: str):
+		"""
+		Get the id of the earthquake kept for an id, i.e. the id of the preferred copy for the id of another copy
+
+		:param event_id: str, the id of the earthquake
+		:return: str, the id of the earthquake kept, or None if no earthquake has the id
+		"""
+		result = self.get_by_id(event_id)
+		return None if result is None else result["id"]
 
 	def get_combined_json(self) -> dict:
 		"""
@@ -135,10 +387,18 @@ class ResultCollection:
 		"""
 		to_return = []
 		results = self._get_sorted_results(order_by, descending)
+		# the keys of the properties and the id stored as columns are read from the columns
+		column_keys = [key for key in keys if key in ("time", "mag", "sig", "id")]
+		column_values = self._get_column_values(column_keys, order_by, descending) if column_keys else None
+		if column_values is not None:
+			column_values = dict(zip(column_keys, column_values))
 
-		for result in results:
+		for index, result in enumerate(results):
 			d = dict.fromkeys(keys)
 			for key in keys:
+				if column_values is not None and key in column_values:
+					d[key] = column_values[key][index]
+					continue
 				if key in result["properties"]:
 					d[key] = result["properties"][key]
 				if key in result["geometry"]:
@@ -159,6 +419,99 @@ class ResultCollection:
 		"""
 		return self._get_sorted_results(order_by, descending)
 
+	def get_top_earthquakes(self, k: int, order_by="mag", descending=True) -> list:
+		"""
+		Get the first k earthquakes in the order, i.e. the 50 largest earthquakes or the 100 most recent ones, without
+		sorting all the earthquakes. The result is the same as the first k of get_all_earthquake_data().
+
+		:param k: int, the number of earthquakes
+		:param order_by: str, ordering mode, which can also be any other key of the properties, i.e. sig
+		:param descending: bool, indicates whether it is in descending order
+		:return: list, list of at most k earthquakes in dict form
+		:raises TypeError: If k is not an integer
+		:raises ValueError: If k is negative
+		"""
+		if not isinstance(k, int):
+			raise TypeError("k should be an integer")
+		if k < 0:
+			raise ValueError("k should not be negative")
+		features = self.json_combined["features"]
+		cached = self._orders.get((order_by, descending))
+		if cached is not None or k >= len(features):
+			order = self._get_order(order_by, descending)[:k]
+		elif self._columns is not None and order_by in self._columns:
+			order = self._select_column_order(self._columns[order_by], k, descending)
+		else:
+			key = ResultCollection._get_sort_key(order_by)
+			select = heapq.nlargest if descending else heapq.nsmallest
+			# equivalent to sorted()[:k], so the earthquakes with equal keys stay in their order
+			order = select(k, range(len(features)), key=lambda index: key(features[index]))
+		if not isinstance(order, list):
+			order = order.tolist()
+		return [features[index] for index in order]
+
+	@staticmethod
+	def _select_column_order(column, k, descending):
+		# select the first k values with a partition, taking the values equal to the k-th one by their index, so that
+		# the order is the same as the first k of the full order
+		if k == 0:
+			return numpy.array([], dtype=int)
+		if descending:
+			kth = numpy.partition(column, len(column) - k)[len(column) - k]
+			before = numpy.flatnonzero(column > kth)
+		else:
+			kth = numpy.partition(column, k - 1)[k - 1]
+			before = numpy.flatnonzero(column < kth)
+		selected = numpy.concatenate((before, numpy.flatnonzero(column == kth)[:k - len(before)]))
+		return selected[ResultCollection._argsort(column[selected], descending)]
+
+	@staticmethod
+	def _argsort(values, descending):
+		# a stable argsort of a NumPy array in both directions, the equal values keep their order like sorted()
+		if not descending:
+			return numpy.argsort(values, kind="stable")
+		# sort the reversed values, so that the equal values keep their order after reversing the indices back
+		return (len(values) - 1 - numpy.argsort(values[::-1], kind="stable"))[::-1]
+
+	def get_earthquakes_in_range(self, order_by="mag", min_value=None, max_value=None, descending=True) -> list:
+		"""
+		Get the earthquakes whose value of order_by is between min_value and max_value in the order, i.e. all the
+		earthquakes of magnitude 6 or more. Only the earthquakes in the range are sorted.
+
+		:param order_by: str, ordering mode, which can also be any other key of the properties, i.e. sig
+		:param min_value: the minimum value, inclusive, None for no minimum
+		:param max_value: the maximum value, inclusive, None for no maximum
+		:param descending: bool, indicates whether it is in descending order
+		:return: list, list of earthquakes in dict form. The earthquakes without a value of order_by are left out.
+		"""
+		features = self.json_combined["features"]
+		cached = self._orders.get((order_by, descending))
+		if self._columns is not None and order_by in self._columns:
+			column = self._columns[order_by]
+			inside = numpy.ones(len(column), dtype=bool)
+			if min_value is not None:
+				inside &= column >= min_value
+			if max_value is not None:
+				inside &= column <= max_value
+			if cached is not None:
+				# the cached order only needs to be filtered
+				order = cached[inside[cached]]
+			else:
+				selected = numpy.flatnonzero(inside)
+				order = selected[ResultCollection._argsort(column[selected], descending)]
+			return [features[index] for index in order.tolist()]
+
+		key = ResultCollection._get_sort_key(order_by)
+		inside = []
+		for feature in features:
+			value = key(feature)
+			inside.append(value is not None and (min_value is None or value >= min_value) and
+						  (max_value is None or value <= max_value))
+		if cached is not None:
+			return [features[index] for index in cached if inside[index]]
+		selected = [index for index in range(len(features)) if inside[index]]
+		return [features[index] for index in sorted(selected, key=lambda index: key(features[index]), reverse=descending)]
+
 	def get_all_details_url(self, order_by="time", descending=True) -> list:
 		"""
 		Get all earthquake detailed data urls from the returned query
@@ -202,6 +555,9 @@ class ResultCollection:
 		:param descending: bool, indicates whether it is in descending order
 		:return: list, list of earthquake magnitudes
 		"""
+		column_values = self._get_column_values(["mag"], order_by, descending)
+		if column_values is not None:
+			return column_values[0]
 		ordered = self._get_sorted_results(order_by, descending)
 		return [x["properties"]["mag"] for x in ordered]
 
@@ -213,6 +569,9 @@ class ResultCollection:
 		:param descending: bool, indicates whether it is in descending order
 		:return: list, list of tuples representing coordinates
 		"""
+		column_values = self._get_column_values(["longitude", "latitude"], order_by, descending)
+		if column_values is not None:
+			return [list(x) for x in zip(*column_values)]
 		ordered = self._get_sorted_results(order_by, descending)
 		return [x["geometry"]["coordinates"][:2] for x in ordered]
 
@@ -224,6 +583,9 @@ class ResultCollection:
 		:param descending: bool, indicates whether it is in descending order
 		:return: list, list of 3-tuples representing coordinates
 		"""
+		column_values = self._get_column_values(["longitude", "latitude", "depth"], order_by, descending)
+		if column_values is not None:
+			return [list(x) for x in zip(*column_values)]
 		ordered = self._get_sorted_results(order_by, descending)
 		return [x["geometry"]["coordinates"] for x in ordered]
 
@@ -235,6 +597,9 @@ class ResultCollection:
 		:param descending: bool, indicates whether it is in descending order
 		:return: list, list of int representing depths
 		"""
+		column_values = self._get_column_values(["depth"], order_by, descending)
+		if column_values is not None:
+			return column_values[0]
 		ordered = self._get_sorted_results(order_by, descending)
 		return [x["geometry"]["coordinates"][2] for x in ordered]
 	
@@ -0,0 +1,178 @@
+import email.utils
+import random
+import threading
+import time
+from datetime import datetime, timezone
+
+import requests
+
+from .deadline import _get_deadline
+
+
+class RetryPolicy:
+    """
+    The policy of retrying the failed requests of a HttpSession. A request is retried when the connection fails, or the
+    server responds with one of the retried status codes, i.e. 429 Too Many Requests or 503 Service Unavailable.
+
+    The delay before each retry grows exponentially with the number of attempts, and is drawn at random between 0 and
+    the exponential delay, so that the many requests failing at the same time do not retry at the same time. If the
+    response has a Retry-After header, the retry waits at least as long as the server asks.
+
+    Example:
+    ::
+        session = HttpSession(retry_policy=RetryPolicy(max_retries=5, backoff=1.0))
+        EarthquakeQuery.set_default_session(session)
+    """
+
+    def __init__(self, max_retries: int = 3, backoff: float = 0.5, max_backoff: float = 60,
+                 status_codes: tuple = (429, 500, 502, 503, 504)):
+        """
+        Create a RetryPolicy.
+
+        :param max_retries: the maximum number of retries of a request
+        :type max_retries: int
+        :param backoff: the delay in seconds of the first retry, doubled for each following retry
+        :type backoff: float
+        :param max_backoff: the maximum delay in seconds of a retry, including the delay asked by Retry-After
+        :type max_backoff: float
+        :param status_codes: the status codes of the responses to be retried
+        :type status_codes: tuple
+        :raises TypeError: If max_retries is not an integer
+        :raises ValueError: If max_retries, backoff or max_backoff is negative
+        """
+        if not isinstance(max_retries, int):
+            raise TypeError("max_retries should be an integer")
+        if max_retries < 0 or backoff < 0 or max_backoff < 0:
+            raise ValueError("max_retries, backoff and max_backoff should not be negative")
+
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.status_codes = frozenset(status_codes)
+
+    def get_delay(self, attempt: int, response: requests.Response = None) -> float:
+        """
+        Get the delay before a retry.
+
+        :param attempt: the number of attempts failed so far, starting from 1
+        :param response: the failed response, or None if the connection failed
+        :return: float, the delay in seconds
+        """
+        delay = random.uniform(0, min(self.max_backoff, self.backoff * 2 ** (attempt - 1)))
+        if response is not None:
+            retry_after = self._parse_retry_after(response.headers.get("Retry-After"))
+            if retry_after is not None:
+                delay = max(delay, min(self.max_backoff, retry_after))
+        return delay
+
+    def send(self, send) -> requests.Response:
+        """
+        Send a request, and retry it according to the policy.
+
+        :param send: the function sending the request and returning the response
+        :return: requests.Response, the successful response, or the last failed response when the retries run out or
+                 the next retry could not start before the deadline of the search
+        :raises requests.RequestException: If the connection still fails when the retries run out
+        """
+        attempt = 0
+        while True:
+            attempt += 1
+            try:
+                response = send()
+            except (requests.ConnectionError, requests.Timeout):
+                delay = self.get_delay(attempt)
+                if attempt > self.max_retries or not self._before_deadline(delay):
+                    raise
+                time.sleep(delay)
+                continue
+            if response.status_code not in self.status_codes or attempt > self.max_retries:
+                return response
+            delay = self.get_delay(attempt, response)
+            if not self._before_deadline(delay):
+                # the retry could not start before the deadline of the search
+                return response
+            # release the connection of the failed response before waiting
+            response.close()
+            time.sleep(delay)
+
+    @staticmethod
+    def _before_deadline(delay: float) -> bool:
+        deadline = _get_deadline()
+        return deadline is None or delay < deadline.remaining()
+
+    @staticmethod
+    def _parse_retry_after(value: str):
+        # Retry-After is either a number of seconds or an HTTP date
+        if value is None:
+            return None
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            pass
+        try:
+            retry_time = email.utils.parsedate_to_datetime(value)
+        except (TypeError, ValueError):
+            return None
+        if retry_time.tzinfo is None:
+            retry_time = retry_time.replace(tzinfo=timezone.utc)
+        return max(0.0, (retry_time - datetime.now(timezone.utc)).total_seconds())
+
+
+class RateLimiter:
+    """
+    A token bucket limiting the rate of the requests. The bucket holds at most burst tokens and is refilled with rate
+    tokens per second, and every request takes a token, waiting for one if the bucket is empty. So the requests are
+    sent at most rate per second in the long run, with at most burst requests sent at once.
+
+    The rate limiter set by EarthquakeQuery.set_rate_limiter() is shared by all the sessions in the process, including
+    all the retries.
+
+    Example:
+    ::
+        EarthquakeQuery.set_rate_limiter(RateLimiter(rate=5, burst=10))
+    """
+
+    def __init__(self, rate: float, burst: int = 1):
+        """
+        Create a RateLimiter, the bucket is full at first.
+
+        :param rate: the number of requests allowed per second
+        :type rate: float
+        :param burst: the maximum number of requests sent at once
+        :type burst: int
+        :raises TypeError: If burst is not an integer
+        :raises ValueError: If rate is not positive, or burst is less than 1
+        """
+        if not isinstance(burst, int):
+            raise TypeError("burst should be an integer")
+        if rate <= 0 or burst < 1:
+            raise ValueError("rate should be positive and burst should be at least 1")
+
+        self.rate = rate
+        self.burst = burst
+        self._lock = threading.Lock()
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+
+    def acquire(self):
+        """
+        Take a token, waiting until one is available
+
+        :raises TimeoutError: If no token is available before the deadline of the search
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            # take the token now, the token may be negative, which reserves the tokens refilled later for the callers
+            # in order
+            self._tokens -= 1
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0
+            deadline = _get_deadline()
+            if deadline is not None and wait > deadline.remaining():
+                # give the token back, the request cannot be sent before the deadline of the search
+                self._tokens += 1
+                raise TimeoutError("The rate limit does not allow the request before the deadline of " +
+                                   str(deadline.timeout) + " seconds")
+        if wait > 0:
+            time.sleep(wait)
@@ -0,0 +1,123 @@
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from .retry import RetryPolicy
+from .deadline import _get_deadline, _wait_timeout
+
+
+class HttpSession:
+    """
+    A pooled HTTP session shared by the requests sent to the USGS Earthquake Catalog API and the Bing Maps API.
+    The connections are kept alive and reused, so the requests after the first one to the same host do not need to
+    set up a new TCP and TLS connection.
+
+    A session can be set to a single query, or be set as the process-wide default session which is used by every query
+    and by the geocoding of GeoRectangle and GeoCircle.
+    Example:
+    ::
+        session = HttpSession(pool_maxsize=32)
+        query = EarthquakeQuery(time=[time_frame]).set_session(session).set_max_workers(32)
+        result = query.search()
+
+        EarthquakeQuery.set_default_session(HttpSession(pool_maxsize=16))
+
+    With a RetryPolicy, the requests failing with a connection error or a retried status code, i.e. 429 or 503, are
+    retried after a backoff delay. Every attempt waits for the process-wide RateLimiter if one is set with
+    EarthquakeQuery.set_rate_limiter().
+
+    Note:
+        pool_maxsize should not be less than the max workers of the queries using the session, otherwise the
+        connections beyond the pool size are closed after each request instead of being reused.
+    """
+
+    def __init__(self, pool_connections: int = 10, pool_maxsize: int = 10, timeout: float = None,
+                 gzip: bool = True, retry_policy: RetryPolicy = None):
+        """
+        Create a HttpSession.
+
+        :param pool_connections: the number of hosts whose connection pools are cached
+        :type pool_connections: int
+        :param pool_maxsize: the maximum number of connections kept alive for each host
+        :type pool_maxsize: int
+        :param timeout: the timeout in seconds of connecting and reading for each request. None means no timeout.
+        :type timeout: float
+        :param gzip: whether to ask the server to compress the response with gzip
+        :type gzip: bool
+        :param retry_policy: the policy of retrying the failed requests. None means no retry.
+        :type retry_policy: RetryPolicy
+        :raises TypeError: If pool_connections or pool_maxsize is not an integer, or retry_policy is not a RetryPolicy
+        :raises ValueError: If pool_connections or pool_maxsize is less than 1, or timeout is not positive
+        """
+        if not isinstance(pool_connections, int) or not isinstance(pool_maxsize, int):
+            raise TypeError("pool_connections and pool_maxsize should be integers")
+        if pool_connections < 1 or pool_maxsize < 1:
+            raise ValueError("pool_connections and pool_maxsize should be at least 1")
+        if timeout is not None and timeout <= 0:
+            raise ValueError("timeout should be positive")
+        if retry_policy is not None and not isinstance(retry_policy, RetryPolicy):
+            raise TypeError("retry_policy should be an instance of RetryPolicy")
+
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+        self.timeout = timeout
+        self.gzip = gzip
+        self.retry_policy = retry_policy
+
+        self._session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize)
+        self._session.mount("https://", adapter)
+        self._session.mount("http://", adapter)
+        self._session.headers["Connection"] = "keep-alive"
+        self._session.headers["Accept-Encoding"] = "gzip, deflate" if gzip else "identity"
+
+    def get(self, url: str, params: dict = None, **kwargs) -> requests.Response:
+        """
+        Send a GET request with a pooled connection, retried according to the retry policy of the session.
+
+        :param url: the url of the request
+        :param params: the parameters appended to the url
+        :param kwargs: other keyword arguments of requests.Session.get
+        :return: requests.Response, the response of the request, or the last failed response when the retries run out
+        """
+        kwargs.setdefault("timeout", self.timeout)
+
+        def send() -> requests.Response:
+            rate_limiter = _DefaultSession.rate_limiter
+            if rate_limiter is not None:
+                rate_limiter.acquire()
+            # every attempt only gets the time left before the deadline of the search
+            timeout = _wait_timeout(kwargs["timeout"])
+            try:
+                return self._session.get(url, params=params, **dict(kwargs, timeout=timeout))
+            except requests.Timeout as e:
+                deadline = _get_deadline()
+                if deadline is not None and deadline.expired():
+                    raise TimeoutError("The deadline of " + str(deadline.timeout) + " seconds has passed") from e
+                raise
+
+        if self.retry_policy is None:
+            return send()
+        return self.retry_policy.send(send)
+
+    def close(self):
+        """
+        Close all the connections kept alive by the session
+        """
+        self._session.close()
+
+
+class _DefaultSession:
+    session = None
+    rate_limiter = None
+    _lock = threading.Lock()
+
+    @staticmethod
+    def get() -> HttpSession:
+        # create the process-wide session on first use
+        if _DefaultSession.session is None:
+            with _DefaultSession._lock:
+                if _DefaultSession.session is None:
+                    _DefaultSession.session = HttpSession()
+        return _DefaultSession.session
@@ -0,0 +1,78 @@
+import threading
+
+from .deadline import _get_deadline, _wait_timeout
+
+
+class _Call:
+    # a fetch in flight, the callers waiting for it read its result or error once done is set
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        # the deadline of the caller running the fetch
+        self.deadline = _get_deadline()
+
+
+class _SingleFlight:
+    """
+    De-duplicate the identical requests in flight. The first caller of a key runs the fetch, and the callers of the
+    same key arriving before it finishes wait for it and share its result, or its error, instead of sending the same
+    request again. Once the fetch finishes, the next caller of the key runs a new fetch.
+
+    The shared result is the same object for every caller, so it must not be modified.
+
+    The fetch runs within the deadline of the caller running it. If it fails because that deadline has passed, the
+    callers waiting for it with another deadline, or without any, do not share the TimeoutError, and run the fetch
+    again instead.
+
+    This class is internally used by EarthquakeQuery to share the requests sent by different threads.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self._shared = 0
+
+    def do(self, key: str, fetch, *args):
+        """
+        Run the fetch, or wait for the fetch of the same key in flight.
+
+        :param key: the key of the request, i.e. its url
+        :param fetch: the function sending the request
+        :param args: the arguments of the fetch
+        :return: the result of the fetch
+        :raises Exception: the error raised by the fetch
+        :raises TimeoutError: If the deadline of the search passes while waiting for the fetch in flight
+        """
+        while True:
+            with self._lock:
+                call = self._calls.get(key)
+                if call is None:
+                    call = self._calls[key] = _Call()
+                    break
+                self._shared += 1
+            if not call.done.wait(_wait_timeout()):
+                raise TimeoutError("The deadline has passed while waiting for the same request in flight")
+            if call.error is None:
+                return call.result
+            if not isinstance(call.error, TimeoutError) or call.deadline is None or call.deadline is _get_deadline():
+                raise call.error
+            # the fetch timed out by the deadline of another caller, run it again
+        try:
+            call.result = fetch(*args)
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    def get_shared(self) -> int:
+        """
+        Get the number of callers that shared the fetch of another caller
+
+        :return: int, the number of requests saved
+        """
+        return self._shared
@@ -0,0 +1,106 @@
+import codecs
+import json
+
+
+class _GeoJSONFeatureStream:
+    """
+    An incremental parser of a GeoJSON FeatureCollection. The response is read chunk by chunk, and the features are
+    decoded and yielded one at a time, so that the memory used is bounded by the size of a single feature instead of
+    the size of the whole response.
+
+    The members of the FeatureCollection other than "features", i.e. "type", "metadata" and "bbox", are small and
+    decoded as a whole. They are available in the members attribute once the parser has read them.
+
+    This class is internally used by EarthquakeQuery.search_iter().
+    """
+
+    _whitespace = " \t\n\r"
+
+    def __init__(self, chunks):
+        """
+        Create a parser reading the chunks of a GeoJSON FeatureCollection.
+
+        :param chunks: an iterable of the chunks of the response in bytes
+        """
+        self.members = {}
+        self._chunks = iter(chunks)
+        self._decoder = codecs.getincrementaldecoder("utf-8")()
+        self._json_decoder = json.JSONDecoder()
+        self._buffer = ""
+        self._position = 0
+        self._exhausted = False
+
+    def __iter__(self):
+        self._expect("{")
+        if self._peek() == "}":
+            return
+        while True:
+            key = self._decode_value()
+            self._expect(":")
+            if key == "features":
+                yield from self._iter_array()
+            else:
+                self.members[key] = self._decode_value()
+            if self._next_char() == "}":
+                return
+
+    def _iter_array(self):
+        self._expect("[")
+        if self._peek() == "]":
+            self._position += 1
+            return
+        while True:
+            yield self._decode_value()
+            if self._next_char() == "]":
+                return
+
+    def _read(self) -> bool:
+        # append the next chunk to the buffer, dropping the part already parsed
+        if self._exhausted:
+            return False
+        self._buffer = self._buffer[self._position:]
+        self._position = 0
+        for chunk in self._chunks:
+            text = self._decoder.decode(chunk)
+            if text:
+                self._buffer += text
+                return True
+        self._buffer += self._decoder.decode(b"", final=True)
+        self._exhausted = True
+        return True
+
+    def _peek(self) -> str:
+        while True:
+            while self._position < len(self._buffer) and self._buffer[self._position] in self._whitespace:
+                self._position += 1
+            if self._position < len(self._buffer):
+                return self._buffer[self._position]
+            if not self._read():
+                raise ValueError("Unexpected end of the GeoJSON response")
+
+    def _next_char(self) -> str:
+        # get the next separator, i.e. a comma or the end of the current object or array
+        char = self._peek()
+        self._position += 1
+        if char not in ",}]":
+            raise ValueError("Unexpected character " + char + " in the GeoJSON response")
+        return char
+
+    def _expect(self, char: str):
+        if self._peek() != char:
+            raise ValueError("Expected " + char + " in the GeoJSON response")
+        self._position += 1
+
+    def _decode_value(self):
+        self._peek()
+        while True:
+            try:
+                value, end = self._json_decoder.raw_decode(self._buffer, self._position)
+                # a number at the end of the buffer may continue in the next chunk
+                if end < len(self._buffer) or self._exhausted:
+                    self._position = end
+                    return value
+            except json.JSONDecodeError:
+                if self._exhausted:
+                    raise ValueError("Invalid GeoJSON response")
+            self._read()
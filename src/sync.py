@@ -0,0 +1,174 @@
+import copy
+import json
+import os
+from datetime import datetime, timedelta, timezone
+
+from .earthquake_query import EarthquakeQuery
+from .enum.delete import Delete
+from .result_collection import ResultCollection
+from .timeframe import TimeFrame
+
+
+class EarthquakeSync:
+    """
+    This class keeps a local copy of the results of an EarthquakeQuery up to date. The first sync() downloads all the
+    events of the query. Every following sync() only requests the events updated after the watermark of the last sync,
+    using the update_after time of the TimeFrame, and applies the inserted, updated and deleted events to the local
+    copy.
+
+    The watermark and the local copy are kept per query, and can be saved in a state file so that the next process
+    continues from the last sync.
+
+    Example:
+    ::
+        query = EarthquakeQuery(time=[TimeFrame(datetime(2021, 1, 1), datetime(2022, 1, 1))], minmagnitude=2.5)
+        sync = EarthquakeSync(query, state_path="sync_state.json")
+        changes = sync.sync()
+        result = sync.get_result_collection()
+
+    Note:
+        The query must have time frames, because the update after time is part of the TimeFrame. Deleted events are
+        always requested by the incremental syncs, in order to remove them from the local copy.
+    """
+
+    def __init__(self, query: EarthquakeQuery, state_path: str = None, overlap: timedelta = timedelta(minutes=1)):
+        """
+        Create an EarthquakeSync.
+
+        :param query: the query to be synced
+        :type query: EarthquakeQuery
+        :param state_path: the path of the file saving the watermarks and the local copies, None to keep them in memory
+        :type state_path: str
+        :param overlap: how far the next sync looks back before the watermark, to tolerate the events indexed late
+        :type overlap: timedelta
+        :raises TypeError: If query is not an EarthquakeQuery, or overlap is not a timedelta
+        :raises ValueError: If the query has no time frame
+        """
+        if not isinstance(query, EarthquakeQuery):
+            raise TypeError("query should be an instance of EarthquakeQuery")
+        if not isinstance(overlap, timedelta):
+            raise TypeError("overlap should be instance of datetime.timedelta")
+        if query.get_time() == [None] or None in query.get_time():
+            raise ValueError("the query to be synced should have time frames")
+
+        self.query = query
+        self.state_path = state_path
+        self.overlap = overlap
+        self._key = json.dumps(query.get_query_parameters(), sort_keys=True, default=str)
+        self._states = self._load_states()
+        state = self._states.setdefault(self._key, {"watermark": None, "events": {}})
+        self._events = state["events"]
+        self._aliases = {}
+        for event_id, event in self._events.items():
+            self._register_aliases(event_id, event)
+
+    def sync(self) -> dict:
+        """
+        Request the events updated since the last sync, or all the events on the first sync, and apply them to the
+        local copy.
+
+        :return: dict, the ids of the "inserted", "updated" and "deleted" events
+        :raises ValueError: If the HTTP response of any request is not 200
+        """
+        state = self._states[self._key]
+        query = copy.copy(self.query)
+        if state["watermark"] is not None:
+            update_after = datetime.fromisoformat(state["watermark"]) - self.overlap
+            query.set_time([TimeFrame(one.start_time, one.end_time, update_after) for one in self.query.get_time()])
+            query.set_include_deleted(Delete.INCLUDE_DELETED)
+        result = query.search()
+
+        changes = {"inserted": [], "updated": [], "deleted": []}
+        for event in result.get_combined_json()["features"]:
+            self._apply(event, changes)
+
+        # the watermark is the time the server generated the earliest response, so no update is missed between
+        # the responses
+        generated = datetime.fromtimestamp(min(result.get_metadata()["generated"]) / 1000.0, timezone.utc)
+        state["watermark"] = generated.replace(tzinfo=None).isoformat()
+        self._save_states()
+        return changes
+
+    def get_watermark(self) -> datetime:
+        """
+        Get the watermark of the last sync, the next sync requests the events updated after it
+
+        :return: datetime, the watermark in UTC, or None if the query has never been synced
+        """
+        watermark = self._states[self._key]["watermark"]
+        return None if watermark is None else datetime.fromisoformat(watermark)
+
+    def get_events(self) -> list:
+        """
+        Get the events of the local copy
+
+        :return: list, the events in GeoJSON Feature format
+        """
+        return list(self._events.values())
+
+    def get_result_collection(self) -> ResultCollection:
+        """
+        Get the local copy wrapped by a ResultCollection
+
+        :return: ResultCollection, the collection of the events of the local copy
+        """
+        watermark = self._states[self._key]["watermark"]
+        if watermark is None:
+            generated = 0
+        else:
+            generated = int(datetime.fromisoformat(watermark).replace(tzinfo=timezone.utc).timestamp() * 1000)
+        return ResultCollection([{"type": "FeatureCollection",
+                                  "metadata": {"generated": generated,
+                                               "url": EarthquakeQuery._base_url,
+                                               "title": "USGS Earthquakes",
+                                               "status": 200,
+                                               "api": None,
+                                               "count": len(self._events)},
+                                  "features": self.get_events()}])
+
+    def _apply(self, event: dict, changes: dict):
+        ids = [one for one in event["properties"]["ids"].split(",") if one] + [event["id"]]
+        known_ids = list(dict.fromkeys(self._aliases[one] for one in ids if one in self._aliases))
+        if event["properties"].get("status") == "deleted":
+            for known_id in known_ids:
+                self._remove(known_id)
+                changes["deleted"].append(known_id)
+            return
+        if not known_ids:
+            changes["inserted"].append(event["id"])
+        elif event["properties"]["updated"] > max(self._events[one]["properties"]["updated"] for one in known_ids):
+            changes["updated"].append(event["id"])
+        else:
+            # the local copy is already up to date, i.e. the event is requested again because of the overlap
+            return
+        for known_id in known_ids:
+            self._remove(known_id)
+        self._events[event["id"]] = event
+        self._register_aliases(event["id"], event)
+
+    def _register_aliases(self, event_id: str, event: dict):
+        for alias in event["properties"]["ids"].split(","):
+            if alias:
+                self._aliases[alias] = event_id
+        self._aliases[event_id] = event_id
+
+    def _remove(self, event_id: str):
+        event = self._events.pop(event_id)
+        for alias in event["properties"]["ids"].split(",") + [event_id]:
+            if self._aliases.get(alias) == event_id:
+                del self._aliases[alias]
+
+    def _load_states(self) -> dict:
+        if self.state_path is None or not os.path.exists(self.state_path):
+            return {}
+        with open(self.state_path, "r") as file:
+            return json.load(file)
+
+    def _save_states(self):
+        if self.state_path is None:
+            return
+        # write to a temporary file first, so that a crash never leaves a partial state file
+        temp_path = self.state_path + ".tmp"
+        with open(temp_path, "w") as file:
+            json.dump(self._states, file)
+        os.replace(temp_path, self.state_path)
@@ -139,3 +139,30 @@ class TimeFrame:
         :return: bool, true if update_after is set.
         """
         return self.update_after is not None
+
+    def can_split(self) -> bool:
+        """
+        Check if the timeframe can be split by split(). The time strings sent to the USGS API are precise to the
+        second, so a timeframe shorter than two seconds cannot be split.
+
+        :return: bool, true if the timeframe can be split.
+        """
+        return self.end_time.replace(microsecond=0) - self.start_time.replace(microsecond=0) >= \
+            datetime.timedelta(seconds=2)
+
+    def split(self) -> list:
+        """
+        Split the timeframe into two halves at the middle second. Both halves keep the update_after time.
+
+        Note:
+            Both halves include the middle second, because the start time and the end time of the USGS API are
+            inclusive. An event at the middle second is returned by both halves, and removed by ResultCollection.
+
+        :raises ValueError: when the timeframe is too short to be split, see can_split()
+        :return: list, the two TimeFrame halves
+        """
+        if not self.can_split():
+            raise ValueError("the timeframe is too short to be split")
+        middle_time = (self.start_time + (self.end_time - self.start_time) / 2).replace(microsecond=0)
+        return [TimeFrame(self.start_time, middle_time, self.update_after),
+                TimeFrame(middle_time, self.end_time, self.update_after)]
@@ -0,0 +1,154 @@
+import json
+import os
+import sys
+import tempfile
+import time
+import unittest
+from datetime import datetime, timedelta, timezone
+from unittest import mock
+
+sys.path.append(os.path.abspath('..'))
+from src.cache import ResponseCache, EventCache
+from src.session import HttpSession
+from src.single_result import SingleResult
+from src.earthquake_query import EarthquakeQuery
+from src.timeframe import TimeFrame
+from test.geojson_fixture import make_feature, make_collection
+
+
+class TestResponseCache(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_canonical_key(self):
+        # The order of the parameters does not matter
+        self.assertEqual(ResponseCache.canonical_key({"format": "geojson", "limit": 20000}),
+                         ResponseCache.canonical_key({"limit": 20000, "format": "geojson"}))
+
+    def test_ttl(self):
+        cache = ResponseCache(self.directory.name, recent_ttl=0)
+        settled = {"starttime": "2010-01-01T00:00:00", "endtime": "2010-02-01T00:00:00"}
+        recent_end = datetime.now() + timedelta(days=1)
+        recent = {"starttime": "2010-01-01T00:00:00", "endtime": recent_end.isoformat().split(".")[0]}
+        updated = dict(settled, updatedafter="2020-01-01T00:00:00")
+        response = make_collection([make_feature("us1", 0)])
+        for query_dict in [settled, recent, updated]:
+            cache.put(query_dict, response)
+        time.sleep(0.01)
+        self.assertEqual(response, cache.get(settled))
+        self.assertIsNone(cache.get(recent))
+        self.assertIsNone(cache.get(updated))
+
+    def test_ttl_timezone_aware(self):
+        # The end time of a timezone aware TimeFrame is compared in UTC
+        cache = ResponseCache(self.directory.name, recent_ttl=0)
+        start = datetime(2020, 1, 1, tzinfo=timezone.utc)
+        settled = TimeFrame(start, datetime(2020, 2, 1, tzinfo=timezone(timedelta(hours=8))))
+        recent_end = datetime.now(timezone.utc) + timedelta(hours=1)
+        recent = TimeFrame(start, recent_end.astimezone(timezone(timedelta(hours=-5))))
+        response = make_collection([make_feature("us1", 0)])
+        for time_frame in [settled, recent]:
+            cache.put({"endtime": time_frame.get_end_time_string()}, response)
+        time.sleep(0.01)
+        self.assertEqual(response, cache.get({"endtime": settled.get_end_time_string()}))
+        self.assertIsNone(cache.get({"endtime": recent.get_end_time_string()}))
+
+    def test_eviction(self):
+        response = make_collection([make_feature("us" + str(i), i) for i in range(10)])
+        cache = ResponseCache(self.directory.name)
+        cache.put({"endtime": "2010-01-01T00:00:00"}, response)
+        entry_size = cache.get_size()
+        cache = ResponseCache(self.directory.name, max_bytes=entry_size * 2)
+        self.assertEqual(entry_size, cache.get_size())
+        for day in range(2, 5):
+            cache.put({"endtime": "2010-01-0" + str(day) + "T00:00:00"}, response)
+        self.assertLessEqual(cache.get_size(), entry_size * 2)
+        self.assertIsNone(cache.get({"endtime": "2010-01-01T00:00:00"}))
+        self.assertEqual(response, cache.get({"endtime": "2010-01-04T00:00:00"}))
+        cache.clear()
+        self.assertEqual(0, cache.get_size())
+
+    def test_read_without_lock(self):
+        # The entry is parsed without the lock, and an expired entry replaced in the meantime is not removed
+        cache = ResponseCache(self.directory.name, recent_ttl=0)
+        query_dict = {"endtime": "2010-01-01T00:00:00"}
+        response = make_collection([make_feature("us1", 0)])
+        cache.put(query_dict, response)
+        load = json.load
+
+        def checked_load(file):
+            self.assertFalse(cache._lock.locked())
+            return load(file)
+
+        with mock.patch("src.cache.json.load", side_effect=checked_load):
+            self.assertEqual(response, cache.get(query_dict))
+
+        def replacing_load(file):
+            entry = load(file)
+            cache.put(query_dict, response)
+            return dict(entry, expires=0)
+
+        with mock.patch("src.cache.json.load", side_effect=replacing_load):
+            self.assertIsNone(cache.get(query_dict))
+        self.assertEqual(response, cache.get(query_dict))
+
+    def test_query_uses_cache(self):
+        # The second search is answered by the cache without sending a request
+        response = make_collection([make_feature("us1", 0)])
+        query = EarthquakeQuery(time=[TimeFrame(datetime(2010, 1, 1), datetime(2010, 1, 2))])
+        query.set_response_cache(ResponseCache(self.directory.name))
+        query.set_session(HttpSession())
+        http_response = mock.Mock(status_code=200, json=mock.Mock(return_value=response))
+        with mock.patch.object(HttpSession, "get", return_value=http_response) as get:
+            query.search()
+            query.search()
+        self.assertEqual(1, get.call_count)
+
+
+class TestEventCache(unittest.TestCase):
+    def test_alias(self):
+        # A lookup by any id in the "ids" property hits the same entry
+        cache = EventCache()
+        result = SingleResult(make_feature("us1", 0, ids=["us1", "ci1", "nc1"]))
+        self.assertIsNone(cache.get("ci1"))
+        cache.put("us1", result)
+        self.assertIs(result, cache.get("ci1"))
+        self.assertIs(result, cache.get("nc1"))
+        self.assertEqual(2, cache.get_hits())
+        self.assertEqual(1, cache.get_misses())
+        self.assertEqual(1, cache.get_size())
+
+    def test_lru_and_ttl(self):
+        cache = EventCache(max_size=2)
+        for i in range(3):
+            cache.put("us" + str(i), SingleResult(make_feature("us" + str(i), i)))
+            cache.get("us0")
+        self.assertIsNotNone(cache.get("us0"))
+        self.assertIsNone(cache.get("us1"))
+        self.assertIsNotNone(cache.get("us2"))
+
+        cache = EventCache(ttl=0)
+        cache.put("us1", SingleResult(make_feature("us1", 0)))
+        time.sleep(0.01)
+        self.assertIsNone(cache.get("us1"))
+        self.assertEqual(0, cache.get_size())
+
+    def test_search_by_event_id_uses_cache(self):
+        response = make_feature("us1", 0, ids=["us1", "ci1"])
+        http_response = mock.Mock(status_code=200, json=mock.Mock(return_value=response))
+        EarthquakeQuery.set_event_cache(EventCache())
+        try:
+            with mock.patch.object(HttpSession, "get", return_value=http_response) as get:
+                EarthquakeQuery.search_by_event_id("us1", session=HttpSession())
+                result = EarthquakeQuery.search_by_event_id("ci1", session=HttpSession())
+        finally:
+            EarthquakeQuery.set_event_cache(None)
+        self.assertEqual(1, get.call_count)
+        self.assertEqual("us1", result.get_raw_json()["id"])
+
+
+if __name__ == '__main__':
+    unittest.main()
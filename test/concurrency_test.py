@@ -0,0 +1,203 @@
+import tempfile
+import threading
+import time
+import unittest
+from datetime import datetime
+from unittest import mock
+
+from src.cache import ResponseCache
+from src.concurrency import AdaptiveConcurrency, HedgePolicy, _HttpStatusError
+from src.earthquake_query import EarthquakeQuery
+from src.session import HttpSession
+from src.timeframe import TimeFrame
+from test.geojson_fixture import make_feature, make_collection
+
+
+class TestAdaptiveConcurrency(unittest.TestCase):
+    def test_additive_increase(self):
+        # Test that the limit grows by one after a full limit of healthy requests, up to the maximum
+        concurrency = AdaptiveConcurrency(initial_limit=2, max_limit=4, latency_factor=None)
+        for _ in range(2):
+            concurrency.run(lambda: None)
+        self.assertEqual(3, concurrency.get_limit())
+        for _ in range(20):
+            concurrency.run(lambda: None)
+        self.assertEqual(4, concurrency.get_limit())
+        self.assertEqual([3, 4], [one[1] for one in concurrency.get_history()])
+        self.assertEqual("increase", concurrency.get_history()[0][2])
+
+    def test_multiplicative_decrease(self):
+        # Test that a throttled request halves the limit once, and the other errors do not change it
+        concurrency = AdaptiveConcurrency(initial_limit=8, max_limit=8)
+
+        def throttled():
+            raise _HttpStatusError(429, "Too Many Requests")
+
+        self.assertRaises(ValueError, concurrency.run, throttled)
+        self.assertEqual(4, concurrency.get_limit())
+        self.assertRaises(ValueError, concurrency.run, throttled)
+        self.assertEqual(2, concurrency.get_limit())
+
+        def bad_request():
+            raise _HttpStatusError(400, "Bad Request")
+
+        self.assertRaises(ValueError, concurrency.run, bad_request)
+        self.assertEqual(2, concurrency.get_limit())
+        self.assertEqual("throttled", concurrency.get_history()[-1][2])
+
+        # the requests in flight when the limit is cut do not cut it again
+        concurrency = AdaptiveConcurrency(initial_limit=4, max_limit=4)
+        started = threading.Barrier(4)
+        errors = []
+
+        def throttled_together():
+            started.wait()
+            throttled()
+
+        def call():
+            try:
+                concurrency.run(throttled_together)
+            except ValueError as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=call) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(4, len(errors))
+        self.assertEqual(2, concurrency.get_limit())
+
+    def test_latency_spike(self):
+        # Test that a request much slower than usual decreases the limit
+        concurrency = AdaptiveConcurrency(initial_limit=4, max_limit=4, latency_factor=3)
+        with mock.patch("src.concurrency.time.monotonic", side_effect=[0, 1, 10, 11, 20, 30]):
+            concurrency.run(lambda: None)
+            concurrency.run(lambda: None)
+            concurrency.run(lambda: None)
+        self.assertEqual(2, concurrency.get_limit())
+        self.assertEqual("latency", concurrency.get_history()[-1][2])
+        self.assertRaises(ValueError, AdaptiveConcurrency, initial_limit=0)
+        self.assertRaises(ValueError, AdaptiveConcurrency, decrease_factor=1)
+
+    def test_search(self):
+        # Test that search() never has more requests in flight than the limit
+        concurrency = AdaptiveConcurrency(initial_limit=2, max_limit=2)
+        lock = threading.Lock()
+        in_flight = [0, 0]
+
+        def fake_get(url, **kwargs):
+            with lock:
+                in_flight[0] += 1
+                in_flight[1] = max(in_flight[1], in_flight[0])
+            time.sleep(0.02)
+            with lock:
+                in_flight[0] -= 1
+            return mock.Mock(status_code=200, json=mock.Mock(return_value=make_collection([make_feature(url, 0)])))
+
+        time_frames = [TimeFrame(datetime(2010, 1, day), datetime(2010, 1, day + 1)) for day in range(1, 9)]
+        query = EarthquakeQuery(time=time_frames).set_adaptive_concurrency(concurrency)
+        with mock.patch.object(HttpSession, "get", side_effect=fake_get):
+            self.assertEqual(8, query.search().get_number_of_earthquakes())
+        self.assertEqual(2, in_flight[1])
+        self.assertRaises(TypeError, query.set_adaptive_concurrency, 4)
+
+    def test_search_cache_hits(self):
+        # Test that the responses from the cache do not take part in the limit and its latency
+        concurrency = AdaptiveConcurrency(initial_limit=10, max_limit=10)
+
+        def fake_get(url, **kwargs):
+            time.sleep(0.05)
+            return mock.Mock(status_code=200, json=mock.Mock(return_value=make_collection([make_feature(url, 0)])))
+
+        time_frames = [TimeFrame(datetime(2010, 1, day), datetime(2010, 1, day + 1)) for day in range(1, 22)]
+        with tempfile.TemporaryDirectory() as directory:
+            query = EarthquakeQuery(time=time_frames).set_adaptive_concurrency(concurrency) \
+                .set_response_cache(ResponseCache(directory))
+            for time_single in time_frames[:20]:
+                query_dict = query._build_query_dict(time_single, None)
+                query_dict["format"] = "geojson"
+                query._response_cache.put(query_dict, make_collection([make_feature(str(time_single), 0)]))
+            with mock.patch.object(HttpSession, "get", side_effect=fake_get) as get:
+                self.assertEqual(21, query.search().get_number_of_earthquakes())
+        self.assertEqual(1, get.call_count)
+        self.assertEqual(10, concurrency.get_limit())
+        self.assertEqual([], concurrency.get_history())
+
+
+class TestHedgePolicy(unittest.TestCase):
+    def slow_once(self):
+        # the first call is slow, the hedged copy answers at once
+        calls = []
+
+        def fetch():
+            calls.append(1)
+            if len(calls) == 1:
+                time.sleep(1)
+                return "slow"
+            return "fast"
+
+        return fetch, calls
+
+    def test_hedge_slow_request(self):
+        # Test that a request slower than the percentile is hedged, and the first answer is used
+        hedge_policy = HedgePolicy(percentile=90, max_hedge_ratio=1, min_samples=5, min_delay=0.05)
+        fetch, calls = self.slow_once()
+        self.assertIsNone(hedge_policy.get_delay())
+        for _ in range(5):
+            hedge_policy.run(lambda: "quick")
+        self.assertEqual(0.05, hedge_policy.get_delay())
+        start = time.monotonic()
+        self.assertEqual("fast", hedge_policy.run(fetch))
+        self.assertLess(time.monotonic() - start, 0.5)
+        self.assertEqual(2, len(calls))
+        self.assertEqual(1, hedge_policy.get_hedged())
+        self.assertEqual(6, hedge_policy.get_requests())
+
+    def test_hedge_cap(self):
+        # Test that no request is hedged beyond the ratio of the hedged traffic
+        hedge_policy = HedgePolicy(max_hedge_ratio=0, min_samples=0, min_delay=0.01)
+        hedge_policy.run(lambda: "quick")
+        fetch, calls = self.slow_once()
+        self.assertEqual("slow", hedge_policy.run(fetch))
+        self.assertEqual(1, len(calls))
+        self.assertEqual(0, hedge_policy.get_hedged())
+
+    def test_hedge_errors(self):
+        # Test that the error is raised only when both copies fail, and the invalid parameters are rejected
+        hedge_policy = HedgePolicy(max_hedge_ratio=1, min_samples=0, min_delay=0.01)
+        hedge_policy.run(lambda: "quick")
+
+        def fail():
+            time.sleep(0.05)
+            raise ValueError("failed")
+
+        self.assertRaises(ValueError, hedge_policy.run, fail)
+        self.assertEqual(1, hedge_policy.get_hedged())
+        self.assertRaises(ValueError, HedgePolicy, percentile=100)
+
+    def test_hedge_search(self):
+        # Test that the hedged copy of a search request is sent, instead of waiting for the request in flight
+        calls = []
+
+        def fake_get(url, **kwargs):
+            calls.append(url)
+            if len(calls) == 2:
+                time.sleep(1)
+            return mock.Mock(status_code=200, json=mock.Mock(return_value=make_collection([make_feature("us1", 0)])))
+
+        hedge_policy = HedgePolicy(max_hedge_ratio=1, min_samples=1, min_delay=0.01)
+        query = EarthquakeQuery(time=[TimeFrame(datetime(2010, 1, 1), datetime(2010, 1, 2))])
+        query.set_hedge_policy(hedge_policy)
+        with mock.patch.object(HttpSession, "get", side_effect=fake_get):
+            query.search()
+            start = time.monotonic()
+            self.assertEqual(1, query.search().get_number_of_earthquakes())
+        self.assertLess(time.monotonic() - start, 0.5)
+        self.assertEqual(3, len(calls))
+        self.assertEqual(calls[1], calls[2])
+        self.assertRaises(TypeError, EarthquakeQuery().set_hedge_policy, 0.95)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,47 @@
+import math
+import os
+import sys
+import unittest
+
+sys.path.append(os.path.abspath('..'))
+from src.csv_result import CsvResultCollection
+
+HEADER = "time,latitude,longitude,depth,mag,magType,nst,gap,dmin,rms,net,id,updated,place,type,horizontalError," \
+         "depthError,magError,magNst,status,locationSource,magSource\n"
+ROW_1 = '2014-01-01T00:01:16.610Z,19.4,-155.3,5.2,1.5,md,10,80,,0.1,hv,hv1,2014-01-02T00:00:00.000Z,' \
+        '"5km E of Volcano, Hawaii",earthquake,0.3,0.5,0.1,8,reviewed,hv,hv\n'
+ROW_2 = '2014-01-02T00:00:00.000Z,35.1,-118.2,8.9,,ml,,120,0.2,0.2,ci,ci2,2014-01-03T00:00:00.000Z,' \
+        '"10km N of Ridgecrest, CA",earthquake,0.4,0.6,,,automatic,ci,ci\n'
+ROW_3 = '2014-01-03T00:00:00.000Z,36.0,-117.0,3.0,2.5,ml,5,100,0.1,0.2,ci,ci3,2014-01-03T00:00:00.000Z,' \
+        '"Somewhere, CA",earthquake,0.4,0.6,0.2,6,reviewed,ci,ci\n'
+
+
+class TestCsvResultCollection(unittest.TestCase):
+    def setUp(self):
+        self.result = CsvResultCollection([HEADER + ROW_1 + ROW_2, HEADER + ROW_2 + ROW_3, HEADER])
+
+    def test_columns(self):
+        # The duplicated event ci2 is removed, and the columns are typed
+        self.assertEqual(3, self.result.get_number_of_earthquakes())
+        self.assertEqual(["hv1", "ci2", "ci3"], self.result.get_column("id"))
+        self.assertEqual(1388534476610, self.result.get_column("time")[0])
+        self.assertEqual(19.4, self.result.get_column("latitude")[0])
+        self.assertTrue(math.isnan(self.result.get_column("mag")[1]))
+        self.assertEqual("5km E of Volcano, Hawaii", self.result.get_column("place")[0])
+        self.assertRaises(KeyError, self.result.get_column, "title")
+
+    def test_ordering(self):
+        self.assertEqual(["ci3", "ci2", "hv1"], [one["id"] for one in self.result.get_data_by_keys(["id", "mag"])])
+        self.assertEqual([2.5, 1.5], self.result.get_all_magnitudes()[:2])
+        self.assertTrue(math.isnan(self.result.get_all_magnitudes()[2]))
+        self.assertEqual([3.0, 5.2, 8.9], self.result.get_all_depths(order_by="depth", descending=False))
+        self.assertEqual([-155.3, 19.4], self.result.get_all_coordinates(descending=False)[0])
+
+    def test_empty(self):
+        result = CsvResultCollection([HEADER])
+        self.assertEqual(0, result.get_number_of_earthquakes())
+        self.assertEqual([], result.get_all_magnitudes())
+
+
+if __name__ == '__main__':
+    unittest.main()
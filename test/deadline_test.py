@@ -0,0 +1,120 @@
+import threading
+import time
+import unittest
+from datetime import datetime
+from unittest import mock
+
+import requests
+
+from src.deadline import Deadline, _get_deadline, _wait_timeout
+from src.earthquake_query import EarthquakeQuery
+from src.retry import RetryPolicy, RateLimiter
+from src.session import HttpSession
+from src.timeframe import TimeFrame
+from test.geojson_fixture import make_feature, make_collection
+
+
+def fake_response(status_code, body=None, headers=None):
+    response = mock.Mock(status_code=status_code, headers={} if headers is None else headers)
+    response.json.return_value = body
+    return response
+
+
+class TestDeadline(unittest.TestCase):
+    def test_scope(self):
+        # Test that a deadline is only active in its block, and an inner deadline never ends after the outer one
+        self.assertIsNone(_get_deadline())
+        self.assertEqual(3, _wait_timeout(3))
+        with Deadline(10) as outer:
+            self.assertIs(outer, _get_deadline())
+            self.assertLessEqual(_wait_timeout(), 10)
+            self.assertEqual(3, _wait_timeout(3))
+            with Deadline(100) as inner:
+                self.assertIs(inner, _get_deadline())
+                self.assertLessEqual(inner.remaining(), 10)
+            self.assertIs(outer, _get_deadline())
+        self.assertIsNone(_get_deadline())
+        self.assertRaises(TypeError, Deadline, "1")
+        self.assertRaises(ValueError, Deadline, 0)
+
+    def test_expired(self):
+        deadline = Deadline(0.01)
+        time.sleep(0.02)
+        self.assertTrue(deadline.expired())
+        self.assertEqual(0, deadline.remaining())
+        self.assertRaises(TimeoutError, deadline.check)
+        with deadline:
+            self.assertRaises(TimeoutError, _wait_timeout, 5)
+
+    def test_retry_before_deadline(self):
+        # Test that a retry is not started when its delay would pass the deadline
+        responses = [fake_response(503, headers={"Retry-After": "30"}), fake_response(200)]
+        with mock.patch("src.retry.time.sleep") as sleep, Deadline(5):
+            response = RetryPolicy(max_retries=3, max_backoff=60).send(lambda: responses.pop(0))
+        self.assertEqual(503, response.status_code)
+        sleep.assert_not_called()
+
+    def test_rate_limiter_before_deadline(self):
+        # Test that a request waiting for the rate limiter past the deadline fails at once, and gives its token back
+        rate_limiter = RateLimiter(rate=0.1, burst=1)
+        rate_limiter.acquire()
+        with Deadline(1):
+            self.assertRaises(TimeoutError, rate_limiter.acquire)
+        self.assertAlmostEqual(0, rate_limiter._tokens, delta=0.1)
+
+    def test_session_timeout(self):
+        # Test that every request of a session only gets the time left before the deadline
+        session = HttpSession(timeout=30)
+        with mock.patch.object(session._session, "get", return_value=fake_response(200)) as get:
+            session.get("https://example.com")
+            self.assertEqual(30, get.call_args[1]["timeout"])
+            with Deadline(5):
+                session.get("https://example.com")
+            self.assertLessEqual(get.call_args[1]["timeout"], 5)
+
+    def test_partial_search(self):
+        # Test that the requests not finished by the deadline are failed pairs of a partial search, in every thread
+        for workers in [1, 3]:
+            def fake_get(url, params=None, **kwargs):
+                if "starttime=2010-01-01" in url:
+                    return fake_response(200, make_collection([make_feature("us1", 0)]))
+                time.sleep(kwargs["timeout"])
+                raise requests.Timeout("timed out")
+
+            session = HttpSession()
+            time_frames = [TimeFrame(datetime(2010, 1, day), datetime(2010, 1, day + 1)) for day in range(1, 4)]
+            query = EarthquakeQuery(time=time_frames).set_session(session).set_max_workers(workers)
+            start = time.monotonic()
+            with mock.patch.object(session._session, "get", side_effect=fake_get):
+                result = query.search(partial=True, deadline=0.2)
+                self.assertLess(time.monotonic() - start, 2)
+                self.assertEqual(1, result.get_number_of_earthquakes())
+                self.assertEqual(2, len(result.get_failed_cells()))
+                self.assertTrue(all(isinstance(one.error, TimeoutError) for one in result.get_failed_cells()))
+                self.assertRaises(TimeoutError, query.search, deadline=Deadline(0.2))
+
+    def test_search_by_event_id(self):
+        # Test that a follower waiting for the same event id in flight stops waiting at the deadline
+        release = threading.Event()
+
+        def slow_fetch():
+            release.wait(5)
+
+        leader = threading.Thread(target=EarthquakeQuery._single_flight.do, args=("key", slow_fetch))
+        leader.start()
+        try:
+            time.sleep(0.05)
+            with Deadline(0.1):
+                self.assertRaises(TimeoutError, EarthquakeQuery._single_flight.do, "key", slow_fetch)
+        finally:
+            release.set()
+            leader.join()
+        session = HttpSession()
+        with mock.patch.object(session._session, "get", return_value=fake_response(200, {"id": "us1"})):
+            with Deadline(0.01):
+                time.sleep(0.02)
+                self.assertRaises(TimeoutError, EarthquakeQuery.search_by_event_id, "us1", session)
+
+
+if __name__ == '__main__':
+    unittest.main()
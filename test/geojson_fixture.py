@@ -0,0 +1,34 @@
+def make_feature(event_id, time, mag=1.0, longitude=0.0, latitude=0.0, depth=10.0, ids=None, updated=None,
+                 net=None, sig=0, status="reviewed"):
+    # build a feature shaped like the ones in the USGS GeoJSON response
+    if ids is None:
+        ids = [event_id]
+    return {"type": "Feature",
+            "properties": {"mag": mag,
+                           "place": "place of " + event_id,
+                           "time": time,
+                           "updated": time if updated is None else updated,
+                           "url": "https://earthquake.usgs.gov/earthquakes/eventpage/" + event_id,
+                           "detail": "https://earthquake.usgs.gov/fdsnws/event/1/query?eventid=" + event_id,
+                           "status": status,
+                           "sig": sig,
+                           "net": event_id[:2] if net is None else net,
+                           "code": event_id[2:],
+                           "ids": "," + ",".join(ids) + ",",
+                           "title": "M " + str(mag) + " - place of " + event_id},
+            "geometry": {"type": "Point", "coordinates": [longitude, latitude, depth]},
+            "id": event_id}
+
+
+def make_collection(features, url="https://earthquake.usgs.gov/fdsnws/event/1/query?format=geojson"):
+    # build a response shaped like the USGS GeoJSON FeatureCollection, ordered by time descending
+    features = sorted(features, key=lambda i: i["properties"]["time"], reverse=True)
+    return {"type": "FeatureCollection",
+            "metadata": {"generated": 1620613174000,
+                         "url": url,
+                         "title": "USGS Earthquakes",
+                         "status": 200,
+                         "api": "1.10.3",
+                         "count": len(features)},
+            "features": features,
+            "bbox": [0, 0, 0, 0, 0, 0]}
@@ -29,6 +29,13 @@ class TestRectangle(unittest.TestCase):
         with self.assertRaises(ValueError):
             Rectangle(0, 0, -10, 10)
 
+    def test_split(self):
+        # The rectangle is split across its longer side
+        first, second = Rectangle(0, 0, 10, 40).split()
+        self.assertEqual(first.get_value(), Rectangle(0, 0, 10, 20).get_value())
+        self.assertEqual(second.get_value(), Rectangle(0, 20, 10, 40).get_value())
+        self.assertFalse(Rectangle(0, 0, 0.0001, 0.0001).can_split())
+
 
 class TestCircle(unittest.TestCase):
     def test_init_km_happy_path(self):
@@ -0,0 +1,80 @@
+import unittest
+from unittest import mock
+from datetime import datetime
+
+from src.planner import _MergedRectangle, _coalesce_time_frames, _coalesce_locations
+from src.timeframe import TimeFrame
+from src.location import Rectangle, Circle
+from test.geojson_fixture import make_feature, make_collection
+
+
+class TestPlanner(unittest.TestCase):
+    def test_coalesce_time_frames(self):
+        # Test that the overlapping and touching time frames are merged, but not the ones with a gap
+        time = [TimeFrame(datetime(2010, 1, 3), datetime(2010, 1, 4)),
+                TimeFrame(datetime(2010, 1, 1), datetime(2010, 1, 2)),
+                TimeFrame(datetime(2010, 1, 2), datetime(2010, 1, 3)),
+                TimeFrame(datetime(2010, 1, 6), datetime(2010, 1, 7)),
+                TimeFrame(datetime(2010, 1, 1), datetime(2010, 1, 2), datetime(2010, 1, 5))]
+        merged = _coalesce_time_frames(time)
+        self.assertEqual([("2010-01-01T00:00:00", "2010-01-04T00:00:00", False),
+                          ("2010-01-01T00:00:00", "2010-01-02T00:00:00", True),
+                          ("2010-01-06T00:00:00", "2010-01-07T00:00:00", False)],
+                         [(one.get_start_time_string(), one.get_end_time_string(), one.is_update_after_set())
+                          for one in merged])
+        self.assertEqual([None], _coalesce_time_frames([None]))
+
+    def test_coalesce_locations(self):
+        # Test that the nested rectangles are dropped and the overlapping ones are merged only if it saves area
+        outer = Rectangle(0, 0, 10, 10)
+        circle = Circle(0, 0)
+        self.assertEqual([outer, circle], _coalesce_locations([Rectangle(2, 2, 5, 5), circle, outer]))
+        self.assertEqual([None], _coalesce_locations([outer, None]))
+
+        cross = [Rectangle(0, 0, 1, 10), Rectangle(-5, 4, 5, 5)]
+        self.assertEqual(cross, _coalesce_locations(cross))
+
+        merged = _coalesce_locations([outer, Rectangle(2, 2, 12, 12), Rectangle(50, 50, 60, 60)])
+        self.assertIsInstance(merged[0], _MergedRectangle)
+        self.assertEqual({"minlatitude": 0, "minlongitude": 0, "maxlatitude": 12, "maxlongitude": 12},
+                         merged[0].get_value())
+        self.assertNotIsInstance(merged[1], _MergedRectangle)
+
+    def test_coalesce_locations_with_cost(self):
+        # Test that the clustered small rectangles are merged when a request costs more than the events in the gaps
+        cluster = [Rectangle(lat, lon, lat + 0.5, lon + 0.5) for lat in range(0, 4) for lon in range(0, 5)]
+        far = Rectangle(60, 100, 61, 101)
+        merged = _coalesce_locations(cluster + [far], request_cost=500, density=1000)
+        self.assertEqual(2, len(merged))
+        self.assertCountEqual(cluster, merged[0].members)
+        self.assertIs(far, merged[1])
+        # too many events in the gaps, or in the envelope
+        self.assertEqual(21, len(_coalesce_locations(cluster + [far], request_cost=500, density=10 ** 7)))
+        self.assertEqual(21, len(_coalesce_locations(cluster + [far], request_cost=500, density=1000, max_events=0.1)))
+
+    def test_merged_rectangle_filter(self):
+        # Test that the events outside all the members are removed in both formats, also after a split
+        merged = _MergedRectangle([Rectangle(0, 0, 10, 10), Rectangle(2, 2, 12, 12)])
+        response = make_collection([make_feature("us1", 0, longitude=1.0, latitude=1.0),
+                                    make_feature("us2", 0, longitude=11.0, latitude=1.0)])
+        self.assertEqual(["us1"], [one["id"] for one in merged.filter_response(response)["features"]])
+        csv_text = "time,latitude,longitude,id\n2010-01-01T00:00:00.000Z,1,1,us1\n2010-01-01T00:00:00.000Z,1,11,us2\n"
+        self.assertEqual("time,latitude,longitude,id\n2010-01-01T00:00:00.000Z,1,1,us1\n",
+                         merged.filter_response(csv_text))
+        halves = merged.split()
+        self.assertTrue(all(isinstance(one, _MergedRectangle) for one in halves))
+        self.assertFalse(any(one.contains(11.0, 1.0) for one in halves))
+        self.assertTrue(any(one.contains(11.0, 11.0) for one in halves))
+
+        with mock.patch("src.planner.numpy", None):
+            self.assertEqual([True, False, True], merged.contains_all([1.0, 11.0, 11.0], [1.0, 1.0, 11.0]))
+
+        # a half of a split overlapping no member
+        self.assertEqual([False, False], _MergedRectangle([], (0, 0, 1, 1)).contains_all([0.5, 0.7], [0.5, 0.7]))
+
+        # a rectangle crossing the date line
+        self.assertTrue(_MergedRectangle([Rectangle(0, 170, 10, 190)]).contains(-175.0, 5.0))
+
+
+if __name__ == '__main__':
+    unittest.main()
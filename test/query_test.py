@@ -1,7 +1,12 @@
+import asyncio
+import json
 import os
 import sys
+import threading
+import time
 import unittest
-from datetime import datetime
+from datetime import datetime, timedelta
+from unittest import mock
 
 import requests
 
@@ -10,6 +15,44 @@ from src.earthquake_query import EarthquakeQuery
 from src.timeframe import TimeFrame
 from src.location import Rectangle, Circle, RadiusUnit, GeoRectangle
 from src.enum.contributor import Contributor
+from src.async_transport import AsyncTransport
+from src.session import HttpSession
+from src.single_result import SingleResult
+from src.planner import _MergedRectangle
+from test.geojson_fixture import make_feature, make_collection
+
+
+class FakeTransport(AsyncTransport):
+    # answer every request with one feature whose id is the start time of the request
+    def __init__(self, fail_on=None):
+        self.fail_on = fail_on
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.closed = False
+
+    async def get(self, url):
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        await asyncio.sleep(0.01)
+        self.in_flight -= 1
+        if self.fail_on is not None and self.fail_on in url:
+            return 500, "failed"
+        start_time = url.split("starttime=")[1].split("&")[0]
+        return 200, json.dumps(make_collection([make_feature("us" + start_time, 0)]))
+
+    async def close(self):
+        self.closed = True
+
+
+def fake_streamed_response(url, **kwargs):
+    # respond with the same three events for every day, plus one event only in this day
+    start_time = url.split("starttime=")[1].split("&")[0]
+    body = json.dumps(make_collection([make_feature("us" + start_time, 10),
+                                       make_feature("usshared", 5, ids=["usshared", "cishared"]),
+                                       make_feature("cishared2", 1)])).encode("utf-8")
+    chunks = [body[i:i + 50] for i in range(0, len(body), 50)]
+    return mock.Mock(status_code=200, json=mock.Mock(return_value=json.loads(body)),
+                     iter_content=mock.Mock(return_value=iter(chunks)))
 
 
 class TestEarthquakeQuery(unittest.TestCase):
@@ -76,6 +119,417 @@ class TestEarthquakeQuery(unittest.TestCase):
 
         self.assertEqual(parameter, query.get_query_parameters())
 
+    def test_concurrent_search_order(self):
+        # Test that the concurrent search combines the responses in the same order as the sequential search
+        time = [TimeFrame(datetime(2010, 1, day), datetime(2010, 1, day + 1)) for day in range(1, 5)]
+        location = [Rectangle(0, 0, 10, 10), Rectangle(10, 10, 20, 20)]
+
+        def fake_query_single(time_single, location_single):
+            index = time.index(time_single) * 2 + location.index(location_single)
+            return make_collection([make_feature("us" + str(index), index)])
+
+        query = EarthquakeQuery(time=time, location=location).set_max_workers(4)
+        with mock.patch.object(query, "_query_single", side_effect=fake_query_single):
+            result = query.search()
+        self.assertEqual(["us" + str(i) for i in range(8)],
+                         [feature["id"] for feature in result.get_combined_json()["features"]])
+
+    def test_concurrent_search_failure(self):
+        # Test that a failed request in the concurrent search raises the error of the first failed pair
+        time = [TimeFrame(datetime(2010, 1, day), datetime(2010, 1, day + 1)) for day in range(1, 5)]
+
+        def fake_query_single(time_single, location_single):
+            index = time.index(time_single)
+            if index >= 2:
+                raise ValueError("failed " + str(index))
+            return make_collection([make_feature("us" + str(index), index)])
+
+        query = EarthquakeQuery(time=time).set_max_workers(4)
+        with mock.patch.object(query, "_query_single", side_effect=fake_query_single):
+            with self.assertRaises(ValueError) as context:
+                query.search()
+        self.assertEqual("failed 2", str(context.exception))
+
+    def test_partial_search(self):
+        # Test that a partial search keeps the results that succeeded, and only the failed pairs are searched again
+        for workers in [1, 3]:
+            requests_sent = []
+            failing = {"2010-01-02T00:00:00", "2010-01-04T00:00:00"}
+
+            def fake_query_single(time_single, location_single):
+                start_time = time_single.get_start_time_string()
+                requests_sent.append(start_time)
+                if start_time in failing:
+                    raise ValueError("failed " + start_time)
+                return make_collection([make_feature("us" + start_time, 0)])
+
+            time_frames = [TimeFrame(datetime(2010, 1, day), datetime(2010, 1, day + 1)) for day in range(1, 5)]
+            query = EarthquakeQuery(time=time_frames).set_max_workers(workers)
+            with mock.patch.object(query, "_query_single", side_effect=fake_query_single):
+                self.assertRaises(ValueError, query.search)
+                result = query.search(partial=True)
+                self.assertEqual(2, result.get_number_of_earthquakes())
+                self.assertEqual(["2010-01-02T00:00:00", "2010-01-04T00:00:00"],
+                                 [one.time.get_start_time_string() for one in result.get_failed_cells()])
+                self.assertIsInstance(result.get_failed_cells()[0].error, ValueError)
+
+                failing.remove("2010-01-02T00:00:00")
+                requests_sent.clear()
+                self.assertIs(result, query.retry_failed(result))
+                self.assertEqual(["2010-01-02T00:00:00", "2010-01-04T00:00:00"], sorted(requests_sent))
+                self.assertEqual(3, result.get_number_of_earthquakes())
+                self.assertFalse(result.is_complete())
+
+                failing.clear()
+                query.retry_failed(result)
+                self.assertTrue(result.is_complete())
+                self.assertEqual(4, result.get_number_of_earthquakes())
+
+        # every request fails
+        query = EarthquakeQuery(time=[TimeFrame(datetime(2010, 1, 1), datetime(2010, 1, 2))])
+        with mock.patch.object(query, "_query_single", side_effect=ValueError("failed")):
+            result = query.search(partial=True)
+        self.assertEqual(0, result.get_number_of_earthquakes())
+        self.assertEqual(1, len(result.get_failed_cells()))
+
+    def test_set_max_workers(self):
+        # Test the validation of the max workers
+        query = EarthquakeQuery()
+        self.assertEqual(1, query.get_max_workers())
+        self.assertEqual(8, query.set_max_workers(8).get_max_workers())
+        self.assertRaises(ValueError, query.set_max_workers, 0)
+        self.assertRaises(TypeError, query.set_max_workers, 1.5)
+
+    def test_search_async(self):
+        # Test that the asyncio search bounds the concurrency and keeps the order of the sequential search
+        time = [TimeFrame(datetime(2010, 1, day), datetime(2010, 1, day + 1)) for day in range(1, 9)]
+        transport = FakeTransport()
+        result = asyncio.run(EarthquakeQuery(time=time).search_async(transport=transport, max_concurrency=3))
+        self.assertEqual(["us" + one.get_start_time_string() for one in time],
+                         [feature["id"] for feature in result.get_combined_json()["features"]])
+        self.assertEqual(3, transport.max_in_flight)
+        self.assertFalse(transport.closed)
+
+    def test_search_async_failure(self):
+        # Test that a failed request in the asyncio search raises a ValueError
+        time = [TimeFrame(datetime(2010, 1, day), datetime(2010, 1, day + 1)) for day in range(1, 9)]
+        transport = FakeTransport(fail_on="2010-01-05")
+        with self.assertRaises(ValueError):
+            asyncio.run(EarthquakeQuery(time=time).search_async(transport=transport, max_concurrency=2))
+
+    def test_adaptive_split(self):
+        # Test that the requests reaching the limit are split until every request is under the limit
+        events = [make_feature("us" + str(hour), datetime(2010, 1, 1, hour).timestamp() * 1000) for hour in range(24)]
+        requests_sent = []
+
+        def fake_query_single(time_single, location_single):
+            requests_sent.append(time_single)
+            start = time_single.start_time.timestamp() * 1000
+            end = time_single.end_time.timestamp() * 1000
+            features = [one for one in events if start <= one["properties"]["time"] <= end]
+            return make_collection(features[:query.get_limit()])
+
+        for workers in [1, 4]:
+            requests_sent.clear()
+            query = EarthquakeQuery(time=[TimeFrame(datetime(2010, 1, 1), datetime(2010, 1, 2))], limit=5)
+            query.set_adaptive_split(True).set_max_workers(workers)
+            with mock.patch.object(query, "_query_single", side_effect=fake_query_single):
+                result = query.search()
+            self.assertEqual(24, result.get_number_of_earthquakes())
+            self.assertGreater(len(requests_sent), 1)
+
+        query = EarthquakeQuery(time=[TimeFrame(datetime(2010, 1, 1), datetime(2010, 1, 2))], limit=5)
+        with mock.patch.object(query, "_query_single", side_effect=fake_query_single):
+            self.assertEqual(5, query.search().get_number_of_earthquakes())
+
+    def test_plan_search(self):
+        # Test that the count planner merges the sparse time frames and splits the dense ones
+        counts = {1: 2, 2: 3, 3: 0, 4: 4, 5: 16}
+        events = []
+        for day, count in counts.items():
+            events.extend([datetime(2010, 1, day) + timedelta(hours=one * 24 / count, minutes=1) for one in range(count)])
+
+        def fake_count_single(time_single, location_single):
+            return len([one for one in events if time_single.start_time <= one <= time_single.end_time])
+
+        time = [TimeFrame(datetime(2010, 1, day), datetime(2010, 1, day + 1)) for day in range(1, 6)]
+        query = EarthquakeQuery(time=time, limit=10)
+        with mock.patch.object(query, "_count_single", side_effect=fake_count_single):
+            plan = query.plan_search()
+        self.assertEqual([("2010-01-01T00:00:00", "2010-01-05T00:00:00"),
+                          ("2010-01-05T00:00:00", "2010-01-05T12:00:00"),
+                          ("2010-01-05T12:00:00", "2010-01-06T00:00:00")],
+                         [(one[0].get_start_time_string(), one[0].get_end_time_string()) for one in plan])
+
+        # time frames with a gap are never merged
+        time = [TimeFrame(datetime(2010, 1, 1), datetime(2010, 1, 2)), TimeFrame(datetime(2010, 1, 4), datetime(2010, 1, 5))]
+        query = EarthquakeQuery(time=time, limit=10)
+        with mock.patch.object(query, "_count_single", side_effect=fake_count_single):
+            self.assertEqual(2, len(query.plan_search()))
+
+        # a pair over the limit that cannot be split is planned with a warning
+        time = [TimeFrame(datetime(2010, 1, 5, 0, 0, 30), datetime(2010, 1, 5, 0, 0, 31))]
+        query = EarthquakeQuery(time=time, location=[Circle(0, 0)], limit=10)
+        with mock.patch.object(query, "_count_single", return_value=11), self.assertWarns(UserWarning):
+            self.assertEqual(1, len(query.plan_search()))
+
+    def test_columnar(self):
+        # Test that the columnar storage is passed to the results, and requires numpy
+        query = EarthquakeQuery(time=[TimeFrame(datetime(2010, 1, 1), datetime(2010, 1, 2))])
+        self.assertFalse(query.get_columnar())
+        self.assertRaises(TypeError, query.set_columnar, 1)
+        with mock.patch("src.earthquake_query.numpy", None):
+            self.assertRaises(ImportError, query.set_columnar, True)
+        with mock.patch("src.earthquake_query.numpy", object()), mock.patch("src.earthquake_query.ResultCollection") \
+                as result_collection, mock.patch.object(query, "_query_single", return_value=make_collection([])):
+            query.set_columnar(True).search()
+        self.assertTrue(query.get_columnar())
+        self.assertTrue(result_collection.call_args[1]["columnar"])
+
+    def test_keep_policy(self):
+        # Test that the keep policy is passed to the results
+        query = EarthquakeQuery(time=[TimeFrame(datetime(2010, 1, 1), datetime(2010, 1, 2)),
+                                      TimeFrame(datetime(2010, 1, 2), datetime(2010, 1, 3))])
+        self.assertEqual("first", query.get_keep_policy())
+        self.assertRaises(ValueError, query.set_keep_policy, "last")
+        self.assertRaises(ValueError, query.set_keep_policy, "network")
+        responses = [make_collection([make_feature("us1", 0, 4.0, updated=1)]),
+                     make_collection([make_feature("ci1", 0, 4.5, ids=["ci1", "us1"], updated=2)])]
+        with mock.patch.object(query, "_query_single", side_effect=responses + responses):
+            self.assertEqual([4.0], query.search().get_all_magnitudes())
+            self.assertEqual([4.5], query.set_keep_policy("updated").search().get_all_magnitudes())
+        self.assertEqual("updated", query.get_keep_policy())
+
+    def test_coalesce(self):
+        # Test that the coalesced search sends fewer requests and returns the same earthquakes
+        events = [make_feature("us1", datetime(2010, 1, 2).timestamp() * 1000, longitude=1.0, latitude=1.0),
+                  make_feature("us2", datetime(2010, 1, 3).timestamp() * 1000, longitude=11.0, latitude=11.0),
+                  make_feature("us3", datetime(2010, 1, 3).timestamp() * 1000, longitude=11.0, latitude=1.0),
+                  make_feature("us4", datetime(2010, 1, 9).timestamp() * 1000, longitude=3.0, latitude=3.0)]
+        requests_sent = []
+
+        def fake_query_single(time_single, location_single):
+            requests_sent.append((time_single, location_single))
+            start = time_single.start_time.timestamp() * 1000
+            end = time_single.end_time.timestamp() * 1000
+            return make_collection([one for one in events if start <= one["properties"]["time"] <= end and
+                                    location_single.min_longitude <= one["geometry"]["coordinates"][0] <=
+                                    location_single.max_longitude and
+                                    location_single.min_latitude <= one["geometry"]["coordinates"][1] <=
+                                    location_single.max_latitude])
+
+        time = [TimeFrame(datetime(2010, 1, 1), datetime(2010, 1, 3)), TimeFrame(datetime(2010, 1, 2), datetime(2010, 1, 4)),
+                TimeFrame(datetime(2010, 1, 8), datetime(2010, 1, 10))]
+        location = [Rectangle(0, 0, 10, 10), Rectangle(2, 2, 5, 5), Rectangle(2, 2, 12, 12)]
+        expected = None
+        for coalesce in [False, True]:
+            requests_sent.clear()
+            query = EarthquakeQuery(time=time, location=location).set_coalesce(coalesce).set_adaptive_split(True)
+            with mock.patch.object(query, "_query_single", side_effect=fake_query_single):
+                ids = sorted(one["id"] for one in query.search().get_combined_json()["features"])
+            if expected is None:
+                expected = ids
+                self.assertEqual(9, len(requests_sent))
+            else:
+                self.assertEqual(expected, ids)
+                self.assertEqual(2, len(requests_sent))
+        # us3 is inside the merged rectangle, but outside all the original rectangles
+        self.assertEqual(["us1", "us2", "us4"], expected)
+
+    def test_coalesce_limit(self):
+        # Test that a merged request reaching the limit loses no event of the original requests
+        events = [make_feature("us" + str(day) + str(index), datetime(2010, 1, day, 12, index).timestamp() * 1000)
+                  for day in [1, 3] for index in range(day, day + 5)]
+        requests_sent = []
+
+        def fake_query_single(time_single, location_single):
+            requests_sent.append(time_single)
+            start = time_single.start_time.timestamp() * 1000
+            end = time_single.end_time.timestamp() * 1000
+            return make_collection([one for one in events if start <= one["properties"]["time"] <= end][:6])
+
+        time = [TimeFrame(datetime(2010, 1, 1), datetime(2010, 1, 3)), TimeFrame(datetime(2010, 1, 2), datetime(2010, 1, 4))]
+        for adaptive_split in [False, True]:
+            requests_sent.clear()
+            query = EarthquakeQuery(time=time).set_limit(6).set_coalesce(True).set_adaptive_split(adaptive_split)
+            with mock.patch.object(query, "_query_single", side_effect=fake_query_single):
+                self.assertEqual(10, query.search().get_number_of_earthquakes())
+            # without the adaptive split, the time frames are not merged
+            first_requests = [(one.start_time, one.end_time) for one in requests_sent[:2]]
+            if adaptive_split:
+                self.assertEqual((datetime(2010, 1, 1), datetime(2010, 1, 4)), first_requests[0])
+            else:
+                self.assertEqual([(one.start_time, one.end_time) for one in time], first_requests)
+
+    def test_request_cost(self):
+        # Test that many small rectangles are searched by one request on their envelope when it is cheaper
+        location = [Rectangle(lat, lon, lat + 0.5, lon + 0.5) for lat in range(0, 4) for lon in range(0, 5)]
+        events = [make_feature("us" + str(index), 0, longitude=one.min_longitude + 0.1, latitude=one.min_latitude + 0.1)
+                  for index, one in enumerate(location)]
+        events.append(make_feature("usgap", 0, longitude=0.7, latitude=0.7))
+        requests_sent = []
+
+        def fake_query_single(time_single, location_single):
+            requests_sent.append(location_single)
+            return make_collection([one for one in events if
+                                    location_single.min_longitude <= one["geometry"]["coordinates"][0] <=
+                                    location_single.max_longitude and
+                                    location_single.min_latitude <= one["geometry"]["coordinates"][1] <=
+                                    location_single.max_latitude])
+
+        time = [TimeFrame(datetime(2010, 1, 1), datetime(2010, 1, 2))]
+        query = EarthquakeQuery(time=time, location=location).set_coalesce(True).set_request_cost(500) \
+            .set_adaptive_split(True)
+        with mock.patch.object(query, "_query_single", side_effect=fake_query_single), \
+                mock.patch.object(query, "_count_single", return_value=len(events)):
+            result = query.search()
+        self.assertEqual(1, len(requests_sent))
+        self.assertEqual(20, result.get_number_of_earthquakes())
+        self.assertRaises(ValueError, query.set_request_cost, -1)
+
+    def test_split_merged_rectangle(self):
+        # Test that the halves of a saturated merged rectangle overlapping no member are never requested
+        location = [Rectangle(0, 0, 1, 1), Rectangle(9, 9, 10, 10)]
+        events = [make_feature("us" + str(index) + str(lat) + str(lon), 0, longitude=one.min_longitude + 0.1 + 0.2 * lon,
+                               latitude=one.min_latitude + 0.1 + 0.2 * lat)
+                  for index, one in enumerate(location) for lat in range(5) for lon in range(5)]
+
+        def fake_query_single(time_single, location_single, response_format="geojson"):
+            requests_sent.append(location_single)
+            return make_collection([one for one in events if
+                                    location_single.min_longitude <= one["geometry"]["coordinates"][0] <=
+                                    location_single.max_longitude and
+                                    location_single.min_latitude <= one["geometry"]["coordinates"][1] <=
+                                    location_single.max_latitude][:20])
+
+        time = [TimeFrame(datetime(2010, 1, 1), datetime(2010, 1, 1, 0, 0, 1))]
+        for search in ["search", "search_iter"]:
+            requests_sent = []
+            query = EarthquakeQuery(time=time, location=location).set_limit(20).set_coalesce(True) \
+                .set_request_cost(1000).set_adaptive_split(True)
+            with mock.patch.object(query, "_query_single", side_effect=fake_query_single), \
+                    mock.patch.object(query, "_stream_single",
+                                      side_effect=lambda *args: iter(fake_query_single(*args)["features"])), \
+                    mock.patch.object(query, "_count_single", return_value=1):
+                result = getattr(query, search)()
+                ids = [one["id"] for one in result] if search == "search_iter" else \
+                    [one["id"] for one in result.get_combined_json()["features"]]
+            self.assertEqual(50, len(set(ids)))
+            self.assertIsInstance(requests_sent[0], _MergedRectangle)
+            self.assertTrue(all(one.members for one in requests_sent))
+            self.assertEqual(17, len(requests_sent))
+
+    def test_single_flight(self):
+        # Test that the identical searches of different threads share the request in flight
+        requests_sent = []
+
+        def fake_get(url, **kwargs):
+            requests_sent.append(url)
+            time.sleep(0.2)
+            return mock.Mock(status_code=200, json=mock.Mock(return_value=make_collection([make_feature("us1", 0)])))
+
+        time_frames = [TimeFrame(datetime(2010, 1, 1), datetime(2010, 1, 2))]
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(EarthquakeQuery(time=time_frames).search()))
+                   for _ in range(4)]
+        with mock.patch.object(HttpSession, "get", side_effect=fake_get):
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        self.assertEqual(1, len(requests_sent))
+        self.assertEqual([1] * 4, [one.get_number_of_earthquakes() for one in results])
+
+    def test_search_pages(self):
+        # Test that every cell is walked page by page until a short page, and the duplicated events are skipped
+        events = {"2010-01-01T00:00:00": [make_feature("us" + str(one), one) for one in range(7)],
+                  "2010-01-02T00:00:00": [make_feature("us6", 6)] + [make_feature("ci" + str(one), one) for one in range(3)]}
+        requests_sent = []
+
+        def fake_query_single(time_single, location_single, response_format="geojson", offset=None, limit=None):
+            requests_sent.append((time_single.get_start_time_string(), offset))
+            features = events[time_single.get_start_time_string()]
+            return make_collection(features[offset - 1:offset - 1 + limit])
+
+        time_frames = [TimeFrame(datetime(2010, 1, day), datetime(2010, 1, day + 1)) for day in range(1, 3)]
+        for prefetch in [0, 2]:
+            requests_sent.clear()
+            query = EarthquakeQuery(time=time_frames)
+            with mock.patch.object(query, "_query_single", side_effect=fake_query_single):
+                pages = list(query.search_pages(page_size=3, prefetch=prefetch))
+            self.assertEqual([3, 3, 1, 2, 1], [one.get_number_of_earthquakes() for one in pages])
+            self.assertIn(("2010-01-01T00:00:00", 7), requests_sent)
+            self.assertIn(("2010-01-02T00:00:00", 4), requests_sent)
+        self.assertRaises(ValueError, lambda: next(EarthquakeQuery().search_pages(page_size=0)))
+
+    def test_search_iter(self):
+        # Test that the streaming search yields the same earthquakes as search() in the same order
+        time = [TimeFrame(datetime(2010, 1, day), datetime(2010, 1, day + 1)) for day in range(1, 6)]
+        with mock.patch.object(HttpSession, "get", side_effect=fake_streamed_response):
+            expected = [one["id"] for one in EarthquakeQuery(time=time).search().get_combined_json()["features"]]
+            for workers in [1, 3]:
+                query = EarthquakeQuery(time=time).set_max_workers(workers)
+                self.assertEqual(expected, [one["id"] for one in query.search_iter()])
+            # stop reading early
+            iterator = EarthquakeQuery(time=time).set_max_workers(3).search_iter()
+            self.assertEqual(expected[0], next(iterator)["id"])
+            iterator.close()
+        self.assertEqual(7, len(expected))
+
+    def test_duplicate_chain(self):
+        # Test that search(), search_iter() and search_pages() find the same copies of an earthquake chained by ids
+        events = {"2010-01-01T00:00:00": make_feature("usa", 3),
+                  "2010-01-02T00:00:00": make_feature("usb", 2, ids=["usa", "usb"]),
+                  "2010-01-03T00:00:00": make_feature("usc", 1, ids=["usb", "usc"])}
+
+        def fake_get(url, **kwargs):
+            body = json.dumps(make_collection([events[url.split("starttime=")[1].split("&")[0]]])).encode("utf-8")
+            return mock.Mock(status_code=200, json=mock.Mock(return_value=json.loads(body)),
+                             iter_content=mock.Mock(return_value=iter([body])))
+
+        time = [TimeFrame(datetime(2010, 1, day), datetime(2010, 1, day + 1)) for day in range(1, 4)]
+        with mock.patch.object(HttpSession, "get", side_effect=fake_get):
+            result = EarthquakeQuery(time=time).search()
+            self.assertEqual(["usa"], [one["id"] for one in result.get_combined_json()["features"]])
+            self.assertEqual(["usa"], [one["id"] for one in EarthquakeQuery(time=time).search_iter()])
+            pages = list(EarthquakeQuery(time=time).search_pages(page_size=2))
+            self.assertEqual([["usa"]], [[one["id"] for one in page.get_combined_json()["features"]] for page in pages])
+        self.assertEqual("usa", result.get_canonical_id("usc"))
+
+    def test_search_csv(self):
+        # Test that the csv search requests the csv format and combines the responses
+        header = "time,latitude,longitude,depth,mag,id\n"
+        responses = {"2010-01-01T00:00:00": header + "2010-01-01T10:00:00.000Z,1.0,2.0,3.0,4.5,us1\n",
+                     "2010-01-02T00:00:00": header + "2010-01-02T10:00:00.000Z,1.0,2.0,3.0,5.5,us2\n"}
+
+        def fake_get(url, **kwargs):
+            self.assertIn("format=csv", url)
+            return mock.Mock(status_code=200, text=responses[url.split("starttime=")[1].split("&")[0]])
+
+        time = [TimeFrame(datetime(2010, 1, day), datetime(2010, 1, day + 1)) for day in range(1, 3)]
+        with mock.patch.object(HttpSession, "get", side_effect=fake_get):
+            result = EarthquakeQuery(time=time).search_csv()
+        self.assertEqual([5.5, 4.5], result.get_all_magnitudes())
+
+    def test_search_by_event_ids(self):
+        # Test that the duplicated ids and the aliases are searched once, and the errors are returned per id
+        searched = []
+
+        def fake_search_by_event_id(event_id, session=None):
+            searched.append(event_id)
+            if event_id == "bad":
+                raise ValueError("not found")
+            return SingleResult(make_feature(event_id, 0, ids=[event_id, "ci" + event_id[2:]]))
+
+        event_ids = ["us1", "us2", "us1", "ci1", "bad", "us3"]
+        with mock.patch.object(EarthquakeQuery, "search_by_event_id", side_effect=fake_search_by_event_id):
+            results = EarthquakeQuery.search_by_event_ids(event_ids, max_workers=1)
+        self.assertEqual(["us1", "us2", "ci1", "bad", "us3"], list(results.keys()))
+        self.assertEqual(["us1", "us2", "bad", "us3"], searched)
+        self.assertIs(results["us1"], results["ci1"])
+        self.assertIsInstance(results["bad"], ValueError)
+        self.assertEqual("us3", results["us3"].get_raw_json()["id"])
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -2,9 +2,27 @@ import os
 import sys
 import requests
 import unittest
+from unittest import mock
+
+try:
+	import numpy
+except ImportError:
+	numpy = None
 
 sys.path.append(os.path.abspath('..'))
 from src.result_collection import ResultCollection
+from test.geojson_fixture import make_feature, make_collection
+
+
+def make_results():
+	# two responses sharing an event, with equal magnitudes, depths and times to check the order of equal keys
+	first = make_collection([make_feature("us1", 1000, 4.5, 10.5, 20.0, 10),
+							 make_feature("us2", 3000, 5, -3.0, 21.5, 33.2, sig=400),
+							 make_feature("us3", 2000, 4.5, 7.25, -1.0, 10)])
+	second = make_collection([make_feature("us3", 2000, 4.5, 7.25, -1.0, 10),
+							  make_feature("us4", 2000, 6.1, 120.0, 5.0, 0.5, sig=600),
+							  make_feature("us5", 500, 4.5, -150.0, 60.0, 10)])
+	return [first, second]
 
 
 class TestResultCollection(unittest.TestCase):
@@ -115,6 +133,129 @@ class TestResultCollection(unittest.TestCase):
 		self.assertEqual(str([8.2, 8.6, 9.1]), str(result_collection.get_all_magnitudes(order_by="mag", descending=False)))
 		self.assertEqual(str([9.1, 8.6, 8.2]), str(result_collection.get_all_magnitudes(order_by="mag", descending=True)))
 
+	def test_ordering_equal_keys(self):
+		# Test that the earthquakes with equal keys keep their order in both directions
+		result_collection = ResultCollection(make_results())
+		self.assertEqual(5, result_collection.get_number_of_earthquakes())
+		self.assertEqual(["us2", "us3", "us1", "us5", "us4"],
+						 [x["id"] for x in result_collection.get_all_earthquake_data(order_by="depth")])
+		self.assertEqual(["us4", "us2", "us3", "us1", "us5"],
+						 [x["id"] for x in result_collection.get_all_earthquake_data(order_by="mag")])
+		self.assertEqual(["us3", "us1", "us5", "us2", "us4"],
+						 [x["id"] for x in result_collection.get_all_earthquake_data(order_by="mag", descending=False)])
+
+	def test_cached_order(self):
+		# Test that the order is computed once for each key and direction, and again after the collection changes
+		features = [make_feature("us" + str(i), i % 7, (i * 13) % 5, depth=(i * 3) % 4) for i in range(60)]
+		results = [make_collection(features[:30]), make_collection(features[30:])]
+		for columnar in [False, True] if numpy is not None else [False]:
+			# the descending orders are sorted first, then derived from the cached ascending orders
+			for directions in [[True, False], [False, True]]:
+				result_collection = ResultCollection(results, columnar=columnar)
+				combined = result_collection.get_combined_json()["features"]
+				for order_by in ["mag", "depth", "time", "title"]:
+					key = ResultCollection._get_sort_key(order_by)
+					for descending in directions:
+						self.assertEqual(sorted(combined, key=key, reverse=descending),
+										 result_collection.get_all_earthquake_data(order_by, descending))
+
+		result_collection = ResultCollection(results)
+		with mock.patch.object(ResultCollection, "_get_sort_key", wraps=ResultCollection._get_sort_key) as sort_key:
+			titles = result_collection.get_all_titles(order_by="mag")
+			self.assertEqual(1, sort_key.call_count)
+			result_collection.get_all_magnitudes(order_by="mag")
+			result_collection.get_all_depths(order_by="mag", descending=True)
+			self.assertEqual(1, sort_key.call_count)
+			result_collection.get_all_depths(order_by="mag", descending=False)
+			self.assertEqual(2, sort_key.call_count)
+
+			result_collection.merge(ResultCollection([make_collection([make_feature("us99", 100, 9.0)])]))
+			self.assertEqual(["M 9.0 - place of us99"] + titles, result_collection.get_all_titles(order_by="mag"))
+			self.assertEqual(3, sort_key.call_count)
+
+	def test_top_earthquakes(self):
+		# Test that the top k and the range queries return the same earthquakes as the full order
+		features = [make_feature("us" + str(i), i % 7, (i * 13) % 5, depth=(i * 3) % 4, sig=i % 3) for i in range(60)]
+		for columnar in [False, True] if numpy is not None else [False]:
+			for cache in [False, True]:
+				result_collection = ResultCollection([make_collection(features)], columnar=columnar)
+				for order_by in ["mag", "depth", "sig", "title"]:
+					for descending in [True, False]:
+						expected = ResultCollection([make_collection(features)]).get_all_earthquake_data(
+							order_by, descending)
+						if cache:
+							result_collection.get_all_earthquake_data(order_by, descending)
+						for k in [0, 1, 5, 12, 59, 60, 100]:
+							self.assertEqual(expected[:k], result_collection.get_top_earthquakes(k, order_by, descending))
+						if order_by != "title":
+							key = ResultCollection._get_sort_key(order_by)
+							self.assertEqual([x for x in expected if 1 <= key(x) <= 2],
+											 result_collection.get_earthquakes_in_range(order_by, 1, 2, descending))
+		result_collection = ResultCollection([make_collection(features)])
+		self.assertEqual(12, len(result_collection.get_earthquakes_in_range(min_value=4)))
+		self.assertEqual(24, len(result_collection.get_earthquakes_in_range(max_value=1)))
+		self.assertRaises(TypeError, result_collection.get_top_earthquakes, 1.5)
+		self.assertRaises(ValueError, result_collection.get_top_earthquakes, -1)
+
+	def test_keep_policy(self):
+		# Test that a duplicated earthquake is kept once at its first position, with the copy chosen by the policy
+		first = make_collection([make_feature("ci1", 2000, 4.0, ids=["ci1", "us1"], updated=5000),
+								 make_feature("us2", 1000, 3.0)])
+		second = make_collection([make_feature("us1", 2000, 4.2, ids=["us1", "ci1", "nc1"], updated=9000),
+								  make_feature("nc1", 2000, 4.1, ids=["nc1"], updated=7000),
+								  make_feature("ak3", 500, 2.0)])
+		expected = {"first": ("ci1", 4.0), "updated": ("us1", 4.2), "network": ("nc1", 4.1)}
+		for keep, (kept_id, mag) in expected.items():
+			result_collection = ResultCollection([first, second], keep=keep, networks=["nc", "us"])
+			self.assertEqual([kept_id, "us2", "ak3"], [x["id"] for x in result_collection.get_combined_json()["features"]])
+			for alias in ["ci1", "us1", "nc1"]:
+				self.assertEqual(mag, result_collection.get_by_id(alias)["properties"]["mag"])
+				self.assertEqual(kept_id, result_collection.get_canonical_id(alias))
+		result_collection = ResultCollection([first, second])
+		self.assertEqual("us2", result_collection.get_canonical_id("us2"))
+		self.assertIsNone(result_collection.get_by_id("us9"))
+		self.assertIsNone(result_collection.get_canonical_id("us9"))
+
+		# the earthquakes kept are merged again with the same policy
+		result_collection = ResultCollection([first], keep="updated")
+		result_collection.merge(ResultCollection([second]))
+		self.assertEqual(4.2, result_collection.get_by_id("ci1")["properties"]["mag"])
+		self.assertRaises(ValueError, ResultCollection, [first], keep="last")
+		self.assertRaises(ValueError, ResultCollection, [first], keep="network")
+
+	@unittest.skipIf(numpy is None, "numpy is not installed")
+	def test_columnar(self):
+		# Test that the columnar storage returns the same results as the json dicts
+		results = make_results()
+		results[1]["features"][2]["properties"]["sig"] = None
+		expected = ResultCollection(results)
+		actual = ResultCollection(results, columnar=True)
+		self.assertEqual(["depth", "id", "latitude", "longitude", "mag", "time"], sorted(actual._columns))
+		for order_by in ["time", "mag", "latitude", "longitude", "depth", "title"]:
+			for descending in [True, False]:
+				for getter in ["get_all_earthquake_data", "get_all_magnitudes", "get_all_coordinates",
+							   "get_all_3d_coordinates", "get_all_depths", "get_all_titles"]:
+					self.assertEqual(getattr(expected, getter)(order_by, descending),
+									 getattr(actual, getter)(order_by, descending))
+				self.assertEqual(expected.get_data_by_keys(["id", "mag", "sig", "title"], order_by, descending),
+								 actual.get_data_by_keys(["id", "mag", "sig", "title"], order_by, descending))
+		self.assertIsInstance(actual.get_all_magnitudes()[0], float)
+		self.assertIsInstance(actual.get_data_by_keys(["time"])[0]["time"], int)
+
+		# the columns are extracted again after a merge
+		actual.merge(ResultCollection([make_collection([make_feature("us6", 4000, 7.0)])]))
+		self.assertEqual(7.0, actual.get_all_magnitudes()[0])
+		self.assertEqual(["us6", "us2"], [x["id"] for x in actual.get_data_by_keys(["id"])[:2]])
+
+		empty = ResultCollection([], columnar=True)
+		self.assertEqual([], empty.get_all_magnitudes())
+		self.assertEqual([], empty.get_all_coordinates(order_by="mag", descending=False))
+
+	def test_columnar_requires_numpy(self):
+		with mock.patch("src.result_collection.numpy", None):
+			self.assertRaises(ImportError, ResultCollection, make_results(), columnar=True)
+			self.assertEqual(5, ResultCollection(make_results()).get_number_of_earthquakes())
+
 
 if __name__ == '__main__':
 	unittest.main()
@@ -0,0 +1,94 @@
+import unittest
+from unittest import mock
+
+import requests
+
+from src.retry import RetryPolicy, RateLimiter
+from src.session import HttpSession
+from src.earthquake_query import EarthquakeQuery
+
+
+def fake_response(status_code, headers=None):
+    return mock.Mock(status_code=status_code, headers={} if headers is None else headers)
+
+
+class TestRetryPolicy(unittest.TestCase):
+    def test_retry_status(self):
+        # Test that the retried status codes are retried until a success, waiting as long as Retry-After asks
+        responses = [fake_response(503), fake_response(429, {"Retry-After": "7"}), fake_response(200)]
+        with mock.patch("src.retry.time.sleep") as sleep:
+            response = RetryPolicy(max_retries=3, backoff=0.1).send(lambda: responses.pop(0))
+        self.assertEqual(200, response.status_code)
+        self.assertEqual(2, sleep.call_count)
+        self.assertLessEqual(sleep.call_args_list[0][0][0], 0.1)
+        self.assertEqual(7, sleep.call_args_list[1][0][0])
+
+    def test_retries_run_out(self):
+        # Test that the last failed response is returned, and the other status codes are not retried
+        sent = []
+
+        def send():
+            sent.append(1)
+            return fake_response(503)
+
+        with mock.patch("src.retry.time.sleep"):
+            self.assertEqual(503, RetryPolicy(max_retries=2).send(send).status_code)
+            self.assertEqual(3, len(sent))
+            self.assertEqual(404, RetryPolicy().send(lambda: fake_response(404)).status_code)
+
+    def test_connection_error(self):
+        # Test that the connection errors are retried, and raised when the retries run out
+        def send():
+            raise requests.ConnectionError("failed")
+
+        with mock.patch("src.retry.time.sleep") as sleep:
+            self.assertRaises(requests.ConnectionError, RetryPolicy(max_retries=2).send, send)
+        self.assertEqual(2, sleep.call_count)
+
+    def test_delay(self):
+        policy = RetryPolicy(backoff=1, max_backoff=5)
+        for attempt in range(1, 6):
+            self.assertLessEqual(policy.get_delay(attempt), min(5, 2 ** (attempt - 1)))
+        self.assertEqual(5, policy.get_delay(1, fake_response(429, {"Retry-After": "100"})))
+        self.assertEqual(0.5, RetryPolicy._parse_retry_after("0.5"))
+        self.assertEqual(0, RetryPolicy._parse_retry_after("Wed, 21 Oct 2015 07:28:00 GMT"))
+        self.assertIsNone(RetryPolicy._parse_retry_after("soon"))
+        self.assertRaises(ValueError, RetryPolicy, max_retries=-1)
+
+    def test_session_retry(self):
+        # Test that a session with a retry policy retries the requests
+        session = HttpSession(retry_policy=RetryPolicy(max_retries=1))
+        with mock.patch.object(session._session, "get", side_effect=[fake_response(503), fake_response(200)]), \
+                mock.patch("src.retry.time.sleep"):
+            self.assertEqual(200, session.get("https://earthquake.usgs.gov").status_code)
+        self.assertRaises(TypeError, HttpSession, retry_policy="retry")
+
+
+class TestRateLimiter(unittest.TestCase):
+    def test_token_bucket(self):
+        # Test that the burst is sent at once, and the following requests wait for the refill
+        limiter = RateLimiter(rate=10, burst=2)
+        with mock.patch("src.retry.time.monotonic", return_value=100.0), mock.patch("src.retry.time.sleep") as sleep:
+            limiter._updated = 100.0
+            for _ in range(4):
+                limiter.acquire()
+        self.assertEqual([0.1, 0.2], [round(one[0][0], 6) for one in sleep.call_args_list])
+        self.assertRaises(ValueError, RateLimiter, rate=0)
+
+    def test_shared_by_sessions(self):
+        # Test that the process-wide rate limiter is used by every session
+        limiter = RateLimiter(rate=1000, burst=1000)
+        EarthquakeQuery.set_rate_limiter(limiter)
+        try:
+            with mock.patch.object(limiter, "acquire") as acquire:
+                for session in [HttpSession(), HttpSession()]:
+                    with mock.patch.object(session._session, "get", return_value=fake_response(200)):
+                        session.get("https://earthquake.usgs.gov")
+            self.assertEqual(2, acquire.call_count)
+        finally:
+            EarthquakeQuery.set_rate_limiter(None)
+        self.assertRaises(TypeError, EarthquakeQuery.set_rate_limiter, 5)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,38 @@
+import os
+import sys
+import unittest
+
+sys.path.append(os.path.abspath('..'))
+from src.session import HttpSession, _DefaultSession
+from src.earthquake_query import EarthquakeQuery
+
+
+class TestHttpSession(unittest.TestCase):
+    def test_pool_and_headers(self):
+        # Test that the session mounts a pooled adapter and asks for gzip responses
+        session = HttpSession(pool_maxsize=32)
+        adapter = session._session.get_adapter("https://earthquake.usgs.gov")
+        self.assertEqual(32, adapter._pool_maxsize)
+        self.assertEqual("keep-alive", session._session.headers["Connection"])
+        self.assertIn("gzip", session._session.headers["Accept-Encoding"])
+        self.assertEqual("identity", HttpSession(gzip=False)._session.headers["Accept-Encoding"])
+
+    def test_invalid_parameters(self):
+        self.assertRaises(ValueError, HttpSession, pool_maxsize=0)
+        self.assertRaises(TypeError, HttpSession, pool_connections=1.5)
+        self.assertRaises(ValueError, HttpSession, timeout=0)
+
+    def test_query_session(self):
+        # Test that a query uses the default session unless it has its own session
+        default_session = HttpSession()
+        EarthquakeQuery.set_default_session(default_session)
+        query = EarthquakeQuery()
+        self.assertIs(default_session, query.get_session())
+        session = HttpSession()
+        self.assertIs(session, query.set_session(session).get_session())
+        self.assertIs(default_session, _DefaultSession.get())
+        self.assertRaises(TypeError, query.set_session, "session")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,107 @@
+import threading
+import time
+import unittest
+
+from src.deadline import Deadline
+from src.singleflight import _SingleFlight
+
+
+class TestSingleFlight(unittest.TestCase):
+    def test_share_in_flight(self):
+        # Test that the callers of the same key in flight share one fetch, and the other keys are not affected
+        single_flight = _SingleFlight()
+        calls = []
+
+        def fetch(key):
+            calls.append(key)
+            time.sleep(0.2)
+            return {"key": key}
+
+        results = []
+        threads = [threading.Thread(target=lambda key=key: results.append(single_flight.do(key, fetch, key)))
+                   for key in ["a", "a", "a", "b"]]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(["a", "b"], sorted(calls))
+        self.assertEqual(2, single_flight.get_shared())
+        self.assertEqual(3, len([one for one in results if one["key"] == "a"]))
+        self.assertEqual(1, len(set(id(one) for one in results if one["key"] == "a")))
+
+        # the fetch finished, so the next caller fetches again
+        single_flight.do("a", fetch, "a")
+        self.assertEqual(3, len(calls))
+
+    def test_share_error(self):
+        # Test that the error of the fetch is raised to every caller sharing it
+        single_flight = _SingleFlight()
+        started = threading.Event()
+        release = threading.Event()
+        errors = []
+
+        def fetch():
+            started.set()
+            release.wait()
+            raise ValueError("failed")
+
+        def call():
+            try:
+                single_flight.do("a", fetch)
+            except ValueError as e:
+                errors.append(e)
+
+        leader = threading.Thread(target=call)
+        leader.start()
+        started.wait()
+        follower = threading.Thread(target=call)
+        follower.start()
+        while single_flight.get_shared() == 0:
+            time.sleep(0.01)
+        release.set()
+        leader.join()
+        follower.join()
+        self.assertEqual(2, len(errors))
+
+    def test_deadline_not_shared(self):
+        # Test that a caller does not share the TimeoutError of the deadline of another caller, but fetches again
+        single_flight = _SingleFlight()
+        started = threading.Event()
+        calls = []
+        results = []
+
+        def fetch():
+            calls.append(1)
+            if len(calls) == 1:
+                started.set()
+                time.sleep(0.2)
+                raise TimeoutError("The deadline of 0.1 seconds has passed")
+            return "result"
+
+        def call(deadline):
+            try:
+                if deadline is None:
+                    results.append(single_flight.do("a", fetch))
+                else:
+                    with deadline:
+                        results.append(single_flight.do("a", fetch))
+            except TimeoutError as e:
+                results.append(e)
+
+        deadline = Deadline(0.1)
+        threads = [threading.Thread(target=call, args=(deadline,))]
+        threads[0].start()
+        started.wait()
+        # a caller with the same deadline shares the error, a caller without deadline fetches again
+        threads += [threading.Thread(target=call, args=(deadline,)), threading.Thread(target=call, args=(None,))]
+        for thread in threads[1:]:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(2, len(calls))
+        self.assertEqual(["result"], [one for one in results if one == "result"])
+        self.assertEqual(2, len([one for one in results if isinstance(one, TimeoutError)]))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,71 @@
+import os
+import sys
+import tempfile
+import unittest
+from datetime import datetime
+from unittest import mock
+
+sys.path.append(os.path.abspath('..'))
+from src.earthquake_query import EarthquakeQuery
+from src.sync import EarthquakeSync
+from src.timeframe import TimeFrame
+from test.geojson_fixture import make_feature, make_collection
+
+
+class TestEarthquakeSync(unittest.TestCase):
+    def setUp(self):
+        self.responses = []
+        self.requests_sent = []
+
+        def fake_query_single(query, time_single, location_single):
+            self.requests_sent.append((time_single, query.get_include_deleted()))
+            return self.responses.pop(0)
+
+        patcher = mock.patch.object(EarthquakeQuery, "_query_single", autospec=True, side_effect=fake_query_single)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.query = EarthquakeQuery(time=[TimeFrame(datetime(2021, 1, 1), datetime(2022, 1, 1))])
+
+    def test_sync(self):
+        first = make_collection([make_feature("us1", 1, updated=10, ids=["us1", "ci1"]),
+                                 make_feature("us2", 2, updated=10),
+                                 make_feature("us3", 3, updated=10)])
+        first["metadata"]["generated"] = 1609459200000
+        second = make_collection([make_feature("ci1", 1, updated=20, ids=["us1", "ci1"]),
+                                  make_feature("us2", 2, updated=30, status="deleted"),
+                                  make_feature("us3", 3, updated=10),
+                                  make_feature("us4", 4, updated=20)])
+        second["metadata"]["generated"] = 1609459260000
+        self.responses = [first, second]
+
+        sync = EarthquakeSync(self.query)
+        self.assertEqual({"inserted": ["us3", "us2", "us1"], "updated": [], "deleted": []}, sync.sync())
+        self.assertEqual(datetime(2021, 1, 1), sync.get_watermark())
+        self.assertFalse(self.requests_sent[0][0].is_update_after_set())
+
+        changes = sync.sync()
+        self.assertEqual({"inserted": ["us4"], "updated": ["ci1"], "deleted": ["us2"]}, changes)
+        self.assertEqual("2020-12-31T23:59:00", self.requests_sent[1][0].get_update_after_string())
+        self.assertIsNotNone(self.requests_sent[1][1])
+        self.assertEqual(["ci1", "us3", "us4"], sorted(event["id"] for event in sync.get_events()))
+        self.assertEqual(3, sync.get_result_collection().get_number_of_earthquakes())
+
+    def test_state_file(self):
+        # A new EarthquakeSync continues from the watermark and the local copy saved in the state file
+        first = make_collection([make_feature("us1", 1, updated=10)])
+        second = make_collection([make_feature("us1", 1, updated=20)])
+        self.responses = [first, second]
+        with tempfile.TemporaryDirectory() as directory:
+            state_path = os.path.join(directory, "state.json")
+            EarthquakeSync(self.query, state_path=state_path).sync()
+            sync = EarthquakeSync(self.query, state_path=state_path)
+            self.assertEqual(1, len(sync.get_events()))
+            self.assertEqual({"inserted": [], "updated": ["us1"], "deleted": []}, sync.sync())
+        self.assertTrue(self.requests_sent[1][0].is_update_after_set())
+
+    def test_query_without_time(self):
+        self.assertRaises(ValueError, EarthquakeSync, EarthquakeQuery())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -36,6 +36,19 @@ class TestTimeFrame(unittest.TestCase):
         timeframe.set_start_time(datetime.datetime(2019, 12, 1))
         self.assertEqual(timeframe.get_start_time_string(), datetime.datetime(2019, 12, 1).isoformat().split(".")[0])
 
+    def test_split(self):
+        timeframe = TimeFrame(datetime.datetime(2019, 1, 1), datetime.datetime(2019, 1, 3))
+        first, second = timeframe.split()
+        self.assertEqual(first.get_start_time_string(), "2019-01-01T00:00:00")
+        self.assertEqual(first.get_end_time_string(), "2019-01-02T00:00:00")
+        self.assertEqual(second.get_start_time_string(), "2019-01-02T00:00:00")
+        self.assertEqual(second.get_end_time_string(), "2019-01-03T00:00:00")
+
+        timeframe = TimeFrame(datetime.datetime(2019, 1, 1), datetime.datetime(2019, 1, 1, 0, 0, 1))
+        self.assertFalse(timeframe.can_split())
+        with self.assertRaises(ValueError):
+            timeframe.split()
+
 
 if __name__ == '__main__':
     unittest.main()